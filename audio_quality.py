@@ -0,0 +1,78 @@
+import math
+import config
+
+
+# ID3-тег і заголовки кадрів поверх чистого потоку бітрейту
+MP3_OVERHEAD_BYTES = 64 * 1024
+
+
+class QualityPlan:
+    """Якість, з якою трек буде завантажено, та кількість частин для відправки"""
+    
+    __slots__ = ('requested', 'bitrate', 'parts')
+    
+    def __init__(self, requested: int, bitrate: int, parts: int = 1):
+        self.requested = requested
+        self.bitrate = bitrate
+        self.parts = parts
+    
+    @property
+    def reduced(self) -> bool:
+        return self.bitrate < self.requested
+    
+    def describe(self) -> str:
+        """Якість для підпису до аудіо"""
+        text = f"MP3 {self.bitrate} kbps"
+        if self.reduced:
+            text += f" (замість {self.requested} kbps через ліміт Telegram)"
+        if self.parts > 1:
+            text += f", частин: {self.parts}"
+        return text
+
+
+def estimate_mp3_bytes(duration_ms: int | None, bitrate: int) -> int | None:
+    """Розмір MP3 з постійним бітрейтом (None, якщо тривалість невідома)"""
+    if not duration_ms:
+        return None
+    return int(duration_ms / 1000 * bitrate * 1000 / 8) + MP3_OVERHEAD_BYTES
+
+
+def upload_budget(limit_bytes: int) -> int:
+    """Скільки байт можна займати одному файлу з запасом на похибку оцінки"""
+    return int(limit_bytes * config.UPLOAD_SIZE_MARGIN)
+
+
+def parts_for_size(file_size: int, limit_bytes: int) -> int:
+    """На скільки частин поділити готовий файл, щоб кожна пройшла через ліміт"""
+    return max(1, math.ceil(file_size / upload_budget(limit_bytes)))
+
+
+def plan_quality(duration_ms: int | None, bitrate: int, limit_bytes: int) -> QualityPlan:
+    """
+    Найвищий бітрейт, з яким трек пройде через ліміт відправки
+    
+    Оцінка за тривалістю зі Spotify робиться до завантаження. Бітрейт
+    знижується не нижче AUTO_MIN_BITRATE; якщо трек не вміщується й тоді
+    (довгі мікси, подкасти), він ділиться на частини.
+    
+    Args:
+        duration_ms: Тривалість треку зі Spotify
+        bitrate: Бітрейт з налаштувань користувача
+        limit_bytes: Ліміт відправки поточного Bot API
+    
+    Returns:
+        QualityPlan
+    """
+    budget = upload_budget(limit_bytes)
+    if estimate_mp3_bytes(duration_ms, bitrate) is None:
+        return QualityPlan(bitrate, bitrate)
+    
+    candidates = [bitrate] + sorted(
+        (rate for rate in config.AUDIO_BITRATES if config.AUTO_MIN_BITRATE <= rate < bitrate), reverse=True
+    )
+    for candidate in candidates:
+        if estimate_mp3_bytes(duration_ms, candidate) <= budget:
+            return QualityPlan(bitrate, candidate)
+    
+    floor = min(bitrate, config.AUTO_MIN_BITRATE)
+    return QualityPlan(bitrate, floor, parts_for_size(estimate_mp3_bytes(duration_ms, floor), limit_bytes))
@@ -0,0 +1,382 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+import config
+import metrics
+
+
+class AudioStore:
+    """
+    Сховище готових MP3 з адресацією за вмістом
+    
+    Різні треки Spotify (сингл і версія з альбому, регіональні релізи) часто
+    ведуть на одне завантаження SoundCloud. Готовий MP3 зберігається один раз
+    під SHA-256 свого вмісту; другий ключ - URL джерела разом з бітрейтом,
+    за яким повторне завантаження обходиться без мережі. Кожен запис знає,
+    які треки каталогу (spotify:ID, query:...) на нього посилаються
+    (лічильник посилань), та file_id Telegram, з яким аудіо вже відправлялось -
+    його можна повторно використати для будь-якого з цих треків.
+    
+    Бот отримує власну копію файлу (жорстке посилання, якщо це можливо), тож
+    cleanup_file після відправки не зачіпає сховище. Коли обсяг перевищує
+    AUDIO_STORE_MAX_MB, спершу видаляються файли з найменшою кількістю
+    посилань і найдавнішим використанням; file_id при цьому зберігається.
+    
+    Індекс читається і звіряється з папкою не при створенні, а в load()
+    (з create_app() / cli.py або при першому зверненні).
+    """
+    
+    def __init__(self, directory: str = None, index_file: str = None, max_bytes: int = None):
+        self.directory = directory or config.AUDIO_STORE_DIR
+        self.index_file = index_file or config.AUDIO_STORE_INDEX_FILE
+        self.max_bytes = max_bytes if max_bytes is not None else config.AUDIO_STORE_MAX_MB * 1024 * 1024
+        self._lock = threading.Lock()
+        # Запис індексу: знімок і файл по черзі, щоб старіший знімок не перезаписав новіший
+        self._save_lock = threading.Lock()
+        # Видані копії: шлях -> хеш (щоб знайти file_id за шляхом файлу)
+        self._issued = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self.evicted = 0
+        
+        self.blobs = {}    # хеш -> запис
+        self.sources = {}  # "URL@бітрейт" -> хеш
+        self._loaded = False
+        self._load_lock = threading.Lock()
+    
+    # ---------- індекс ----------
+    
+    def load(self) -> None:
+        """Читає індекс і прибирає папку сховища (один раз, блокуючий)"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if self._loaded:
+                return
+            index = self._load_index()
+            with self._lock:
+                self.blobs = index.get('blobs', {})
+                self.sources = index.get('sources', {})
+            self._reconcile()
+            self._loaded = True
+    
+    def _load_index(self) -> dict:
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Не вдалося завантажити індекс сховища аудіо: {e}")
+        return {}
+    
+    def _save_index(self) -> None:
+        """Зберігає індекс атомарно: тимчасовий файл і os.replace"""
+        try:
+            with self._save_lock:
+                with self._lock:
+                    snapshot = {
+                        'blobs': {digest: dict(entry, refs=list(entry['refs'])) for digest, entry in self.blobs.items()},
+                        'sources': dict(self.sources),
+                    }
+                temporary = f"{self.index_file}.{os.getpid()}.tmp"
+                with open(temporary, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, ensure_ascii=False, indent=2)
+                os.replace(temporary, self.index_file)
+        except Exception as e:
+            print(f"Не вдалося зберегти індекс сховища аудіо: {e}")
+    
+    def _reconcile(self) -> None:
+        """
+        Звіряє індекс з папкою сховища при старті
+        
+        Файли, яких немає в індексі (індекс втрачено або пошкоджено, обірваний
+        put), видаляються - їх більше ніщо не прибере. Свіжіші за
+        DISK_ORPHAN_AGE_SEC не чіпаються: їх міг щойно додати інший процес
+        (наприклад, cli.py поруч із ботом). Записи, файл яких зник,
+        позначаються як не збережені.
+        """
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        except OSError as e:
+            print(f"Не вдалося перевірити папку сховища аудіо: {e}")
+            return
+        
+        removed = 0
+        now = time.time()
+        with self._lock:
+            blobs = dict(self.blobs)
+        for name in names:
+            digest = name[:-len('.mp3')] if name.endswith('.mp3') else None
+            entry = blobs.get(digest) if digest else None
+            if entry is not None and entry.get('stored'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) < config.DISK_ORPHAN_AGE_SEC:
+                    continue
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                print(f"Не вдалося видалити файл сховища {name}: {e}")
+        if removed:
+            print(f"Сховище аудіо: видалено {removed} файлів поза індексом")
+        
+        present = set(names)
+        changed = False
+        with self._lock:
+            for digest, entry in list(self.blobs.items()):
+                if entry.get('stored') and f"{digest}.mp3" not in present:
+                    entry['stored'] = False
+                    changed = True
+                    if not entry.get('file_id'):
+                        self._drop_locked(digest)
+        if changed:
+            self._save_index()
+    
+    @staticmethod
+    def _source_key(source_url: str, bitrate: int) -> str:
+        return f"{source_url}@{bitrate}"
+    
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, f"{digest}.mp3")
+    
+    @staticmethod
+    def _link_or_copy(source: str, destination: str) -> None:
+        """Жорстке посилання або копія (між файловими системами, наприклад з tmpfs)"""
+        try:
+            os.link(source, destination)
+        except OSError:
+            shutil.copyfile(source, destination)
+    
+    def _issue(self, path: str, digest: str) -> None:
+        self._issued[os.path.abspath(path)] = digest
+        while len(self._issued) > config.AUDIO_STORE_ISSUED_MAX:
+            self._issued.popitem(last=False)
+    
+    @staticmethod
+    def file_digest(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    # ---------- завантажувач ----------
+    
+    def checkout(self, source_url: str, bitrate: int, output_path: str, ref: str = None) -> bool:
+        """
+        Копія вже збереженого аудіо цього джерела в output_path
+        
+        Args:
+            source_url: URL треку в джерелі
+            bitrate: Бітрейт MP3
+            output_path: Куди покласти копію (її можна видаляти)
+            ref: Ключ треку каталогу, який тепер теж посилається на запис
+        
+        Returns:
+            True, якщо аудіо взято зі сховища
+        """
+        self.load()
+        changed = False
+        with self._lock:
+            digest = self.sources.get(self._source_key(source_url, bitrate))
+            entry = self.blobs.get(digest) if digest else None
+            if entry is None or not entry.get('stored'):
+                self.misses += 1
+                metrics.cache_requests.inc(cache='audio_store', result='miss')
+                return False
+        
+        # Копія (наприклад, у tmpfs) робиться без блокування: інші потоки не чекають на неї
+        try:
+            self._link_or_copy(self._blob_path(digest), output_path)
+            # Посилання має mtime файлу сховища - без оновлення прибирання
+            # папки завантажень вважало б свіжу копію забутою
+            os.utime(output_path)
+        except OSError as e:
+            print(f"Файл сховища недоступний ({digest[:12]}): {e}")
+            with self._lock:
+                if self.blobs.get(digest) is entry and not os.path.exists(self._blob_path(digest)):
+                    entry['stored'] = False
+                self.misses += 1
+            metrics.cache_requests.inc(cache='audio_store', result='miss')
+            return False
+        
+        with self._lock:
+            entry['last_used'] = time.time()
+            if ref and ref not in entry['refs']:
+                entry['refs'].append(ref)
+                changed = True
+            self._issue(output_path, digest)
+            self.hits += 1
+        metrics.cache_requests.inc(cache='audio_store', result='hit')
+        if changed:
+            self._save_index()
+        return True
+    
+    def put(self, path: str, source_url: str, bitrate: int, source: str, ref: str = None) -> str:
+        """
+        Додає готовий MP3 у сховище (або знаходить такий самий вміст)
+        
+        Args:
+            path: Готовий MP3 (залишається на місці)
+            source_url: URL треку в джерелі
+            bitrate: Бітрейт MP3
+            source: Назва джерела (soundcloud, youtube)
+            ref: Ключ треку каталогу
+        
+        Returns:
+            SHA-256 вмісту
+        """
+        self.load()
+        digest = self.file_digest(path)
+        size = os.path.getsize(path)
+        blob_path = self._blob_path(digest)
+        with self._lock:
+            entry = self.blobs.get(digest)
+            copy = entry is None or not entry['stored']
+        
+        # Копія (наприклад, з tmpfs на інший диск) робиться без блокування, як у checkout
+        copied = False
+        if copy:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                temporary = f"{blob_path}.{threading.get_ident()}.tmp"
+                self._link_or_copy(path, temporary)
+                os.replace(temporary, blob_path)
+                copied = True
+            except OSError as e:
+                print(f"Не вдалося зберегти аудіо у сховище: {e}")
+        
+        with self._lock:
+            entry = self.blobs.get(digest)
+            if entry is None:
+                entry = self.blobs[digest] = {
+                    'size': size, 'bitrate': bitrate, 'source': source,
+                    'refs': [], 'file_id': None, 'stored': False, 'last_used': time.time(),
+                }
+            else:
+                self.deduplicated += 1
+                metrics.cache_requests.inc(cache='audio_store_dedup', result='hit')
+            # Поки копіювали, файл міг витіснити інший put
+            if copied and os.path.exists(blob_path):
+                entry['stored'] = True
+            entry['last_used'] = time.time()
+            if ref and ref not in entry['refs']:
+                entry['refs'].append(ref)
+            self.sources[self._source_key(source_url, bitrate)] = digest
+            self._issue(path, digest)
+            self._evict_locked()
+        self._save_index()
+        return digest
+    
+    def release(self, ref: str) -> None:
+        """
+        Трек каталогу більше не посилається на сховище (наприклад, відповідність забуто)
+        
+        Записи без жодного посилання видаляються разом з файлом.
+        """
+        self.load()
+        changed = False
+        with self._lock:
+            for digest, entry in list(self.blobs.items()):
+                if ref not in entry['refs']:
+                    continue
+                entry['refs'].remove(ref)
+                changed = True
+                if not entry['refs']:
+                    self._drop_locked(digest)
+        if changed:
+            self._save_index()
+    
+    def _drop_locked(self, digest: str) -> None:
+        self.blobs.pop(digest, None)
+        for key in [key for key, value in self.sources.items() if value == digest]:
+            del self.sources[key]
+        try:
+            os.remove(self._blob_path(digest))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Не вдалося видалити файл сховища {digest[:12]}: {e}")
+    
+    def _evict_locked(self) -> None:
+        """Видаляє файли понад max_bytes: спершу з найменшою кількістю посилань і найстаріші"""
+        if not self.max_bytes:
+            return
+        stored = [(digest, entry) for digest, entry in self.blobs.items() if entry['stored']]
+        total = sum(entry['size'] for _, entry in stored)
+        for digest, entry in sorted(stored, key=lambda item: (len(item[1]['refs']), item[1]['last_used'])):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._blob_path(digest))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"Не вдалося видалити файл сховища {digest[:12]}: {e}")
+                continue
+            entry['stored'] = False
+            total -= entry['size']
+            self.evicted += 1
+            if not entry['file_id']:
+                # Без файлу і без file_id запис нічого не дає
+                self._drop_locked(digest)
+    
+    # ---------- file_id Telegram ----------
+    
+    def file_id_for(self, path: str) -> str | None:
+        """file_id, з яким такий самий вміст вже відправлявся"""
+        self.load()
+        with self._lock:
+            digest = self._issued.get(os.path.abspath(path))
+            entry = self.blobs.get(digest) if digest else None
+            return entry['file_id'] if entry else None
+    
+    def set_file_id(self, path: str, file_id: str) -> None:
+        """Запам'ятовує file_id для вмісту виданого або доданого файлу"""
+        self.load()
+        with self._lock:
+            digest = self._issued.get(os.path.abspath(path))
+            entry = self.blobs.get(digest) if digest else None
+            if entry is None or entry['file_id'] == file_id:
+                return
+            entry['file_id'] = file_id
+        self._save_index()
+    
+    def forget_file_id(self, file_id: str) -> None:
+        """Telegram не прийняв file_id - наступного разу відправляємо файлом"""
+        self.load()
+        with self._lock:
+            for entry in self.blobs.values():
+                if entry['file_id'] == file_id:
+                    entry['file_id'] = None
+        self._save_index()
+    
+    def snapshot(self) -> dict:
+        """Стан для /status"""
+        self.load()
+        with self._lock:
+            stored = [entry for entry in self.blobs.values() if entry['stored']]
+            return {
+                'entries': len(self.blobs),
+                'stored': len(stored),
+                'bytes': sum(entry['size'] for entry in stored),
+                'file_ids': sum(1 for entry in self.blobs.values() if entry['file_id']),
+                'refs': sum(len(entry['refs']) for entry in self.blobs.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'deduplicated': self.deduplicated,
+                'evicted': self.evicted,
+            }
+
+
+audio_store = AudioStore()
@@ -0,0 +1 @@
+"""Офлайн-бенчмарки та навантажувальні тести бота з фейковими бекендами"""
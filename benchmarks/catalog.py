@@ -0,0 +1,102 @@
+"""
+Детермінований каталог музики для бенчмарків
+
+Один і той самий каталог (за seed) використовують фейковий Spotify API,
+фейковий екстрактор yt-dlp та генератор навантаження, тож пошук у джерелі
+завжди знаходить трек з тією самою назвою та тривалістю.
+"""
+import random
+
+
+WORDS = [
+    'Golden', 'Night', 'River', 'Echo', 'Summer', 'Neon', 'Shadow', 'Light', 'Ocean', 'Fire',
+    'Dream', 'City', 'Storm', 'Silver', 'Heart', 'Midnight', 'Sky', 'Wild', 'Blue', 'Velvet',
+    'Morning', 'Stone', 'Paper', 'Glass', 'Winter', 'Road', 'Signal', 'Garden', 'Moon', 'Desert',
+]
+
+
+class Catalog:
+    """
+    Набір виконавців, альбомів, треків та плейлистів
+    
+    Args:
+        artists: Кількість виконавців
+        albums_per_artist: Альбомів у кожного виконавця
+        tracks_per_album: Треків в альбомі
+        playlists: Кількість плейлистів
+        playlist_size: Треків у плейлисті
+        seed: Зерно генератора (однаковий seed - однаковий каталог)
+    """
+    
+    def __init__(self, artists: int = 20, albums_per_artist: int = 2, tracks_per_album: int = 10,
+                 playlists: int = 10, playlist_size: int = 25, seed: int = 42):
+        rng = random.Random(seed)
+        self.artists = {}
+        self.albums = {}
+        self.tracks = {}
+        self.playlists = {}
+        
+        track_number = 0
+        for artist_index in range(artists):
+            artist_id = f"art{artist_index:04d}"
+            artist_name = f"{rng.choice(WORDS)} {rng.choice(WORDS)}s"
+            self.artists[artist_id] = {'id': artist_id, 'name': artist_name}
+            
+            for album_index in range(albums_per_artist):
+                album_id = f"alb{artist_index:04d}{album_index:02d}"
+                album = {
+                    'id': album_id,
+                    'name': f"{rng.choice(WORDS)} {rng.choice(WORDS)}",
+                    'artist_id': artist_id,
+                    'release_date': f"{rng.randint(1995, 2024)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}",
+                    'track_ids': [],
+                }
+                for _ in range(tracks_per_album):
+                    track_id = f"trk{track_number:06d}"
+                    track_number += 1
+                    self.tracks[track_id] = {
+                        'id': track_id,
+                        'name': f"{rng.choice(WORDS)} {rng.choice(WORDS)} {track_number}",
+                        'artist_id': artist_id,
+                        'album_id': album_id,
+                        'duration_ms': rng.randint(150, 300) * 1000,
+                    }
+                    album['track_ids'].append(track_id)
+                self.albums[album_id] = album
+        
+        track_ids = list(self.tracks)
+        for playlist_index in range(playlists):
+            playlist_id = f"pls{playlist_index:04d}"
+            self.playlists[playlist_id] = {
+                'id': playlist_id,
+                'name': f"Bench {rng.choice(WORDS)} Mix {playlist_index}",
+                'owner': 'bench',
+                'track_ids': rng.sample(track_ids, min(playlist_size, len(track_ids))),
+            }
+    
+    def artist_name(self, track: dict) -> str:
+        return self.artists[track['artist_id']]['name']
+    
+    def search_query(self, track: dict) -> str:
+        """Запит у форматі SpotifyService: "виконавець - назва\""""
+        return f"{self.artist_name(track)} - {track['name']}"
+    
+    def find_track(self, query: str) -> dict | None:
+        """Трек, назва та виконавець якого найкраще збігаються із запитом"""
+        words = set(query.lower().replace('-', ' ').split())
+        best, best_score = None, 0
+        for track in self.tracks.values():
+            candidate = set(f"{self.artist_name(track)} {track['name']}".lower().split())
+            score = len(words & candidate)
+            if score > best_score:
+                best, best_score = track, score
+        return best
+    
+    def find_by_name(self, collection: dict, query: str) -> dict | None:
+        words = set(query.lower().split())
+        best, best_score = None, 0
+        for item in collection.values():
+            score = len(words & set(item['name'].lower().split()))
+            if score > best_score:
+                best, best_score = item, score
+        return best
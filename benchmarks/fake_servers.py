@@ -0,0 +1,329 @@
+"""
+Фейкові Spotify Web API та Telegram Bot API для бенчмарків
+
+Запускається окремим процесом, щоб CPU та пам'ять серверів не
+потрапляли у виміри бота:
+
+    python -m benchmarks.fake_servers --spotify-port 8701 --bot-port 8702
+
+Після старту друкує READY. Bot API рахує відправлені повідомлення, аудіо
+та байти по чатах (GET /stats, POST /stats/reset). Файли, передані шляхом
+file:// (локальний режим telegram-bot-api), читаються з диска, як це
+робить справжній сервер.
+"""
+import json
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+from urllib.parse import urlparse, unquote
+from aiohttp import web
+
+from benchmarks.catalog import Catalog
+
+
+# Мінімальний валідний JPEG-заголовок; вмісту обкладинки бот не аналізує
+COVER_BYTES = b'\xff\xd8\xff\xe0' + b'\x00' * 2048 + b'\xff\xd9'
+
+
+# ---------- Spotify Web API ----------
+
+class FakeSpotify:
+    """Відповіді у форматі Spotify Web API з детермінованого каталогу"""
+    
+    def __init__(self, catalog: Catalog, base_url: str, latency: float = 0.0):
+        self.catalog = catalog
+        self.base_url = base_url
+        self.latency = latency
+        self.requests = 0
+    
+    def _images(self, item_id: str) -> list:
+        return [{'url': f"{self.base_url}/images/{item_id}.jpg", 'height': 640, 'width': 640}]
+    
+    def _artist(self, artist_id: str) -> dict:
+        return {'id': artist_id, 'name': self.catalog.artists[artist_id]['name'], 'type': 'artist'}
+    
+    def _track(self, track: dict, with_album: bool = True) -> dict:
+        data = {
+            'id': track['id'],
+            'name': track['name'],
+            'artists': [self._artist(track['artist_id'])],
+            'duration_ms': track['duration_ms'],
+            'preview_url': None,
+            'type': 'track',
+        }
+        if with_album:
+            album = self.catalog.albums[track['album_id']]
+            data['album'] = {'id': album['id'], 'name': album['name'], 'images': self._images(album['id'])}
+        return data
+    
+    def _album(self, album: dict) -> dict:
+        return {
+            'id': album['id'],
+            'name': album['name'],
+            'artists': [self._artist(album['artist_id'])],
+            'release_date': album['release_date'],
+            'images': self._images(album['id']),
+            'tracks': {'items': [self._track(self.catalog.tracks[track_id], with_album=False)
+                                 for track_id in album['track_ids']]},
+        }
+    
+    def _playlist(self, playlist: dict) -> dict:
+        return {
+            'id': playlist['id'],
+            'name': playlist['name'],
+            'description': '',
+            'owner': {'display_name': playlist['owner']},
+            'images': self._images(playlist['id']),
+            'tracks': {'items': [{'track': self._track(self.catalog.tracks[track_id])}
+                                 for track_id in playlist['track_ids']]},
+        }
+    
+    async def _delay(self) -> None:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+    
+    async def token(self, request: web.Request) -> web.Response:
+        await self._delay()
+        return web.json_response({'access_token': 'bench', 'token_type': 'Bearer', 'expires_in': 3600})
+    
+    async def track(self, request: web.Request) -> web.Response:
+        await self._delay()
+        track = self.catalog.tracks.get(request.match_info['item_id'])
+        if not track:
+            return web.json_response({'error': {'status': 404, 'message': 'Not found'}}, status=404)
+        return web.json_response(self._track(track))
+    
+    async def album(self, request: web.Request) -> web.Response:
+        await self._delay()
+        album = self.catalog.albums.get(request.match_info['item_id'])
+        if not album:
+            return web.json_response({'error': {'status': 404, 'message': 'Not found'}}, status=404)
+        return web.json_response(self._album(album))
+    
+    async def playlist(self, request: web.Request) -> web.Response:
+        await self._delay()
+        playlist = self.catalog.playlists.get(request.match_info['item_id'])
+        if not playlist:
+            return web.json_response({'error': {'status': 404, 'message': 'Not found'}}, status=404)
+        return web.json_response(self._playlist(playlist))
+    
+    async def search(self, request: web.Request) -> web.Response:
+        await self._delay()
+        query = request.query.get('q', '')
+        result = {}
+        for search_type in request.query.get('type', 'track').split(','):
+            if search_type == 'track':
+                found = self.catalog.find_track(query)
+                result['tracks'] = {'items': [self._track(found)] if found else []}
+            elif search_type == 'album':
+                found = self.catalog.find_by_name(self.catalog.albums, query)
+                result['albums'] = {'items': [{'id': found['id'], 'name': found['name']}] if found else []}
+            elif search_type == 'playlist':
+                found = self.catalog.find_by_name(self.catalog.playlists, query)
+                result['playlists'] = {'items': [{'id': found['id'], 'name': found['name']}] if found else []}
+        return web.json_response(result)
+    
+    async def image(self, request: web.Request) -> web.Response:
+        await self._delay()
+        return web.Response(body=COVER_BYTES, content_type='image/jpeg')
+    
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/api/token', self.token)
+        app.router.add_get('/v1/tracks/{item_id}', self.track)
+        app.router.add_get('/v1/albums/{item_id}', self.album)
+        app.router.add_get('/v1/playlists/{item_id}', self.playlist)
+        app.router.add_get('/v1/search', self.search)
+        app.router.add_get('/images/{name}', self.image)
+        return app
+
+
+# ---------- Telegram Bot API ----------
+
+class FakeBotAPI:
+    """
+    Bot API, що приймає всі виклики бота та рахує результат по чатах
+    
+    Повертає мінімальні, але валідні для aiogram об'єкти Message.
+    """
+    
+    BOT_USER = {'id': 1000000, 'is_bot': True, 'first_name': 'Sluhay Bench', 'username': 'sluhay_bench_bot'}
+    
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.message_id = 0
+        self.reset()
+    
+    def reset(self) -> None:
+        self.calls = defaultdict(int)
+        self.error_replies = defaultdict(int)
+        self.chats = defaultdict(lambda: {'messages': 0, 'edits': 0, 'audio': 0, 'photos': 0, 'errors': 0,
+                                          'upload_bytes': 0, 'local_bytes': 0, 'last_text': None,
+                                          'last_at': None})
+    
+    def _message(self, chat_id, text: str = None) -> dict:
+        self.message_id += 1
+        message = {
+            'message_id': self.message_id,
+            'date': int(time.time()),
+            'chat': {'id': int(chat_id), 'type': 'private'},
+            'from': self.BOT_USER,
+        }
+        if text is not None:
+            message['text'] = text
+        return message
+    
+    @staticmethod
+    def _audio(message_id: int) -> dict:
+        """Аудіо з file_id, за яким його можна відправити повторно без завантаження"""
+        return {'file_id': f"bench-audio-{message_id}", 'file_unique_id': f"bench-{message_id}", 'duration': 0}
+    
+    async def _read_form(self, request: web.Request) -> tuple[dict, int]:
+        """Поля запиту та сумарний розмір завантажених файлів"""
+        fields, uploaded = {}, 0
+        if request.content_type == 'multipart/form-data':
+            reader = await request.multipart()
+            async for part in reader:
+                data = await part.read()
+                if part.filename:
+                    uploaded += len(data)
+                else:
+                    fields[part.name] = data.decode('utf-8', errors='replace')
+        elif request.can_read_body:
+            form = await request.post()
+            fields = {key: str(value) for key, value in form.items()}
+        fields.update(request.query)
+        return fields, uploaded
+    
+    @staticmethod
+    def _read_local_files(fields: dict) -> int:
+        """Сумарний розмір файлів file:// з полів запиту (читаються повністю)"""
+        uris = [value for value in fields.values() if value.startswith('file://')]
+        if fields.get('media', '').startswith('['):
+            uris += [
+                item['media'] for item in json.loads(fields['media'])
+                if str(item.get('media', '')).startswith('file://')
+            ]
+        total = 0
+        for uri in uris:
+            with open(unquote(urlparse(uri).path), 'rb') as f:
+                total += len(f.read())
+        return total
+    
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        fields, uploaded = await self._read_form(request)
+        try:
+            local = self._read_local_files(fields)
+        except OSError as e:
+            return web.json_response({'ok': False, 'error_code': 400,
+                                      'description': f"Bad Request: file not found: {e}"}, status=400)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls[method] += 1
+        
+        chat_id = fields.get('chat_id')
+        chat = self.chats[int(chat_id)] if chat_id and chat_id.lstrip('-').isdigit() else None
+        if chat is not None:
+            chat['upload_bytes'] += uploaded
+            chat['local_bytes'] += local
+            chat['last_at'] = time.time()
+        
+        # Повідомлення про помилку, яке побачив би користувач
+        if (fields.get('text') or '').startswith('❌'):
+            self.error_replies[method] += 1
+            if chat is not None:
+                chat['errors'] += 1
+        
+        method_key = method.lower()
+        if method_key == 'getme':
+            result = self.BOT_USER
+        elif method_key in ('deletewebhook', 'deletemessage', 'answercallbackquery', 'sendchataction'):
+            result = True
+        elif method_key == 'editmessagetext' and chat is not None:
+            chat['edits'] += 1
+            chat['last_text'] = fields.get('text')
+            result = self._message(chat_id, fields.get('text'))
+            result['message_id'] = int(fields.get('message_id', result['message_id']))
+        elif method_key == 'sendmediagroup' and chat is not None:
+            media = json.loads(fields.get('media', '[]'))
+            chat['audio'] += sum(1 for item in media if item.get('type') == 'audio')
+            chat['messages'] += len(media)
+            result = [self._message(chat_id) for _ in media]
+            for item, sent in zip(media, result):
+                if item.get('type') == 'audio':
+                    sent['audio'] = self._audio(sent['message_id'])
+        elif chat is not None:
+            chat['messages'] += 1
+            if method_key == 'sendaudio':
+                chat['audio'] += 1
+            elif method_key == 'sendphoto':
+                chat['photos'] += 1
+            elif fields.get('text') is not None:
+                chat['last_text'] = fields.get('text')
+            result = self._message(chat_id, fields.get('text'))
+            if method_key == 'sendaudio':
+                result['audio'] = self._audio(result['message_id'])
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+    
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'calls': dict(self.calls),
+            'error_replies': dict(self.error_replies),
+            'chats': {str(chat_id): chat for chat_id, chat in self.chats.items()},
+        })
+    
+    async def reset_stats(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response({'ok': True})
+    
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=200 * 1024 * 1024)
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        app.router.add_get('/bot{token}/{method}', self.handle)
+        app.router.add_get('/stats', self.stats)
+        app.router.add_post('/stats/reset', self.reset_stats)
+        return app
+
+
+async def serve(args: argparse.Namespace) -> None:
+    catalog = Catalog(seed=args.seed)
+    spotify = FakeSpotify(catalog, f"http://{args.host}:{args.spotify_port}", args.spotify_latency / 1000)
+    bot_api = FakeBotAPI(args.bot_latency / 1000)
+    
+    runners = []
+    for app, port in ((spotify.app(), args.spotify_port), (bot_api.app(), args.bot_port)):
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, args.host, port).start()
+        runners.append(runner)
+    
+    print('READY', flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Фейкові Spotify та Bot API для бенчмарків')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--spotify-port', type=int, default=8701)
+    parser.add_argument('--bot-port', type=int, default=8702)
+    parser.add_argument('--spotify-latency', type=float, default=0.0, help='Затримка Spotify API (мс)')
+    parser.add_argument('--bot-latency', type=float, default=0.0, help='Затримка Bot API (мс)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""
+Фейковий екстрактор yt-dlp для бенчмарків
+
+Підміняє yt_dlp.YoutubeDL у завантажувачах та імпорті плейлистів:
+пошук повертає треки з каталогу, а завантаження записує згенерований
+WAV-файл і викликає progress_hooks так само, як справжній yt-dlp.
+"""
+import io
+import math
+import time
+import wave
+import struct
+import hashlib
+import threading
+from urllib.parse import urlparse, parse_qs
+
+import yt_dlp
+
+from benchmarks.catalog import Catalog
+
+
+SAMPLE_RATE = 8000
+
+_audio_cache = {}
+_audio_lock = threading.Lock()
+
+
+def generate_wav(seconds: float) -> bytes:
+    """Синусоїда 440 Гц, 8 кГц моно; результат кешується за тривалістю"""
+    seconds = round(seconds, 1)
+    with _audio_lock:
+        cached = _audio_cache.get(seconds)
+        if cached is not None:
+            return cached
+        frames = int(SAMPLE_RATE * seconds)
+        samples = struct.pack(
+            f"<{frames}h",
+            *(int(8000 * math.sin(2 * math.pi * 440 * i / SAMPLE_RATE)) for i in range(frames))
+        )
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(samples)
+        _audio_cache[seconds] = buffer.getvalue()
+        return _audio_cache[seconds]
+
+
+class FakeYoutubeDL:
+    """
+    Сумісний з yt_dlp.YoutubeDL контекстний менеджер
+    
+    Налаштування задаються на рівні класу через configure():
+        catalog: Каталог треків
+        audio_seconds: Максимальна тривалість згенерованого аудіо
+        download_delay: Імітація мережі - секунд на одне завантаження
+        search_delay: Імітація мережі - секунд на один пошук
+    """
+    
+    catalog: Catalog = None
+    audio_seconds = 5.0
+    download_delay = 0.0
+    search_delay = 0.0
+    PROGRESS_STEPS = 4
+    
+    @classmethod
+    def configure(cls, catalog: Catalog, audio_seconds: float = 5.0,
+                  download_delay: float = 0.0, search_delay: float = 0.0) -> None:
+        cls.catalog = catalog
+        cls.audio_seconds = audio_seconds
+        cls.download_delay = download_delay
+        cls.search_delay = search_delay
+    
+    def __init__(self, params: dict = None):
+        self.params = params or {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc) -> bool:
+        return False
+    
+    # ---------- Метадані ----------
+    
+    def _entry(self, track: dict, youtube: bool) -> dict:
+        artist = self.catalog.artist_name(track)
+        if youtube:
+            url = f"https://www.youtube.com/watch?v={track['id']}"
+        else:
+            url = f"https://soundcloud.com/bench/{track['id']}"
+        return {
+            'id': track['id'],
+            'title': track['name'],
+            'uploader': artist,
+            'duration': track['duration_ms'] / 1000,
+            'webpage_url': url,
+            'url': url,
+        }
+    
+    def _search(self, query: str, limit: int, youtube: bool) -> dict:
+        if self.search_delay:
+            time.sleep(self.search_delay)
+        entries = []
+        best = self.catalog.find_track(query)
+        if best:
+            entries.append(self._entry(best, youtube))
+            # Решта кандидатів - інші треки того ж альбому (гірші збіги)
+            album = self.catalog.albums[best['album_id']]
+            for track_id in album['track_ids']:
+                if len(entries) >= limit:
+                    break
+                if track_id != best['id']:
+                    entries.append(self._entry(self.catalog.tracks[track_id], youtube))
+        return {'_type': 'playlist', 'entries': entries}
+    
+    def _playlist(self, playlist_id: str, youtube: bool) -> dict | None:
+        playlist = self.catalog.playlists.get(playlist_id)
+        if not playlist:
+            return None
+        entries = []
+        for track_id in playlist['track_ids']:
+            entry = self._entry(self.catalog.tracks[track_id], youtube)
+            if youtube:
+                # YouTube Music віддає "Виконавець - Назва" у title
+                entry['title'] = f"{entry['uploader']} - {entry['title']}"
+            entries.append(entry)
+        return {'_type': 'playlist', 'id': playlist_id, 'title': playlist['name'], 'entries': entries}
+    
+    @staticmethod
+    def _track_id(url: str) -> str | None:
+        parsed = urlparse(url)
+        if parsed.query:
+            video = parse_qs(parsed.query).get('v')
+            if video:
+                return video[0]
+        return parsed.path.rstrip('/').split('/')[-1] or None
+    
+    # ---------- Завантаження ----------
+    
+    def _download(self, track: dict, youtube: bool) -> dict:
+        info = self._entry(track, youtube)
+        data = generate_wav(min(self.audio_seconds, track['duration_ms'] / 1000))
+        # Останні семпли залежать від треку: різні треки - різний вміст (сховище аудіо
+        # об'єднує однакові файли)
+        data = data[:-16] + hashlib.md5(track['id'].encode()).digest()
+        outtmpl = self.params.get('outtmpl', '%(id)s.%(ext)s')
+        if isinstance(outtmpl, dict):
+            outtmpl = outtmpl.get('default', '%(id)s.%(ext)s')
+        path = outtmpl.replace('%(ext)s', 'wav').replace('%(id)s', track['id'])
+        
+        hooks = self.params.get('progress_hooks') or []
+        total = len(data)
+        step_delay = self.download_delay / self.PROGRESS_STEPS
+        started = time.monotonic()
+        with open(path, 'wb') as f:
+            for step in range(1, self.PROGRESS_STEPS + 1):
+                chunk_end = total * step // self.PROGRESS_STEPS
+                f.write(data[total * (step - 1) // self.PROGRESS_STEPS:chunk_end])
+                if step_delay:
+                    time.sleep(step_delay)
+                elapsed = max(time.monotonic() - started, 1e-6)
+                progress = {
+                    'status': 'downloading',
+                    'filename': path,
+                    'downloaded_bytes': chunk_end,
+                    'total_bytes': total,
+                    'speed': chunk_end / elapsed,
+                    'eta': (total - chunk_end) / (chunk_end / elapsed),
+                    'info_dict': info,
+                }
+                for hook in hooks:
+                    hook(progress)
+        for hook in hooks:
+            hook({'status': 'finished', 'filename': path, 'downloaded_bytes': total,
+                  'total_bytes': total, 'info_dict': info})
+        
+        info['ext'] = 'wav'
+        info['requested_downloads'] = [{'filepath': path, 'ext': 'wav'}]
+        return info
+    
+    def extract_info(self, url: str, download: bool = True, **kwargs) -> dict | None:
+        youtube = 'youtube' in url or url.startswith('ytsearch')
+        
+        for prefix in ('scsearch', 'ytsearch'):
+            if url.startswith(prefix):
+                count, _, query = url[len(prefix):].partition(':')
+                result = self._search(query, int(count or 1), youtube)
+                if download and result['entries']:
+                    result['entries'] = [self._download(self.catalog.tracks[result['entries'][0]['id']], youtube)]
+                return result
+        
+        if not url.startswith('http'):
+            # default_search: пошук за текстом
+            return self.extract_info(f"{'ytsearch' if youtube else 'scsearch'}1:{url}", download)
+        
+        parsed = urlparse(url)
+        if parsed.path == '/search':
+            # Пошук YouTube Music: music.youtube.com/search?q=...#songs
+            query = parse_qs(parsed.query).get('q', [''])[0]
+            return self.extract_info(f"ytsearch{self.params.get('playlistend') or 1}:{query}", download)
+        if 'list' in parse_qs(parsed.query) or '/sets/' in parsed.path:
+            playlist_id = parse_qs(parsed.query).get('list', [None])[0] or parsed.path.rstrip('/').split('/')[-1]
+            return self._playlist(playlist_id, youtube)
+        
+        track = self.catalog.tracks.get(self._track_id(url))
+        if not track:
+            raise yt_dlp.utils.DownloadError(f"ERROR: Unable to download {url}: HTTP Error 404")
+        if download:
+            return self._download(track, youtube)
+        return self._entry(track, youtube)
@@ -0,0 +1,329 @@
+"""
+Спільне оточення для бенчмарків та навантажувальних тестів
+
+Запускає фейкові сервери окремим процесом, готує робочу папку та змінні
+середовища, імпортує main і підміняє в ньому всі зовнішні залежності:
+Spotify API, yt-dlp, FFmpeg (якщо його немає в системі) та Bot API.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import asyncio
+import logging
+import platform
+import resource
+import tempfile
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+import aiohttp
+
+from benchmarks.catalog import Catalog
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+BENCH_TOKEN = '123456:BENCHbenchBENCHbenchBENCHbench'
+
+# Без лімітів Bot API вимірюється сам бот, а не планувальник відправки
+UNTHROTTLED_ENV = {
+    'SEND_GLOBAL_RATE': '100000',
+    'SEND_CHAT_RATE': '100000',
+    'SEND_CHAT_BURST': '100000',
+}
+
+FAKE_FFMPEG = """#!{python}
+# Заглушка FFmpeg для бенчмарків: копіює вхідний файл у вихідний
+# з тегом ID3 на початку, як справжній FFmpeg
+import sys
+import shutil
+
+args = sys.argv[1:]
+with open(args[args.index('-i') + 1], 'rb') as src, open(args[-1], 'wb') as dst:
+    dst.write(b'ID3\\x04\\x00\\x00\\x00\\x00\\x00\\x00')
+    shutil.copyfileobj(src, dst)
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Перцентиль за найближчим рангом (значення мають бути відсортовані)"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize_latencies(latencies: list) -> dict:
+    """p50/p90/p99, середнє та крайні значення (секунди)"""
+    values = sorted(latencies)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'min': round(values[0], 4),
+        'p50': round(percentile(values, 0.50), 4),
+        'p90': round(percentile(values, 0.90), 4),
+        'p99': round(percentile(values, 0.99), 4),
+        'max': round(values[-1], 4),
+        'mean': round(sum(values) / len(values), 4),
+    }
+
+
+def resource_snapshot() -> dict:
+    """CPU процесу (з потоками), CPU дочірніх процесів (FFmpeg) та пікова пам'ять"""
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # ru_maxrss у Linux - кілобайти, у macOS - байти
+    peak_rss = own.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return {
+        'wall': time.perf_counter(),
+        'cpu': own.ru_utime + own.ru_stime,
+        'cpu_children': children.ru_utime + children.ru_stime,
+        'peak_rss_mb': round(peak_rss / 1024 / 1024, 1),
+    }
+
+
+def run_metadata(args: dict) -> dict:
+    """Коміт, версія Python та параметри запуску - для порівняння результатів"""
+    def git(*command):
+        try:
+            return subprocess.run(['git', *command], cwd=REPO_ROOT, capture_output=True,
+                                  text=True, timeout=10).stdout.strip()
+        except Exception:
+            return ''
+    
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'args': args,
+    }
+
+
+class BenchEnvironment:
+    """
+    Бот з підміненими зовнішніми сервісами
+    
+    Використання:
+        env = BenchEnvironment(...)
+        await env.start()
+        await env.dp.feed_update(env.bot, env.message_update(user_id, text))
+        await env.stop()
+    
+    Args:
+        seed: Зерно каталогу (однакове для серверів і yt-dlp)
+        spotify_latency: Затримка фейкового Spotify API (мс)
+        bot_latency: Затримка фейкового Bot API (мс)
+        audio_seconds: Тривалість згенерованого аудіо
+        download_delay: Імітація завантаження з джерела (секунди на трек)
+        search_delay: Імітація пошуку в джерелі (секунди)
+        unthrottled: Зняти ліміти відправки в Telegram
+        verbose: Не приглушувати логи та print бота
+        local_bot_api: Працювати з Bot API як з локальним сервером (файли за шляхом)
+    """
+    
+    def __init__(self, seed: int = 42, spotify_latency: float = 0.0, bot_latency: float = 0.0,
+                 audio_seconds: float = 5.0, download_delay: float = 0.0, search_delay: float = 0.0,
+                 unthrottled: bool = True, verbose: bool = False, extra_env: dict = None,
+                 local_bot_api: bool = False):
+        self.seed = seed
+        self.spotify_latency = spotify_latency
+        self.bot_latency = bot_latency
+        self.audio_seconds = audio_seconds
+        self.download_delay = download_delay
+        self.search_delay = search_delay
+        self.unthrottled = unthrottled
+        self.verbose = verbose
+        self.extra_env = extra_env or {}
+        self.local_bot_api = local_bot_api
+        
+        self.catalog = Catalog(seed=seed)
+        self.workdir = None
+        self.main = None
+        self.dp = None
+        self.bot = None
+        self._servers = None
+        self._stdout = None
+        self._old_cwd = None
+        self._update_id = 0
+        self._message_id = 0
+        self.spotify_url = None
+        self.bot_api_url = None
+    
+    async def start(self) -> None:
+        self.workdir = tempfile.mkdtemp(prefix='sluhay-bench-')
+        self._old_cwd = os.getcwd()
+        os.chdir(self.workdir)
+        if str(REPO_ROOT) not in sys.path:
+            sys.path.insert(0, str(REPO_ROOT))
+        
+        spotify_port, bot_port = free_port(), free_port()
+        self.spotify_url = f"http://127.0.0.1:{spotify_port}"
+        self.bot_api_url = f"http://127.0.0.1:{bot_port}"
+        await self._start_servers(spotify_port, bot_port)
+        
+        env = {
+            'TELEGRAM_BOT_TOKEN': BENCH_TOKEN,
+            'SPOTIFY_CLIENT_ID': 'bench',
+            'SPOTIFY_CLIENT_SECRET': 'bench',
+        }
+        if self.unthrottled:
+            env.update(UNTHROTTLED_ENV)
+        if not shutil.which(os.environ.get('FFMPEG_PATH', 'ffmpeg')):
+            env['FFMPEG_PATH'] = self._write_fake_ffmpeg()
+        env.update(self.extra_env)
+        os.environ.update(env)
+        
+        if not self.verbose:
+            self._stdout = contextlib.redirect_stdout(open(os.devnull, 'w', encoding='utf-8'))
+            self._stdout.__enter__()
+        
+        self._write_top50()
+        import main
+        self._patch(main)
+        if not self.verbose:
+            logging.getLogger().setLevel(logging.WARNING)
+    
+    async def _start_servers(self, spotify_port: int, bot_port: int) -> None:
+        self._servers = await asyncio.create_subprocess_exec(
+            sys.executable, '-m', 'benchmarks.fake_servers',
+            '--spotify-port', str(spotify_port), '--bot-port', str(bot_port),
+            '--spotify-latency', str(self.spotify_latency), '--bot-latency', str(self.bot_latency),
+            '--seed', str(self.seed),
+            cwd=str(REPO_ROOT), stdout=asyncio.subprocess.PIPE,
+        )
+        line = await asyncio.wait_for(self._servers.stdout.readline(), timeout=30)
+        if line.strip() != b'READY':
+            raise RuntimeError(f"Фейкові сервери не запустились: {line!r}")
+    
+    def _write_top50(self) -> None:
+        """top50.json у робочій папці - перші 50 треків каталогу"""
+        tracks = [
+            {
+                'name': track['name'],
+                'artist': self.catalog.artist_name(track),
+                'spotify_url': f"https://open.spotify.com/track/{track['id']}",
+            }
+            for track in list(self.catalog.tracks.values())[:50]
+        ]
+        with open('top50.json', 'w', encoding='utf-8') as f:
+            json.dump({'tracks': tracks}, f, ensure_ascii=False)
+    
+    def _write_fake_ffmpeg(self) -> str:
+        path = os.path.join(self.workdir, 'fake-ffmpeg')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(FAKE_FFMPEG.format(python=sys.executable))
+        os.chmod(path, 0o755)
+        return path
+    
+    def _patch(self, main) -> None:
+        from spotipy.oauth2 import SpotifyClientCredentials
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+        from benchmarks.fake_ydl import FakeYoutubeDL
+        
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.bot_api_url, is_local=self.local_bot_api))
+        self.dp = main.create_app(session=session)
+        self.bot = main.bot
+        self.main = main
+        
+        SpotifyClientCredentials.OAUTH_TOKEN_URL = f"{self.spotify_url}/api/token"
+        main.spotify.spotify.prefix = f"{self.spotify_url}/v1/"
+        
+        FakeYoutubeDL.configure(self.catalog, self.audio_seconds, self.download_delay, self.search_delay)
+        for source in main.audio_sources:
+            source.ydl_factory = FakeYoutubeDL
+        main.ydl_pool.factory = FakeYoutubeDL
+    
+    async def stop(self) -> None:
+        if self.bot is not None:
+            await self.bot.session.close()
+        if self.main is not None:
+            self.main.download_pool.shutdown()
+            self.main.ydl_pool.close()
+        if self._servers is not None and self._servers.returncode is None:
+            self._servers.terminate()
+            await self._servers.wait()
+        if self._stdout is not None:
+            self._stdout.__exit__(None, None, None)
+            self._stdout = None
+        if self._old_cwd:
+            os.chdir(self._old_cwd)
+        if self.workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+    
+    # ---------- Статистика фейкового Bot API ----------
+    
+    async def bot_stats(self) -> dict:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{self.bot_api_url}/stats") as resp:
+                return await resp.json()
+    
+    async def reset_bot_stats(self) -> None:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"{self.bot_api_url}/stats/reset") as resp:
+                await resp.read()
+    
+    # ---------- Оновлення Telegram ----------
+    
+    def _user(self, user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': f"Bench {user_id}", 'language_code': 'uk'}
+    
+    def _next_ids(self) -> tuple[int, int]:
+        self._update_id += 1
+        self._message_id += 1
+        return self._update_id, self._message_id
+    
+    def message_update(self, user_id: int, text: str):
+        """Текстове повідомлення користувача в особистому чаті"""
+        from aiogram.types import Update
+        update_id, message_id = self._next_ids()
+        return Update.model_validate({
+            'update_id': update_id,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'from': self._user(user_id),
+                'text': text,
+            },
+        }, context={'bot': self.bot})
+    
+    def callback_update(self, user_id: int, data: str):
+        """Натискання inline-кнопки під повідомленням бота"""
+        from aiogram.types import Update
+        update_id, message_id = self._next_ids()
+        return Update.model_validate({
+            'update_id': update_id,
+            'callback_query': {
+                'id': str(update_id),
+                'from': self._user(user_id),
+                'chat_instance': str(user_id),
+                'data': data,
+                'message': {
+                    'message_id': message_id,
+                    'date': int(time.time()),
+                    'chat': {'id': user_id, 'type': 'private'},
+                    'from': {'id': 1000000, 'is_bot': True, 'first_name': 'Sluhay Bench'},
+                    'text': '🎵 Sluhay',
+                },
+            },
+        }, context={'bot': self.bot})
+
+
+def write_results(path: str, results: dict) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,300 @@
+"""
+Навантажувальний тест Dispatcher з синтетичними користувачами
+
+Користувачі приходять потоком Пуассона (або всі одразу) і проходять
+типові сценарії через ті самі F.data-маршрути, що й справжні кнопки:
+ТОП-50, збережені, пошук, меню налаштувань, посилання Spotify.
+
+    python -m benchmarks.load --users 500 --rate 0 --mix top50=4,favorites=2,search=3,browse=1
+    python -m benchmarks.load --users 300 --rate 20 --think 1.5 --output load.json
+
+Звіт: затримка кожного маршруту, затримка event loop, помилки (винятки
+хендлерів та повідомлення "❌" у фейковому Bot API), CPU та пам'ять.
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+from collections import defaultdict
+
+from benchmarks.harness import (
+    BenchEnvironment, summarize_latencies, resource_snapshot, run_metadata, write_results,
+)
+
+
+DEFAULT_MIX = 'top50=4,favorites=2,search=3,browse=2,link=1'
+TOP50_SIZE = 50
+FAVORITES_PER_USER = 3
+
+
+# ---------- Сценарії користувачів ----------
+# Кожен сценарій - список кроків (тип, дані, назва маршруту)
+
+def _popular_index(rng: random.Random, size: int) -> int:
+    """Індекс за законом Ципфа: популярні треки запитують частіше"""
+    weights = [1 / (rank + 1) for rank in range(size)]
+    return rng.choices(range(size), weights=weights)[0]
+
+
+def session_top50(env, rng: random.Random, user_id: int) -> list:
+    page = rng.randint(0, TOP50_SIZE // 10 - 1)
+    steps = [('message', '/start', 'cmd_start'), ('callback', 'top50', 'top50')]
+    if page:
+        steps.append(('callback', f"top50_page_{page}", 'top50_page'))
+    index = page * 10 + _popular_index(rng, 10)
+    steps.append(('callback', f"top50_track_{index}", 'top50_track'))
+    return steps
+
+
+def session_favorites(env, rng: random.Random, user_id: int) -> list:
+    return [
+        ('callback', 'favorites', 'favorites'),
+        ('callback', 'fav_tracks', 'fav_category'),
+        ('callback', f"load_fav_track_{rng.randrange(FAVORITES_PER_USER)}_0", 'load_fav'),
+    ]
+
+
+def session_search(env, rng: random.Random, user_id: int) -> list:
+    tracks = list(env.catalog.tracks.values())
+    track = tracks[_popular_index(rng, len(tracks))]
+    return [
+        ('callback', 'search', 'search'),
+        ('callback', 'search_track', 'search_track'),
+        ('message', env.catalog.search_query(track), 'process_track_search'),
+    ]
+
+
+def session_browse(env, rng: random.Random, user_id: int) -> list:
+    return [
+        ('message', '/start', 'cmd_start'),
+        ('callback', 'settings', 'settings'),
+        ('callback', 'set_bitrate', 'set_bitrate'),
+        ('callback', f"bitrate_{rng.choice([96, 128, 192, 320])}", 'bitrate'),
+        ('callback', 'profile', 'profile'),
+        ('callback', 'back_to_main', 'back_to_main'),
+    ]
+
+
+def session_link(env, rng: random.Random, user_id: int) -> list:
+    tracks = list(env.catalog.tracks.values())
+    track = tracks[_popular_index(rng, len(tracks))]
+    return [('message', f"https://open.spotify.com/track/{track['id']}", 'handle_message')]
+
+
+SESSIONS = {
+    'top50': session_top50,
+    'favorites': session_favorites,
+    'search': session_search,
+    'browse': session_browse,
+    'link': session_link,
+}
+
+
+def parse_mix(value: str) -> dict:
+    """"top50=4,search=1" -> {'top50': 4.0, 'search': 1.0}"""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SESSIONS:
+            raise SystemExit(f"Невідомий сценарій у --mix: {name} ({', '.join(SESSIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def seed_favorites(env, user_ids: list) -> None:
+    """Збережені треки для користувачів сценарію favorites (один запис у файл)"""
+    tracks = list(env.catalog.tracks.values())
+    for user_id in user_ids:
+        settings = env.main.get_user_settings(user_id)
+        settings['favorites']['tracks'] = [
+            {
+                'name': track['name'],
+                'artist': env.catalog.artist_name(track),
+                'url': f"https://open.spotify.com/track/{track['id']}",
+                'saved_at': '2024-01-01 00:00:00',
+            }
+            for track in tracks[user_id % 50:user_id % 50 + FAVORITES_PER_USER]
+        ]
+    env.main.save_user_settings()
+
+
+# ---------- Вимірювання ----------
+
+class LoopLagMonitor:
+    """Затримка event loop: наскільки пізніше запланованого прокидається sleep()"""
+    
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+    
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+    
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class LoadStats:
+    """Затримки та помилки по маршрутах"""
+    
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.exceptions = defaultdict(lambda: defaultdict(int))
+        self.sessions = defaultdict(lambda: {'started': 0, 'completed': 0})
+        self.updates = 0
+    
+    def route_report(self) -> dict:
+        report = {}
+        for route in sorted(self.latencies):
+            report[route] = {
+                'latency': summarize_latencies(self.latencies[route]),
+                'exceptions': dict(self.exceptions.get(route, {})),
+            }
+        return report
+
+
+async def run_session(env, stats: LoadStats, name: str, steps: list, user_id: int,
+                      rng: random.Random, think: float) -> None:
+    stats.sessions[name]['started'] += 1
+    for index, (kind, data, route) in enumerate(steps):
+        if index and think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+        update = env.message_update(user_id, data) if kind == 'message' else env.callback_update(user_id, data)
+        started = time.perf_counter()
+        try:
+            await env.dp.feed_update(env.bot, update)
+        except Exception as e:
+            stats.exceptions[route][type(e).__name__] += 1
+            return
+        finally:
+            stats.latencies[route].append(time.perf_counter() - started)
+            stats.updates += 1
+    stats.sessions[name]['completed'] += 1
+
+
+async def run(args: argparse.Namespace) -> dict:
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    env = BenchEnvironment(
+        seed=args.seed, spotify_latency=args.spotify_latency, bot_latency=args.bot_latency,
+        audio_seconds=args.audio_seconds, download_delay=args.download_delay,
+        search_delay=args.search_delay, unthrottled=not args.throttled, verbose=args.verbose,
+    )
+    await env.start()
+    try:
+        # Розподіляємо користувачів по сценаріях заздалегідь (відтворюваність)
+        names = rng.choices(list(mix), weights=list(mix.values()), k=args.users)
+        users = [(name, 200000 + index) for index, name in enumerate(names)]
+        seed_favorites(env, [user_id for name, user_id in users if name == 'favorites'])
+        await env.reset_bot_stats()
+        
+        stats = LoadStats()
+        monitor = LoopLagMonitor(args.lag_interval)
+        monitor.start()
+        before = resource_snapshot()
+        
+        tasks = []
+        for name, user_id in users:
+            session_rng = random.Random(f"{args.seed}-{user_id}")
+            steps = SESSIONS[name](env, session_rng, user_id)
+            tasks.append(asyncio.create_task(
+                run_session(env, stats, name, steps, user_id, session_rng, args.think)
+            ))
+            if args.rate:
+                await asyncio.sleep(rng.expovariate(args.rate))
+        arrivals_done = time.perf_counter()
+        await asyncio.gather(*tasks)
+        
+        after = resource_snapshot()
+        await monitor.stop()
+        bot_stats = await env.bot_stats()
+    finally:
+        await env.stop()
+    
+    wall = after['wall'] - before['wall']
+    all_latencies = [value for values in stats.latencies.values() for value in values]
+    exception_count = sum(sum(counts.values()) for counts in stats.exceptions.values())
+    error_replies = sum(bot_stats.get('error_replies', {}).values())
+    return {
+        'meta': run_metadata(vars(args)),
+        'summary': {
+            'users': args.users,
+            'mix': mix,
+            'wall_sec': round(wall, 3),
+            'arrival_sec': round(arrivals_done - before['wall'], 3),
+            'updates': stats.updates,
+            'updates_per_sec': round(stats.updates / wall, 3) if wall else None,
+            'latency': summarize_latencies(all_latencies),
+            'loop_lag': summarize_latencies(monitor.samples),
+            'exceptions': exception_count,
+            'error_replies': error_replies,
+            'error_rate': round((exception_count + error_replies) / stats.updates, 4) if stats.updates else 0.0,
+            'cpu_sec': round(after['cpu'] - before['cpu'], 3),
+            'cpu_children_sec': round(after['cpu_children'] - before['cpu_children'], 3),
+            'peak_rss_mb': after['peak_rss_mb'],
+        },
+        'sessions': dict(stats.sessions),
+        'routes': stats.route_report(),
+        'bot_api': {'calls': bot_stats['calls'], 'error_replies': bot_stats.get('error_replies', {})},
+    }
+
+
+def print_summary(report: dict) -> None:
+    summary = report['summary']
+    lag = summary['loop_lag']
+    print(
+        f"{summary['users']} користувачів, {summary['updates']} оновлень за {summary['wall_sec']}s "
+        f"({summary['updates_per_sec']}/s); помилки {summary['error_rate']:.2%}; "
+        f"loop lag p99 {lag.get('p99')}s max {lag.get('max')}s",
+        file=sys.stderr,
+    )
+    for route, data in report['routes'].items():
+        latency = data['latency']
+        print(f"  {route:<22} n={latency['count']:<5} p50 {latency['p50']}s  p99 {latency['p99']}s", file=sys.stderr)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Навантажувальний тест Sluhay з синтетичними користувачами')
+    parser.add_argument('--users', type=int, default=100, help='Скільки користувачів (сесій) запустити')
+    parser.add_argument('--rate', type=float, default=10.0,
+                        help='Нових користувачів на секунду (0 - всі одночасно)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"Ваги сценаріїв ({', '.join(SESSIONS)})")
+    parser.add_argument('--think', type=float, default=0.5, help='Середня пауза між діями користувача (с)')
+    parser.add_argument('--lag-interval', type=float, default=0.05, help='Період вимірювання затримки loop (с)')
+    parser.add_argument('--output', default='load-results.json', help='Файл результатів (JSON)')
+    parser.add_argument('--throttled', action='store_true', help='Залишити ліміти відправки в Telegram')
+    parser.add_argument('--audio-seconds', type=float, default=5.0, help='Тривалість згенерованого аудіо')
+    parser.add_argument('--download-delay', type=float, default=0.0, help='Імітація завантаження (с/трек)')
+    parser.add_argument('--search-delay', type=float, default=0.0, help='Імітація пошуку в джерелі (с)')
+    parser.add_argument('--spotify-latency', type=float, default=0.0, help='Затримка Spotify API (мс)')
+    parser.add_argument('--bot-latency', type=float, default=0.0, help='Затримка Bot API (мс)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help='Показувати логи бота')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    write_results(args.output, report)
+    print_summary(report)
+    print(f"Результати записано у {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
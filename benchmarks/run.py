@@ -0,0 +1,228 @@
+"""
+Офлайн-бенчмарк обробників бота
+
+Проганяє handle_track, handle_album, handle_playlist та імпорт плейлистів
+через Dispatcher з фейковими Spotify, yt-dlp та Bot API і записує
+пропускну здатність, p50/p99, CPU та пікову пам'ять у JSON:
+
+    python -m benchmarks.run --scenario track,album --requests 50 --concurrency 10 --output bench.json
+
+Результати різних комітів порівнюються за полем results[].latency.
+"""
+import sys
+import time
+import asyncio
+import argparse
+from dataclasses import dataclass
+
+from benchmarks.harness import (
+    BenchEnvironment, summarize_latencies, resource_snapshot, run_metadata, write_results,
+)
+
+
+@dataclass
+class Scenario:
+    """
+    Сценарій бенчмарку
+    
+    Args:
+        name: Назва сценарію
+        description: Що саме вимірюється
+        callback: Кнопка, яку користувач натискає перед повідомленням (або None)
+        make_text: (env, номер запиту) -> текст повідомлення
+        check: (env, статистика чату) -> чи запит оброблено успішно
+    """
+    name: str
+    description: str
+    callback: str | None
+    make_text: callable
+    check: callable
+
+
+def _nth(collection: dict, index: int) -> dict:
+    items = list(collection.values())
+    return items[index % len(items)]
+
+
+def _import_done(env, chat: dict) -> bool:
+    return 'Імпорт завершено' in (chat.get('last_text') or '')
+
+
+SCENARIOS = {
+    scenario.name: scenario for scenario in [
+        Scenario(
+            'track', 'Посилання на трек Spotify (handle_track)', None,
+            lambda env, i: f"https://open.spotify.com/track/{_nth(env.catalog.tracks, i)['id']}",
+            lambda env, chat: chat['audio'] == 1,
+        ),
+        Scenario(
+            'track_search', 'Текстовий пошук треку (handle_track, is_search)', None,
+            lambda env, i: env.catalog.search_query(_nth(env.catalog.tracks, i)),
+            lambda env, chat: chat['audio'] == 1,
+        ),
+        Scenario(
+            'album', 'Посилання на альбом Spotify (handle_album)', None,
+            lambda env, i: f"https://open.spotify.com/album/{_nth(env.catalog.albums, i)['id']}",
+            lambda env, chat: chat['audio'] == len(next(iter(env.catalog.albums.values()))['track_ids']),
+        ),
+        Scenario(
+            'playlist', 'Посилання на плейлист Spotify (handle_playlist)', None,
+            lambda env, i: f"https://open.spotify.com/playlist/{_nth(env.catalog.playlists, i)['id']}",
+            lambda env, chat: chat['audio'] == len(next(iter(env.catalog.playlists.values()))['track_ids']),
+        ),
+        Scenario(
+            'import_spotify', 'Імпорт плейлиста Spotify у збережені', 'import_spotify',
+            lambda env, i: f"https://open.spotify.com/playlist/{_nth(env.catalog.playlists, i)['id']}",
+            _import_done,
+        ),
+        Scenario(
+            'import_youtube', 'Імпорт плейлиста YouTube Music (yt-dlp + пошук у Spotify)', 'import_youtube',
+            lambda env, i: f"https://music.youtube.com/playlist?list={_nth(env.catalog.playlists, i)['id']}",
+            _import_done,
+        ),
+        Scenario(
+            'import_soundcloud', 'Імпорт плейлиста SoundCloud (yt-dlp + пошук у Spotify)', 'import_soundcloud',
+            lambda env, i: f"https://soundcloud.com/bench/sets/{_nth(env.catalog.playlists, i)['id']}",
+            _import_done,
+        ),
+    ]
+}
+
+
+async def run_request(env: BenchEnvironment, scenario: Scenario, user_id: int, index: int) -> tuple[float, str | None]:
+    """Один запит користувача; повертає (тривалість, тип помилки або None)"""
+    started = time.perf_counter()
+    try:
+        if scenario.callback:
+            await env.dp.feed_update(env.bot, env.callback_update(user_id, scenario.callback))
+        await env.dp.feed_update(env.bot, env.message_update(user_id, scenario.make_text(env, index)))
+    except Exception as e:
+        return time.perf_counter() - started, type(e).__name__
+    return time.perf_counter() - started, None
+
+
+async def run_scenario(env: BenchEnvironment, scenario: Scenario, requests: int, concurrency: int,
+                       first_user_id: int, first_index: int = 0) -> dict:
+    """
+    Проганяє сценарій і повертає зведення
+    
+    first_index зсуває вибір треків у каталозі, щоб прогрів не наповнював
+    кеш відповідностей для вимірюваних запитів.
+    """
+    await env.reset_bot_stats()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], {}
+    
+    async def worker(index: int):
+        async with semaphore:
+            latency, error = await run_request(env, scenario, first_user_id + index, first_index + index)
+            latencies.append(latency)
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+    
+    before = resource_snapshot()
+    await asyncio.gather(*(worker(index) for index in range(requests)))
+    after = resource_snapshot()
+    
+    stats = await env.bot_stats()
+    failed = 0
+    for index in range(requests):
+        chat = stats['chats'].get(str(first_user_id + index))
+        if not chat or not scenario.check(env, chat):
+            failed += 1
+    
+    wall = after['wall'] - before['wall']
+    cpu = after['cpu'] - before['cpu']
+    return {
+        'scenario': scenario.name,
+        'description': scenario.description,
+        'requests': requests,
+        'concurrency': concurrency,
+        'ok': requests - failed,
+        'failed': failed,
+        'exceptions': errors,
+        'wall_sec': round(wall, 3),
+        'throughput_rps': round(requests / wall, 3) if wall else None,
+        'latency': summarize_latencies(latencies),
+        'cpu_sec': round(cpu, 3),
+        'cpu_children_sec': round(after['cpu_children'] - before['cpu_children'], 3),
+        'cpu_utilization': round(cpu / wall, 3) if wall else None,
+        'peak_rss_mb': after['peak_rss_mb'],
+        'bot_api_calls': stats['calls'],
+        'upload_mb': round(sum(chat['upload_bytes'] for chat in stats['chats'].values()) / 1024 / 1024, 2),
+        'local_file_mb': round(sum(chat['local_bytes'] for chat in stats['chats'].values()) / 1024 / 1024, 2),
+    }
+
+
+def print_summary(result: dict) -> None:
+    latency = result['latency']
+    print(
+        f"{result['scenario']:<18} ok {result['ok']}/{result['requests']}  "
+        f"{result['throughput_rps']} req/s  p50 {latency.get('p50')}s  p99 {latency.get('p99')}s  "
+        f"cpu {result['cpu_sec']}s (+{result['cpu_children_sec']}s ffmpeg)  rss {result['peak_rss_mb']} MB",
+        file=sys.stderr,
+    )
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Офлайн-бенчмарк Sluhay з фейковими бекендами')
+    parser.add_argument('--scenario', default='track',
+                        help=f"Сценарії через кому або all ({', '.join(SCENARIOS)})")
+    parser.add_argument('--requests', type=int, default=20, help='Запитів на сценарій')
+    parser.add_argument('--concurrency', type=int, default=5, help='Одночасних користувачів')
+    parser.add_argument('--warmup', type=int, default=1, help='Запитів прогріву (не враховуються)')
+    parser.add_argument('--output', default='bench-results.json', help='Файл результатів (JSON)')
+    parser.add_argument('--throttled', action='store_true', help='Залишити ліміти відправки в Telegram')
+    parser.add_argument('--audio-seconds', type=float, default=5.0, help='Тривалість згенерованого аудіо')
+    parser.add_argument('--download-delay', type=float, default=0.0, help='Імітація завантаження (с/трек)')
+    parser.add_argument('--search-delay', type=float, default=0.0, help='Імітація пошуку в джерелі (с)')
+    parser.add_argument('--spotify-latency', type=float, default=0.0, help='Затримка Spotify API (мс)')
+    parser.add_argument('--bot-latency', type=float, default=0.0, help='Затримка Bot API (мс)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--verbose', action='store_true', help='Показувати логи бота')
+    parser.add_argument('--local-bot-api', action='store_true',
+                        help='Bot API у локальному режимі: аудіо передається шляхом file://')
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> dict:
+    names = list(SCENARIOS) if args.scenario == 'all' else [name.strip() for name in args.scenario.split(',')]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Невідомі сценарії: {', '.join(unknown)}")
+    
+    env = BenchEnvironment(
+        seed=args.seed, spotify_latency=args.spotify_latency, bot_latency=args.bot_latency,
+        audio_seconds=args.audio_seconds, download_delay=args.download_delay,
+        search_delay=args.search_delay, unthrottled=not args.throttled, verbose=args.verbose,
+        local_bot_api=args.local_bot_api,
+    )
+    await env.start()
+    results = []
+    try:
+        # Користувачі кожного сценарію не перетинаються (окремі чати та налаштування)
+        next_user_id = 100000
+        for name in names:
+            scenario = SCENARIOS[name]
+            if args.warmup:
+                await run_scenario(env, scenario, args.warmup, 1, next_user_id)
+                next_user_id += args.warmup
+            result = await run_scenario(env, scenario, args.requests, args.concurrency, next_user_id, args.warmup)
+            next_user_id += args.requests
+            results.append(result)
+            print_summary(result)
+    finally:
+        await env.stop()
+    
+    return {'meta': run_metadata(vars(args)), 'results': results}
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run(args))
+    write_results(args.output, report)
+    print(f"Результати записано у {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import os
+import logging
+from pathlib import Path
+from aiogram.types import FSInputFile
+import config
+
+
+logger = logging.getLogger(__name__)
+
+
+def create_session():
+    """
+    Сесія aiogram для власного Bot API сервера (TELEGRAM_API_URL)
+    
+    У локальному режимі (telegram-bot-api --local) сервер сам читає файли з
+    диска за шляхом file://..., тож MP3 не передається multipart-запитом,
+    а ліміт відправки - 2000 МБ замість 50 МБ.
+    
+    Returns:
+        AiohttpSession або None (публічний api.telegram.org)
+    """
+    if not config.TELEGRAM_API_URL:
+        return None
+    
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer, BareFilesPathWrapper, SimpleFilesPathWrapper
+    
+    wrapper = BareFilesPathWrapper()
+    if config.TELEGRAM_API_FILES_DIR:
+        # Сервер в іншому контейнері бачить папку завантажень за іншим шляхом
+        wrapper = SimpleFilesPathWrapper(
+            server_path=Path(config.TELEGRAM_API_FILES_DIR),
+            local_path=Path(os.path.abspath(config.DOWNLOADS_DIR)),
+        )
+    api = TelegramAPIServer.from_base(
+        config.TELEGRAM_API_URL,
+        is_local=config.TELEGRAM_API_LOCAL,
+        wrap_local_file=wrapper,
+    )
+    mode = "локальний" if api.is_local else "звичайний"
+    logger.info(f"Bot API сервер: {config.TELEGRAM_API_URL} ({mode} режим)")
+    return AiohttpSession(api=api)
+
+
+def is_local(bot) -> bool:
+    """Чи працює бот з Bot API сервером у локальному режимі"""
+    return bool(getattr(bot.session.api, 'is_local', False))
+
+
+def upload_limit_bytes(bot) -> int:
+    """Максимальний розмір файлу, який можна відправити через поточний сервер"""
+    limit_mb = config.TELEGRAM_LOCAL_UPLOAD_LIMIT_MB if is_local(bot) else config.TELEGRAM_UPLOAD_LIMIT_MB
+    return limit_mb * 1024 * 1024
+
+
+def audio_input(bot, path: str):
+    """
+    Аудіо для send_audio / InputMediaAudio
+    
+    У локальному режимі - шлях file://, який сервер прочитає з диска;
+    інакше (або якщо файл лежить поза папкою, яку бачить сервер, наприклад
+    у tmpfs) - звичайне завантаження FSInputFile.
+    """
+    if is_local(bot):
+        try:
+            server_path = bot.session.api.wrap_local_file.to_server(os.path.abspath(path))
+        except ValueError:
+            return FSInputFile(path)
+        return Path(server_path).as_uri()
+    return FSInputFile(path)
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import config
+import metrics
+import bot_api
+from audio_store import audio_store
+from send_scheduler import send_scheduler, PRIORITY_BULK
+
+
+logger = logging.getLogger(__name__)
+
+
+class CacheUploader:
+    """
+    Попереднє завантаження треків у службовий чат (CACHE_CHAT_ID)
+    
+    Альбом чи плейлист раніше відправлявся медіа-групою з 10 файлів в одному
+    multipart-запиті, а після помилки кожен файл завантажувався ще раз.
+    Тепер трек відправляється в службовий чат одразу після завантаження,
+    паралельно з наступними, і з відповіді береться file_id. Медіа-група
+    посилається на file_id: запит не містить байтів, а невдалу групу можна
+    повторити одразу.
+    
+    Без CACHE_CHAT_ID нічого не робить - файли відправляються як раніше.
+    """
+    
+    def __init__(self, chat_id: int = None, concurrency: int = None):
+        self.chat_id = chat_id if chat_id is not None else config.CACHE_CHAT_ID
+        self.concurrency = concurrency or config.CACHE_UPLOAD_CONCURRENCY
+        self._semaphore = None
+        self._rate_set = False
+        
+        # Статистика для /status
+        self.uploaded = 0
+        self.failed = 0
+        self.uploaded_bytes = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.chat_id is not None
+    
+    def start(self, bot, file_info: dict) -> None:
+        """
+        Починає завантаження файлу у фоні; результат - file_info['upload']
+        
+        Args:
+            bot: Bot, через який відправляти
+            file_info: Словник треку з downloaded_files (path, title, performer, duration_sec)
+        """
+        if not self.enabled:
+            return
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if not self._rate_set:
+            send_scheduler.set_chat_rate(
+                self.chat_id, config.CACHE_CHAT_RATE, self.concurrency, in_flight=self.concurrency
+            )
+            self._rate_set = True
+        file_info['upload'] = asyncio.create_task(self._upload(bot, file_info))
+    
+    async def _upload(self, bot, file_info: dict) -> str | None:
+        # Такий самий вміст уже відправлявся - завантажувати нічого
+        known = audio_store.file_id_for(file_info['path'])
+        if known:
+            return known
+        async with self._semaphore:
+            try:
+                sent = await send_scheduler.send(
+                    self.chat_id,
+                    lambda: bot.send_audio(
+                        self.chat_id,
+                        audio=bot_api.audio_input(bot, file_info['path']),
+                        title=file_info['title'],
+                        performer=file_info['performer'],
+                        duration=file_info.get('duration_sec') or None,
+                        disable_notification=True,
+                    ),
+                    priority=PRIORITY_BULK
+                )
+            except Exception as e:
+                self.failed += 1
+                logger.warning(f"Не вдалося завантажити {file_info['title']} у чат кешу: {e}",
+                               extra={'rate_key': 'cache_upload.failed'})
+                return None
+        if sent is None or sent.audio is None:
+            self.failed += 1
+            return None
+        size = int(file_info.get('size_mb', 0) * 1024 * 1024)
+        self.uploaded += 1
+        self.uploaded_bytes += size
+        metrics.upload_bytes.inc(size, kind='cache')
+        audio_store.set_file_id(file_info['path'], sent.audio.file_id)
+        return sent.audio.file_id
+    
+    @staticmethod
+    async def file_id(file_info: dict) -> str | None:
+        """Дочекатися file_id треку (None - не завантажено, відправляти файлом)"""
+        task = file_info.get('upload')
+        if task is None:
+            return audio_store.file_id_for(file_info['path'])
+        try:
+            return await task
+        except asyncio.CancelledError:
+            return None
+    
+    @staticmethod
+    def cancel(downloaded_files: list) -> None:
+        """Скасовує незавершені завантаження (при скасуванні альбому чи плейлиста)"""
+        for file_info in downloaded_files:
+            task = file_info.get('upload')
+            if task is not None and not task.done():
+                task.cancel()
+    
+    def snapshot(self) -> dict:
+        return {
+            'chat_id': self.chat_id,
+            'uploaded': self.uploaded,
+            'failed': self.failed,
+            'uploaded_bytes': self.uploaded_bytes,
+        }
+
+
+cache_uploader = CacheUploader()
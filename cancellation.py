@@ -0,0 +1,63 @@
+import threading
+
+
+class DownloadCancelledError(Exception):
+    """Завантаження скасовано користувачем"""
+
+
+class CancelToken:
+    """
+    Токен кооперативного скасування
+    
+    Передається в завантажувач; yt-dlp перевіряє його в progress hook,
+    FFmpeg-процес завершується через зареєстрований callback. Дочірні
+    токени (child) скасовуються разом з батьківським.
+    """
+    
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+    
+    def cancel(self) -> None:
+        """Скасовує токен і викликає всі зареєстровані callbacks"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Помилка в callback скасування: {e}")
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+    
+    def wait(self, timeout: float = None) -> bool:
+        return self._event.wait(timeout)
+    
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise DownloadCancelledError("Завантаження скасовано")
+    
+    def add_callback(self, callback) -> None:
+        """Реєструє функцію, яка буде викликана при скасуванні (одразу, якщо вже скасовано)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+    
+    def remove_callback(self, callback) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+    
+    def child(self) -> 'CancelToken':
+        """Створює дочірній токен, який скасовується разом з цим"""
+        token = CancelToken()
+        self.add_callback(token.cancel)
+        return token
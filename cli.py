@@ -0,0 +1,258 @@
+"""
+Пакетне завантаження без Telegram
+
+Той самий конвеєр, що й у бота (Spotify -> SoundCloud / YouTube Music ->
+FFmpeg, пул завантажень, сховище аудіо), запущений з командного рядка:
+    
+    python cli.py https://open.spotify.com/album/... https://open.spotify.com/track/...
+    python cli.py --file queries.txt --output music --bitrate 192
+    python cli.py --file top.txt --discard          # лише прогріти кеші
+
+Рядок файлу - посилання Spotify (трек, альбом, плейлист) або пошуковий
+запит "Виконавець - Назва"; порожні рядки та коментарі (#) пропускаються.
+Токен бота не потрібен, лише SPOTIFY_CLIENT_ID / SPOTIFY_CLIENT_SECRET.
+Для кожного треку друкується час, джерело та розмір, наприкінці - підсумок.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import contextlib
+import config
+from logging_setup import setup_logging
+from cancellation import CancelToken, DownloadCancelledError
+
+
+class Engine:
+    """Сервіси конвеєра, як у create_app() бота"""
+    
+    def __init__(self, workers: int = None):
+        from spotify_service import SpotifyService
+        from soundcloud_downloader import SoundCloudDownloader
+        from youtube_downloader import YouTubeMusicDownloader
+        from hedged_downloader import HedgedDownloader
+        from download_pool import DownloadPool
+        from audio_store import audio_store
+        
+        if config.AUDIO_STORE_ENABLED:
+            audio_store.load()
+        self.spotify = SpotifyService()
+        self.sources = [SoundCloudDownloader()]
+        if config.ENABLE_YOUTUBE_FALLBACK:
+            self.sources.append(YouTubeMusicDownloader())
+        self.downloader = HedgedDownloader(self.sources)
+        self.pool = DownloadPool(workers or config.DOWNLOAD_WORKERS)
+    
+    def close(self) -> None:
+        from ydl_pool import ydl_pool
+        self.pool.shutdown()
+        ydl_pool.close()
+
+
+def read_inputs(args: argparse.Namespace) -> list:
+    """Посилання та запити з аргументів і файлу (--file, '-' - stdin)"""
+    inputs = list(args.inputs)
+    if args.file:
+        with (sys.stdin if args.file == '-' else open(args.file, 'r', encoding='utf-8')) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    inputs.append(line)
+    return inputs
+
+
+def expand_input(engine: Engine, value: str) -> list:
+    """
+    Перетворює посилання чи запит на список треків
+    
+    Returns:
+        Список (вхідний рядок, track_info або None, пошуковий запит)
+    """
+    spotify = engine.spotify
+    if "spotify.com/album/" in value or "spotify:album:" in value:
+        info = spotify.get_album_info(value)
+        return [(value, track, track['search_query']) for track in info['tracks']] if info else []
+    if "spotify.com/playlist/" in value or "spotify:playlist:" in value:
+        info = spotify.get_playlist_info(value)
+        return [(value, track, track['search_query']) for track in info['tracks']] if info else []
+    if "spotify.com/track/" in value or "spotify:track:" in value:
+        track = spotify.get_track_info(value)
+        return [(value, track, track['search_query'])] if track else []
+    # Пошуковий запит: як у боті, спершу шукаємо трек у Spotify
+    track = spotify.search_track(value)
+    return [(value, track, track['search_query'] if track else value)]
+
+
+def output_name(directory: str, track_name: str) -> str:
+    """Вільне ім'я файлу в папці результатів"""
+    base = "".join(c for c in track_name if c.isalnum() or c in (' ', '-', '_', ',', '.', '(', ')')).strip()
+    base = base or 'track'
+    path = os.path.join(directory, f"{base}.mp3")
+    index = 2
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{base} ({index}).mp3")
+        index += 1
+    return path
+
+
+def percentile(values: list, p: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def run_batch(engine: Engine, inputs: list, output_dir: str, bitrate: int, discard: bool = False,
+                    report=None) -> list:
+    """
+    Завантажує всі треки паралельно (DOWNLOAD_WORKERS потоків)
+    
+    Args:
+        engine: Сервіси конвеєра
+        inputs: Посилання Spotify або пошукові запити
+        output_dir: Куди складати MP3
+        bitrate: Бітрейт MP3
+        discard: Видаляти файли після завантаження (прогрів кешів)
+        report: Куди друкувати рядки по треках (за замовчуванням stdout)
+    
+    Returns:
+        Результати по треках (словники)
+    """
+    report = report or sys.stdout
+    cancel_token = CancelToken()
+    
+    tracks = []
+    for value in inputs:
+        started = time.perf_counter()
+        try:
+            expanded = await asyncio.to_thread(expand_input, engine, value)
+        except Exception as e:
+            print(f"❌ {value}: {e}", file=report)
+            continue
+        if not expanded:
+            print(f"❌ Нічого не знайдено: {value}", file=report)
+            continue
+        tracks.extend(expanded)
+        print(f"🔍 {value}: треків {len(expanded)} ({time.perf_counter() - started:.2f} с)", file=report)
+    
+    if not discard:
+        os.makedirs(output_dir, exist_ok=True)
+    total = len(tracks)
+    done = 0
+    
+    async def download(value: str, track_info: dict | None, query: str) -> dict:
+        nonlocal done
+        name = f"{track_info['artists']} - {track_info['name']}" if track_info else query
+        result = {'input': value, 'track': name, 'status': 'error', 'source': None,
+                  'seconds': None, 'size_mb': None, 'path': None}
+        started = time.perf_counter()
+        try:
+            path, source = await engine.pool.run(
+                engine.downloader.download_with_source,
+                query, name, None, bitrate,
+                track_info=track_info,
+                cancel_token=cancel_token,
+            )
+            if path:
+                result.update(status='ok', source=source, size_mb=round(os.path.getsize(path) / 1024 / 1024, 2))
+                if discard:
+                    engine.downloader.cleanup_file(path)
+                else:
+                    result['path'] = output_name(output_dir, name)
+                    shutil.move(path, result['path'])
+            else:
+                result['status'] = 'not_found'
+        except DownloadCancelledError:
+            result['status'] = 'cancelled'
+        except Exception as e:
+            result['error'] = str(e)
+        result['seconds'] = round(time.perf_counter() - started, 3)
+        
+        done += 1
+        mark = '✅' if result['status'] == 'ok' else '❌'
+        details = f"{result['source']}, {result['size_mb']:.2f} МБ" if result['status'] == 'ok' else result['status']
+        print(f"{mark} [{done:>{len(str(total))}}/{total}] {result['seconds']:7.2f} с  {name} ({details})", file=report)
+        return result
+    
+    try:
+        return await asyncio.gather(*(download(*track) for track in tracks))
+    except asyncio.CancelledError:
+        # Ctrl+C: зупиняємо завантаження і FFmpeg у потоках
+        cancel_token.cancel()
+        raise
+
+
+def summarize(results: list, wall: float) -> dict:
+    seconds = [result['seconds'] for result in results if result['status'] == 'ok']
+    return {
+        'tracks': len(results),
+        'ok': len(seconds),
+        'failed': len(results) - len(seconds),
+        'wall_sec': round(wall, 3),
+        'tracks_per_min': round(len(seconds) / wall * 60, 2) if wall else None,
+        'p50_sec': percentile(seconds, 50),
+        'p90_sec': percentile(seconds, 90),
+        'max_sec': max(seconds) if seconds else None,
+        'size_mb': round(sum(result['size_mb'] or 0 for result in results), 2),
+    }
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Пакетне завантаження Sluhay без Telegram')
+    parser.add_argument('inputs', nargs='*', help='Посилання Spotify (трек, альбом, плейлист) або запити')
+    parser.add_argument('--file', help="Файл з посиланнями/запитами, по одному на рядок ('-' - stdin)")
+    parser.add_argument('--output', default='output', help='Папка для MP3')
+    parser.add_argument('--bitrate', type=int, default=128, choices=config.AUDIO_BITRATES, help='Бітрейт MP3')
+    parser.add_argument('--workers', type=int, default=None, help='Потоків завантаження (DOWNLOAD_WORKERS)')
+    parser.add_argument('--discard', action='store_true', help='Не зберігати файли (прогрів кешів, бенчмарк)')
+    parser.add_argument('--json', help='Записати результати по треках у JSON')
+    parser.add_argument('--verbose', action='store_true', help='Показувати print завантажувачів')
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.file:
+        parser.error('потрібні посилання/запити або --file')
+    return args
+
+
+async def main(argv=None) -> int:
+    args = parse_args(argv)
+    setup_logging()
+    config.validate(require_bot_token=False)
+    inputs = read_inputs(args)
+    
+    engine = Engine(args.workers)
+    report = sys.stdout
+    started = time.perf_counter()
+    try:
+        with contextlib.ExitStack() as stack:
+            if not args.verbose:
+                # Завантажувачі пишуть службові print - без --verbose вони не заважають звіту
+                devnull = stack.enter_context(open(os.devnull, 'w'))
+                stack.enter_context(contextlib.redirect_stdout(devnull))
+            results = await run_batch(engine, inputs, args.output, args.bitrate, args.discard, report)
+    except Exception as e:
+        print(f"❌ Пакет перервано: {type(e).__name__}: {e}", file=sys.stderr)
+        return 2
+    finally:
+        engine.close()
+    summary = summarize(results, time.perf_counter() - started)
+    
+    print(
+        f"\nГотово: {summary['ok']}/{summary['tracks']} за {summary['wall_sec']:.1f} с "
+        f"({summary['tracks_per_min']} треків/хв), p50 {summary['p50_sec']} с, p90 {summary['p90_sec']} с, "
+        f"{summary['size_mb']} МБ",
+        file=report,
+    )
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'results': results}, f, ensure_ascii=False, indent=2)
+    return 0 if summary['failed'] == 0 else 1
+
+
+if __name__ == '__main__':
+    try:
+        sys.exit(asyncio.run(main()))
+    except KeyboardInterrupt:
+        sys.exit(130)
@@ -4,9 +4,37 @@ from dotenv import load_dotenv
 # Завантажуємо змінні середовища з .env файлу
 load_dotenv()
 
+
+def _env_bool(name: str, default: bool) -> bool:
+    """Прапорець зі змінної середовища: 1/true/yes/on - увімкнено, 0/false/no/off - вимкнено"""
+    value = os.getenv(name)
+    if value is None or not value.strip():
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
 # Telegram Bot Token
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
+# Власний Bot API сервер (telegram-bot-api); порожньо - публічний api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+TELEGRAM_API_LOCAL = _env_bool("TELEGRAM_API_LOCAL", True)  # Сервер запущено з --local
+TELEGRAM_API_FILES_DIR = os.getenv("TELEGRAM_API_FILES_DIR", "")  # Папка завантажень очима сервера (Docker)
+TELEGRAM_UPLOAD_LIMIT_MB = 50                # Ліміт відправки файлів публічного Bot API
+TELEGRAM_LOCAL_UPLOAD_LIMIT_MB = 2000        # Ліміт у локальному режимі
+
+# Автоматичне зниження якості для треків, що не вміщуються в ліміт відправки
+AUDIO_BITRATES = (64, 96, 128, 192, 320)    # Бітрейти з налаштувань
+AUTO_MIN_BITRATE = 96                       # Нижче не знижуємо - ділимо трек на частини
+UPLOAD_SIZE_MARGIN = 0.95                   # Запас на похибку оцінки розміру
+SPLIT_MAX_PARTS = 10                        # Більше частин - відмова
+
+# Службовий чат для попереднього завантаження треків альбомів і плейлистів
+# (медіа-групи відправляються за file_id). Краще особистий чат з ботом:
+# у групах і каналах Telegram дозволяє лише 20 повідомлень на хвилину
+CACHE_CHAT_ID = int(os.getenv("CACHE_CHAT_ID")) if os.getenv("CACHE_CHAT_ID") else None
+CACHE_CHAT_RATE = float(os.getenv("CACHE_CHAT_RATE", "1.0"))          # Повідомлень на секунду в чат кешу
+CACHE_UPLOAD_CONCURRENCY = int(os.getenv("CACHE_UPLOAD_CONCURRENCY", "3"))  # Одночасних завантажень
+
 # Spotify API credentials
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
@@ -14,12 +42,149 @@ SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET")
 # Папка для завантажень
 DOWNLOADS_DIR = "downloads"
 
-# Перевірка наявності необхідних змінних
-if not TELEGRAM_BOT_TOKEN:
-    raise ValueError("TELEGRAM_BOT_TOKEN не знайдено в .env файлі")
+# Шлях до FFmpeg та кількість потоків для завантажень
+FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
+DOWNLOAD_WORKERS = int(os.getenv("DOWNLOAD_WORKERS", "4"))
+
+# Мінімальний інтервал між редагуваннями статусного повідомлення в одному чаті (секунди)
+PROGRESS_EDIT_INTERVAL = float(os.getenv("PROGRESS_EDIT_INTERVAL", "3"))
+
+# Пошук відповідностей на SoundCloud
+SOUNDCLOUD_CANDIDATES = int(os.getenv("SOUNDCLOUD_CANDIDATES", "5"))  # Скільки кандидатів оцінювати
+MIN_MATCH_SCORE = float(os.getenv("MIN_MATCH_SCORE", "0.35"))          # Мінімальна оцінка відповідності
+RESOLVED_CACHE_FILE = "resolved_tracks.json"                          # Кеш знайдених SoundCloud URL
+YOUTUBE_RESOLVED_CACHE_FILE = "resolved_tracks_youtube.json"          # Кеш знайдених YouTube URL
+
+# Резервне джерело (YouTube Music) запускається, якщо від SoundCloud HEDGE_DELAY_SEC немає прогресу завантаження
+ENABLE_YOUTUBE_FALLBACK = _env_bool("ENABLE_YOUTUBE_FALLBACK", True)
+HEDGE_DELAY_SEC = float(os.getenv("HEDGE_DELAY_SEC", "8"))
+
+# Регулятор навантаження на зовнішні джерела (AIMD + запобіжник)
+GOVERNOR_MAX_CONCURRENCY = int(os.getenv("GOVERNOR_MAX_CONCURRENCY", "8"))   # Макс. паралельних запитів до джерела
+GOVERNOR_WINDOW = 50                        # Скільки останніх запитів враховувати
+GOVERNOR_MIN_REQUESTS = 10                  # Мінімум запитів у вікні для відкриття запобіжника
+GOVERNOR_ERROR_THRESHOLD = 0.5              # Частка помилок, при якій запобіжник відкривається
+GOVERNOR_OPEN_SEC = 30                      # Скільки секунд джерело вважається недоступним
+GOVERNOR_ACQUIRE_TIMEOUT_SEC = 60           # Скільки чекати на вільний слот
+GOVERNOR_DEFAULT_LATENCY_SEC = 30.0         # Цільова затримка за замовчуванням
+GOVERNOR_LATENCY_TARGETS = {                # Цільові затримки по джерелах (секунди)
+    'spotify': 3.0,
+    'soundcloud': 30.0,
+    'youtube': 30.0,
+}
+
+# Планувальник відправки в Telegram (ліміти Bot API)
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "25"))   # Повідомлень на секунду для всього бота
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1.0"))       # Повідомлень на секунду в особистому чаті
+SEND_GROUP_CHAT_RATE = 20 / 60              # Повідомлень на секунду в групі (20 за хвилину)
+SEND_CHAT_BURST = float(os.getenv("SEND_CHAT_BURST", "3"))       # Скільки повідомлень можна відправити в чат підряд
+SEND_CONCURRENCY = int(os.getenv("SEND_CONCURRENCY", "4"))      # Одночасних запитів до Bot API
+SEND_MAX_RETRIES = 3                        # Повтори після 429 (retry_after)
+SEND_QUEUE_WARN_DEPTH = 50                  # Попередження в лог при такій довжині черги
+
+# Черга завантажень (справедливий розподіл між користувачами)
+JOB_MAX_ACTIVE = int(os.getenv("JOB_MAX_ACTIVE", "6"))            # Одночасних задач для всього бота
+JOB_MAX_ACTIVE_PER_USER = 2                 # Одночасних задач одного користувача
+JOB_MAX_BULK_GLOBAL = int(os.getenv("JOB_MAX_BULK_GLOBAL", "2"))  # Одночасних альбомів/плейлистів
+JOB_MAX_BULK_PER_USER = 1                   # Одночасних альбомів/плейлистів одного користувача
+JOB_MAX_QUEUED_PER_USER = 10                # Скільки задач користувач може тримати в черзі
+JOB_DEFAULT_DURATION = {                    # Початкова оцінка тривалості задачі (секунди)
+    'track': 20.0,
+    'bulk': 300.0,
+}
+
+# Метрики у форматі Prometheus (http://METRICS_HOST:METRICS_PORT/metrics)
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", False)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+
+# Трасування етапів обробки запиту
+TRACING_ENABLED = _env_bool("TRACING_ENABLED", True)
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")              # "", "jsonl" або "otlp"
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")      # Файл для TRACE_EXPORT=jsonl
+TRACE_OTLP_URL = os.getenv("TRACE_OTLP_URL", "http://127.0.0.1:4318/v1/traces")  # Локальний OTLP/HTTP колектор
+TRACE_SERVICE_NAME = "sluhay-bot"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))    # Частка трейсів для експорту
+TRACE_SLOW_SEC = float(os.getenv("TRACE_SLOW_SEC", "20"))           # Поріг повільного запиту (секунди)
+TRACE_SLOW_SAMPLE_RATE = float(os.getenv("TRACE_SLOW_SAMPLE_RATE", "1.0"))  # Частка повільних запитів у лозі
+
+# Сторожовий потік event loop: ловить блокуючі виклики в хендлерах
+LOOP_WATCHDOG_ENABLED = _env_bool("LOOP_WATCHDOG_ENABLED", True)
+LOOP_LAG_INTERVAL_SEC = 0.1                 # Як часто вимірювати затримку loop
+LOOP_STALL_THRESHOLD_SEC = float(os.getenv("LOOP_STALL_THRESHOLD_SEC", "0.5"))  # Поріг зависання loop
+LOOP_STALL_STACK_DEPTH = 25                 # Скільки кадрів стеку записувати в лог
+
+# Адміністратори бота (ID через кому): доступ до /profile та /status
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+
+# Профілювання живого процесу (/profile)
+PROFILE_DEFAULT_SEC = 10                    # Тривалість за замовчуванням
+PROFILE_MAX_SEC = 120                       # Максимальна тривалість
+PROFILE_SAMPLE_INTERVAL_SEC = 0.01          # Інтервал семплювання стеків (100 Гц)
+PROFILE_TRACEMALLOC_FRAMES = 10             # Глибина трас tracemalloc
+
+# Скільки активних задач показувати в /status
+STATUS_MAX_JOBS = 15
+
+# Логування (пише фоновий потік, event loop не чекає на I/O)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")   # text або json (один об'єкт на рядок)
+LOG_FILE = os.getenv("LOG_FILE", "")           # Додатково писати у файл (порожньо - тільки stderr)
+LOG_LEVELS = os.getenv("LOG_LEVELS", "aiogram.event=WARNING")  # Рівні окремих логерів: "логер=РІВЕНЬ,..."
+LOG_QUEUE_SIZE = 10000                      # Записи понад цей розмір черги відкидаються
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "5"))  # Однотипних записів (по треках) за вікно
+LOG_RATE_WINDOW_SEC = 10                    # Вікно обмеження частоти (секунди)
+
+# Після старту імпортувати yt-dlp та spotipy у фоні (інакше - при першому запиті)
+STARTUP_PREWARM = _env_bool("STARTUP_PREWARM", True)
+
+# Пул теплих екземплярів YoutubeDL (по одному на потік і набір опцій)
+YDL_POOL_ENABLED = _env_bool("YDL_POOL_ENABLED", True)
+YDL_MAX_USES = 200                          # Після стількох викликів екземпляр створюється заново
+
+# Квота та прибирання папки завантажень
+DOWNLOADS_QUOTA_MB = int(os.getenv("DOWNLOADS_QUOTA_MB", "2048"))  # Максимальний обсяг папки (0 - без квоти)
+DISK_MIN_FREE_MB = int(os.getenv("DISK_MIN_FREE_MB", "500"))       # Скільки місця залишати вільним на диску
+DISK_BULK_HEADROOM = 0.1                    # Альбоми відхиляються, якщо до межі менше 10%
+DISK_ORPHAN_AGE_SEC = 3600                  # Файли, старші за це, вважаються забутими
+DISK_SWEEP_INTERVAL_SEC = 600               # Як часто прибирати забуті файли
+DISK_RESERVE_FACTOR = 3                     # Резерв на трек: MP3 + оригінал + резервне джерело
+DISK_DEFAULT_TRACK_SEC = 240                # Тривалість для оцінки, якщо Spotify її не віддав
+
+# Де тримати аудіо під час обробки: disk (папка завантажень) або ram (tmpfs)
+STAGING_BACKEND = os.getenv("STAGING_BACKEND", "disk")
+STAGING_RAM_DIR = os.getenv("STAGING_RAM_DIR", "/dev/shm/sluhay")
+STAGING_RAM_MAX_MB = int(os.getenv("STAGING_RAM_MAX_MB", "256"))  # Більше - треки пишуться на диск
+STAGING_RAM_MIN_FREE_MB = 64                # Скільки пам'яті tmpfs залишати вільною
+
+# Докачування обірваних завантажень
+DOWNLOAD_RESUME_ATTEMPTS = int(os.getenv("DOWNLOAD_RESUME_ATTEMPTS", "3"))  # Спроб на трек, якщо є .part
+DOWNLOAD_PARTIAL_KEEP_SEC = 6 * 3600        # Скільки зберігати .part для докачування
+DOWNLOAD_MIN_AUDIO_BYTES = 1024             # Менші файли вважаються пошкодженими
+
+# Сховище готових MP3 з адресацією за вмістом (підпапка downloads, прибиральник її не чіпає)
+AUDIO_STORE_ENABLED = _env_bool("AUDIO_STORE_ENABLED", True)
+AUDIO_STORE_DIR = os.path.join(DOWNLOADS_DIR, "store")
+AUDIO_STORE_INDEX_FILE = "audio_store.json"  # Хеші, URL джерел, посилання треків і file_id
+AUDIO_STORE_MAX_MB = int(os.getenv("AUDIO_STORE_MAX_MB", "512"))  # Понад це видаляються найменш потрібні файли
+AUDIO_STORE_ISSUED_MAX = 4096               # Скільки виданих копій пам'ятати для пошуку file_id
 
-if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
-    raise ValueError("Spotify credentials не знайдено в .env файлі")
 
-# Створюємо папку для завантажень, якщо вона не існує
-os.makedirs(DOWNLOADS_DIR, exist_ok=True)
+def validate(require_bot_token: bool = True) -> None:
+    """
+    Перевірка наявності необхідних змінних
+    
+    Викликається при старті (create_app у main.py), а не під час імпорту,
+    щоб утиліти та бенчмарки могли імпортувати config без .env.
+    
+    Args:
+        require_bot_token: Чи потрібен TELEGRAM_BOT_TOKEN (не потрібен без Telegram)
+    
+    Raises:
+        ValueError: якщо змінна не задана
+    """
+    if require_bot_token and not TELEGRAM_BOT_TOKEN:
+        raise ValueError("TELEGRAM_BOT_TOKEN не знайдено в .env файлі")
+    
+    if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
+        raise ValueError("Spotify credentials не знайдено в .env файлі")
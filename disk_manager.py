@@ -0,0 +1,321 @@
+import os
+import time
+import shutil
+import asyncio
+import logging
+import threading
+import config
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Незавершені файли yt-dlp: дані (.part) та стан фрагментів (.ytdl)
+PARTIAL_SUFFIXES = ('.part', '.ytdl')
+
+
+class DiskFullError(Exception):
+    """Недостатньо місця в папці завантажень"""
+
+
+class Reservation:
+    """Зарезервоване місце під задачу; повертається в release()"""
+    
+    __slots__ = ('nbytes', 'kind', 'released', 'paths')
+    
+    def __init__(self, nbytes: int, kind: str):
+        self.nbytes = nbytes
+        self.kind = kind
+        self.released = False
+        self.paths = set()  # Файли задачі, які прибирання не чіпає (hold)
+
+
+def estimate_track_bytes(duration_ms: int | None, bitrate: int, factor: float = None) -> int:
+    """
+    Оцінка місця під один трек
+    
+    MP3 з бітрейтом користувача плюс оригінальний файл джерела та
+    резервне завантаження, які існують одночасно з ним (DISK_RESERVE_FACTOR).
+    
+    Args:
+        factor: Скільки розмірів MP3 резервувати (1 - лише готовий MP3)
+    """
+    seconds = (duration_ms or config.DISK_DEFAULT_TRACK_SEC * 1000) / 1000
+    factor = config.DISK_RESERVE_FACTOR if factor is None else factor
+    return int(seconds * bitrate * 1000 / 8 * factor)
+
+
+def estimate_bulk_bytes(tracks: list, workers: int = None) -> int:
+    """
+    Оцінка місця під альбом чи плейлист
+    
+    Готові MP3 лежать до відправки медіа-груп (1x на трек), а оригінал і
+    резервне завантаження існують лише поки трек завантажується: повний
+    резерв (DISK_RESERVE_FACTOR) - для стількох найдовших треків, скільки
+    завантажень іде одночасно (DOWNLOAD_WORKERS).
+    
+    Args:
+        tracks: Список (тривалість у мс, бітрейт) для кожного треку
+        workers: Кількість одночасних завантажень
+    """
+    workers = workers or config.DOWNLOAD_WORKERS
+    finished = sum(estimate_track_bytes(duration_ms, bitrate, 1) for duration_ms, bitrate in tracks)
+    in_flight = sorted((estimate_track_bytes(duration_ms, bitrate) for duration_ms, bitrate in tracks), reverse=True)
+    return finished + sum(in_flight[:workers])
+
+
+class DiskManager:
+    """
+    Квота та прибирання папки завантажень
+    
+    Файли з'являються тут на кілька секунд (завантаження - FFmpeg -
+    відправка), але після падіння, помилки до cleanup_file чи скасування
+    залишаються назавжди. Менеджер:
+      - при старті видаляє все, що залишилось від попереднього запуску;
+      - періодично видаляє файли, старші за orphan_age (крім файлів, які
+        тримає активна задача - hold());
+      - перед задачею резервує оцінений обсяг і не дає зайняти більше
+        quota байт або залишити на диску менше min_free;
+      - відмовляє новим альбомам і плейлистам, якщо диск майже заповнений.
+    
+    Обсяг папки перераховується при прибиранні та коли резерв не вміщується,
+    а між перерахунками зростання покривають резерви активних задач.
+    Сховище аудіо (AUDIO_STORE_DIR) має власний ліміт і в обсяг не входить:
+    інакше жорсткі посилання на файли сховища рахувались би двічі.
+    """
+    
+    def __init__(self, directory: str = None, quota_bytes: int = None, min_free_bytes: int = None,
+                 orphan_age: float = None, sweep_interval: float = None, excluded_dirs: list = None):
+        self.directory = directory or config.DOWNLOADS_DIR
+        # Підпапки, які не входять в обсяг (за замовчуванням - сховище аудіо)
+        excluded_dirs = [config.AUDIO_STORE_DIR] if excluded_dirs is None else excluded_dirs
+        self.excluded_dirs = {os.path.abspath(path) for path in excluded_dirs}
+        self.quota = quota_bytes if quota_bytes is not None else config.DOWNLOADS_QUOTA_MB * 1024 * 1024
+        self.min_free = min_free_bytes if min_free_bytes is not None else config.DISK_MIN_FREE_MB * 1024 * 1024
+        self.orphan_age = orphan_age or config.DISK_ORPHAN_AGE_SEC
+        self.sweep_interval = sweep_interval or config.DISK_SWEEP_INTERVAL_SEC
+        self._lock = threading.Lock()
+        self._reservations = set()
+        self._task = None
+        
+        # Стан для /status
+        self.used = 0
+        self.files = 0
+        self.free = 0
+        self.swept_files = 0
+        self.swept_bytes = 0
+        self.refused = 0
+        self.last_sweep = None
+    
+    # ---------- облік ----------
+    
+    @property
+    def reserved(self) -> int:
+        with self._lock:
+            return sum(reservation.nbytes for reservation in self._reservations)
+    
+    def refresh(self) -> None:
+        """Перераховує обсяг папки та вільне місце (блокуючий, викликати з потоку)"""
+        files = used = 0
+        for root, dirs, names in os.walk(self.directory):
+            dirs[:] = [name for name in dirs if os.path.abspath(os.path.join(root, name)) not in self.excluded_dirs]
+            for name in names:
+                try:
+                    used += os.path.getsize(os.path.join(root, name))
+                    files += 1
+                except OSError:
+                    pass  # Файл видалили під час обходу
+        try:
+            free = shutil.disk_usage(self.directory).free
+        except OSError:
+            free = 0
+        with self._lock:
+            self.files, self.used, self.free = files, used, free
+        metrics.disk_used_bytes.set(used, dir=self.directory)
+    
+    def _fits_locked(self, nbytes: int) -> bool:
+        reserved = sum(reservation.nbytes for reservation in self._reservations)
+        within_quota = not self.quota or self.used + reserved + nbytes <= self.quota
+        return within_quota and self.free - reserved - nbytes >= self.min_free
+    
+    def near_full(self) -> bool:
+        """Чи залишилось менше DISK_BULK_HEADROOM квоти / вільного місця"""
+        headroom = config.DISK_BULK_HEADROOM
+        with self._lock:
+            reserved = sum(reservation.nbytes for reservation in self._reservations)
+            used = self.used + reserved
+            if self.quota and used >= self.quota * (1 - headroom):
+                return True
+            return self.free - reserved < self.min_free * (1 + headroom)
+    
+    # ---------- прибирання ----------
+    
+    def sweep(self, max_age: float = None) -> tuple[int, int]:
+        """
+        Видаляє файли папки завантажень, старші за max_age секунд
+        
+        Підпапки (наприклад, сховище аудіо) не чіпаються - вони мають
+        власний облік. Файли, які тримають активні резерви (hold), теж
+        залишаються, хоч би якими старими вони були: довгий плейліст тримає
+        перші треки до відправки медіа-груп.
+        
+        Args:
+            max_age: Мінімальний вік файлу (0 - всі файли, як при старті; .part
+                та .ytdl зберігаються щонайменше DOWNLOAD_PARTIAL_KEEP_SEC)
+        
+        Returns:
+            (кількість видалених файлів, звільнено байт)
+        """
+        max_age = self.orphan_age if max_age is None else max_age
+        now = time.time()
+        removed = freed = 0
+        with self._lock:
+            held = {path for reservation in self._reservations for path in reservation.paths}
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False) or os.path.abspath(entry.path) in held:
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                # Недозавантажені файли живуть довше: їх продовжить наступна спроба
+                min_age = max_age
+                if entry.name.endswith(PARTIAL_SUFFIXES):
+                    min_age = max(max_age, config.DOWNLOAD_PARTIAL_KEEP_SEC)
+                if now - stat.st_mtime < min_age:
+                    continue
+                os.remove(entry.path)
+                removed += 1
+                freed += stat.st_size
+            except FileNotFoundError:
+                continue  # Вже прибрано cleanup_file
+            except OSError as e:
+                logger.warning(f"Не вдалося видалити {entry.path}: {e}")
+        with self._lock:
+            self.swept_files += removed
+            self.swept_bytes += freed
+            self.last_sweep = time.time()
+        if removed:
+            metrics.disk_swept_bytes.inc(freed)
+            logger.info(f"Прибрано {removed} забутих файлів ({freed / 1024 / 1024:.1f} МБ) у {self.directory}")
+        self.refresh()
+        return removed, freed
+    
+    async def start(self) -> None:
+        """Прибирання після попереднього запуску та періодичне прибирання (з main())"""
+        os.makedirs(self.directory, exist_ok=True)
+        await asyncio.to_thread(self.sweep, 0)
+        if self._task is None:
+            self._task = asyncio.create_task(self._periodic())
+    
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _periodic(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await asyncio.to_thread(self.sweep)
+            except Exception as e:
+                logger.error(f"Помилка прибирання папки завантажень: {e}")
+    
+    # ---------- резервування ----------
+    
+    async def check_bulk(self) -> None:
+        """
+        Перевірка перед новим альбомом чи плейлистом
+        
+        Raises:
+            DiskFullError: якщо диск майже заповнений
+        """
+        await asyncio.to_thread(self.refresh)
+        if self.near_full():
+            with self._lock:
+                self.refused += 1
+            metrics.disk_refusals.inc(kind='bulk')
+            raise DiskFullError("Диск майже заповнений")
+    
+    def try_reserve(self, nbytes: int, kind: str) -> Reservation | None:
+        """
+        Резервує місце, якщо воно є за поточним обліком (без прибирання)
+        
+        Returns:
+            Reservation або None, якщо резерв не вміщується
+        """
+        with self._lock:
+            if not self._fits_locked(nbytes):
+                return None
+            reservation = Reservation(nbytes, kind)
+            self._reservations.add(reservation)
+            return reservation
+    
+    async def reserve(self, nbytes: int, kind: str) -> Reservation:
+        """
+        Резервує місце під задачу
+        
+        Якщо резерв не вміщується, спершу перераховує папку, потім прибирає
+        забуті файли і лише тоді відмовляє.
+        
+        Raises:
+            DiskFullError: якщо місця немає навіть після прибирання
+        """
+        reservation = self.try_reserve(nbytes, kind)
+        if reservation is None:
+            await asyncio.to_thread(self.refresh)
+            reservation = self.try_reserve(nbytes, kind)
+        if reservation is None:
+            await asyncio.to_thread(self.sweep)
+            reservation = self.try_reserve(nbytes, kind)
+        if reservation is None:
+            with self._lock:
+                self.refused += 1
+            metrics.disk_refusals.inc(kind=kind)
+            raise DiskFullError(f"Потрібно {nbytes / 1024 / 1024:.0f} МБ, місця немає")
+        return reservation
+    
+    def hold(self, reservation: Reservation | None, path: str | None) -> None:
+        """
+        Закріплює файл за задачею: прибирання не видалить його, поки резерв
+        не повернуто в release()
+        """
+        if reservation is None or not path:
+            return
+        with self._lock:
+            if not reservation.released:
+                reservation.paths.add(os.path.abspath(path))
+    
+    def release(self, reservation: Reservation | None) -> None:
+        """Повертає резерв; записані файли буде враховано при наступному перерахунку"""
+        if reservation is None or reservation.released:
+            return
+        with self._lock:
+            reservation.released = True
+            reservation.paths.clear()
+            self._reservations.discard(reservation)
+    
+    def snapshot(self) -> dict:
+        """Стан для /status"""
+        with self._lock:
+            return {
+                'used': self.used,
+                'files': self.files,
+                'free': self.free,
+                'quota': self.quota,
+                'reserved': sum(reservation.nbytes for reservation in self._reservations),
+                'reservations': len(self._reservations),
+                'swept_files': self.swept_files,
+                'swept_bytes': self.swept_bytes,
+                'refused': self.refused,
+                'last_sweep': self.last_sweep,
+            }
+
+
+disk_manager = DiskManager()
@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from cancellation import CancelToken
+
+
+class DownloadPool:
+    """
+    Пул потоків для блокуючих завантажень (yt-dlp, FFmpeg)
+    
+    Завантаження не блокують event loop, тож натискання "Скасувати"
+    обробляється одразу, а токен скасування зупиняє роботу в потоці.
+    """
+    
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='download')
+        self._lock = threading.Lock()
+        self.active = 0
+        self.queued = 0
+    
+    def _run(self, func, token: CancelToken | None):
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            # Задача могла бути скасована, поки стояла в черзі
+            if token is not None:
+                token.raise_if_cancelled()
+            return func()
+        finally:
+            with self._lock:
+                self.active -= 1
+    
+    async def run(self, func, *args, cancel_token: CancelToken = None, **kwargs):
+        """
+        Виконує функцію в пулі
+        
+        Args:
+            func: Блокуюча функція
+            cancel_token: Токен скасування; передається у func як cancel_token
+        
+        Raises:
+            DownloadCancelledError: якщо токен скасовано до старту задачі
+        """
+        if cancel_token is not None:
+            kwargs['cancel_token'] = cancel_token
+        call = functools.partial(func, *args, **kwargs)
+        # Копіюємо контекст, щоб contextvars (ID запиту тощо) були доступні в потоці
+        context = contextvars.copy_context()
+        with self._lock:
+            self.queued += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, context.run, self._run, call, cancel_token)
+    
+    def utilization(self) -> dict:
+        with self._lock:
+            return {'workers': self.workers, 'active': self.active, 'queued': self.queued}
+    
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
@@ -0,0 +1,294 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import config
+from cancellation import CancelToken
+
+
+logger = logging.getLogger(__name__)
+
+
+class SourceStats:
+    """Статистика затримок одного джерела"""
+    
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.attempts = 0
+        self.successes = 0
+        self.wins = 0
+        self.cancelled = 0
+    
+    def record(self, latency: float, ok: bool) -> None:
+        with self._lock:
+            self.attempts += 1
+            if ok:
+                self.successes += 1
+                self.latencies.append(latency)
+    
+    def record_win(self) -> None:
+        with self._lock:
+            self.wins += 1
+    
+    def record_cancel(self) -> None:
+        with self._lock:
+            self.cancelled += 1
+    
+    def snapshot(self) -> dict:
+        """Поточна статистика: кількість спроб, перемог та перцентилі затримки"""
+        with self._lock:
+            values = sorted(self.latencies)
+            snapshot = {
+                'attempts': self.attempts,
+                'successes': self.successes,
+                'wins': self.wins,
+                'cancelled': self.cancelled,
+            }
+        
+        def percentile(p: float) -> float | None:
+            if not values:
+                return None
+            return values[min(len(values) - 1, int(p * len(values)))]
+        
+        snapshot['p50'] = percentile(0.5)
+        snapshot['p95'] = percentile(0.95)
+        snapshot['mean'] = sum(values) / len(values) if values else None
+        return snapshot
+
+
+class LeadingProgress:
+    """
+    Один рядок прогресу для кількох джерел одного треку
+    
+    Після запуску резервного джерела обидва завантаження викликають
+    progress hook; далі передаються лише події джерела, яке завантажило
+    більшу частку файлу (при рівності - того, що стартувало раніше).
+    """
+    
+    def __init__(self, callback):
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._fractions = {}  # назва джерела -> завантажена частка
+    
+    @staticmethod
+    def _fraction(progress: dict) -> float:
+        if progress.get('status') == 'finished':
+            return 1.0
+        total = progress.get('total_bytes') or progress.get('total_bytes_estimate')
+        downloaded = progress.get('downloaded_bytes') or 0
+        return min(1.0, downloaded / total) if total else 0.0
+    
+    def hook(self, source_name: str):
+        """Progress hook yt-dlp для одного джерела"""
+        with self._lock:
+            self._fractions.setdefault(source_name, 0.0)
+        
+        def progress_hook(progress: dict) -> None:
+            with self._lock:
+                self._fractions[source_name] = self._fraction(progress)
+                # max повертає перше джерело серед рівних - те, що стартувало раніше
+                leader = max(self._fractions, key=self._fractions.get)
+            if leader == source_name:
+                self.callback(progress)
+        
+        return progress_hook
+    
+    def drop(self, source_name: str) -> None:
+        """Джерело завершилось невдачею - прогрес показують інші"""
+        with self._lock:
+            self._fractions.pop(source_name, None)
+
+
+class HedgedDownloader:
+    """
+    Завантажувач з кількох джерел з "підстраховкою" (hedged requests)
+    
+    Спочатку запускається основне джерело. Якщо за hedge_delay секунд від нього
+    не прийшло жодного байта (або завантаження стоїть стільки ж без нових
+    байтів), чи воно завершилось невдачею, запускається наступне. Повільне, але
+    живе завантаження резерв не запускає. Перший прийнятний результат
+    виграє, решта завантажень скасовується через cancel_token.
+    
+    Джерелом може бути будь-який об'єкт з атрибутом SOURCE_NAME та методом
+    download_audio(..., cancel_token=...), тож для тестів достатньо передати
+    SoundCloudDownloader з фейковим ydl_factory.
+    """
+    
+    def __init__(self, sources: list, hedge_delay: float = None, max_workers: int = 8):
+        """
+        Args:
+            sources: Джерела в порядку пріоритету
+            hedge_delay: Затримка перед запуском резервного джерела (секунди)
+            max_workers: Кількість потоків для паралельних завантажень
+        """
+        if not sources:
+            raise ValueError("Потрібне хоча б одне джерело")
+        self.sources = list(sources)
+        self.hedge_delay = config.HEDGE_DELAY_SEC if hedge_delay is None else hedge_delay
+        self.stats = {source.SOURCE_NAME: SourceStats() for source in self.sources}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+    
+    @staticmethod
+    def is_acceptable(path: str | None) -> bool:
+        """Результат прийнятний, якщо файл існує і не порожній"""
+        return bool(path) and os.path.exists(path) and os.path.getsize(path) > 0
+    
+    def _run_source(self, source, cancel_token: CancelToken, args: tuple, kwargs: dict) -> str | None:
+        started = time.monotonic()
+        path = None
+        try:
+            path = source.download_audio(*args, cancel_token=cancel_token, **kwargs)
+            return path
+        finally:
+            ok = self.is_acceptable(path) and not cancel_token.cancelled
+            self.stats[source.SOURCE_NAME].record(time.monotonic() - started, ok)
+    
+    def _discard_late_result(self, source, future) -> None:
+        """Прибирає файл, який джерело, що програло, все ж встигло завантажити"""
+        try:
+            path = future.result()
+        except Exception:
+            return
+        if path:
+            source.cleanup_file(path)
+    
+    def download_with_source(self, search_query: str, track_name: str, user_id: int = None, bitrate: int = 128,
+                             track_info: dict = None, cancel_token: CancelToken = None,
+                             progress_callback=None) -> tuple[str | None, str | None]:
+        """
+        Завантажує трек з першого джерела, яке впоралось
+        
+        Args:
+            cancel_token: Токен скасування всього завантаження (скасовує всі джерела)
+            progress_callback: Progress hook yt-dlp; після запуску резервного джерела
+                отримує події лише від того, що попереду
+        
+        Returns:
+            (шлях до файлу, назва джерела) або (None, None)
+        """
+        args = (search_query, track_name, user_id, bitrate)
+        progress = LeadingProgress(progress_callback) if progress_callback else None
+        pending = {}  # future -> (source, cancel_token)
+        next_index = 0
+        # Резерв потрібен, лише якщо завантаження стоїть: немає жодної події
+        # прогресу (першого байта) або нових байтів протягом hedge_delay.
+        # Після завершення завантаження (конвертація в MP3) резерв не запускається.
+        activity_lock = threading.Lock()
+        last_activity = time.monotonic()
+        downloaded = False
+        
+        def watch(source_hook):
+            def progress_hook(event: dict) -> None:
+                nonlocal last_activity, downloaded
+                with activity_lock:
+                    last_activity = time.monotonic()
+                    if event.get('status') == 'finished':
+                        downloaded = True
+                if source_hook is not None:
+                    source_hook(event)
+            return progress_hook
+        
+        def launch_next() -> bool:
+            nonlocal next_index, last_activity, downloaded
+            if next_index >= len(self.sources):
+                return False
+            with activity_lock:
+                # Відлік hedge_delay - від старту нового джерела
+                last_activity = time.monotonic()
+                downloaded = False
+            source = self.sources[next_index]
+            next_index += 1
+            source_token = cancel_token.child() if cancel_token is not None else CancelToken()
+            kwargs = {
+                'track_info': track_info,
+                'progress_callback': watch(progress.hook(source.SOURCE_NAME) if progress else None),
+            }
+            # Контекст копіюється, щоб етапи трасування потрапили в поточний запит
+            context = contextvars.copy_context()
+            future = self._executor.submit(context.run, self._run_source, source, source_token, args, kwargs)
+            pending[future] = (source, source_token)
+            return True
+        
+        launch_next()
+        winner_path, winner_source = None, None
+        
+        while pending:
+            # Поки є резервні джерела, чекаємо до моменту, коли завантаження вважається таким, що стоїть
+            timeout = None
+            if next_index < len(self.sources):
+                with activity_lock:
+                    if not downloaded:
+                        timeout = max(0.0, last_activity + self.hedge_delay - time.monotonic())
+            done, _ = wait(list(pending), timeout=timeout, return_when=FIRST_COMPLETED)
+            
+            if not done:
+                if cancel_token is not None and cancel_token.cancelled:
+                    continue
+                with activity_lock:
+                    stalled = not downloaded and time.monotonic() - last_activity >= self.hedge_delay
+                if not stalled:
+                    continue
+                source = self.sources[next_index]
+                logger.info(f"Hedge: немає прогресу {self.hedge_delay:.0f} с, запускаю {source.SOURCE_NAME}")
+                launch_next()
+                continue
+            
+            for future in done:
+                source, _ = pending.pop(future)
+                try:
+                    path = future.result()
+                except Exception as e:
+                    logger.warning(f"Hedge: {source.SOURCE_NAME} завершився з помилкою: {e}")
+                    path = None
+                
+                if winner_path is None and self.is_acceptable(path):
+                    winner_path, winner_source = path, source
+                    continue
+                if path:
+                    source.cleanup_file(path)
+                if progress:
+                    progress.drop(source.SOURCE_NAME)
+            
+            if winner_path:
+                break
+            
+            if cancel_token is not None and cancel_token.cancelled:
+                break
+            
+            # Невдача - одразу пробуємо наступне джерело, не чекаючи затримки
+            if not pending:
+                launch_next()
+        
+        # Скасовуємо програвші завантаження
+        for future, (source, source_token) in pending.items():
+            source_token.cancel()
+            self.stats[source.SOURCE_NAME].record_cancel()
+            future.add_done_callback(lambda f, s=source: self._discard_late_result(s, f))
+        
+        if not winner_path:
+            return None, None
+        
+        self.stats[winner_source.SOURCE_NAME].record_win()
+        logger.info(f"Hedge: трек '{track_name}' отримано з {winner_source.SOURCE_NAME}")
+        return winner_path, winner_source.SOURCE_NAME
+    
+    def download_audio(self, search_query: str, track_name: str, user_id: int = None, bitrate: int = 128,
+                       track_info: dict = None, cancel_token: CancelToken = None,
+                       progress_callback=None) -> str | None:
+        """Те саме, що download_with_source, але повертає тільки шлях (сумісно з SoundCloudDownloader)"""
+        path, _ = self.download_with_source(
+            search_query, track_name, user_id, bitrate, track_info, cancel_token, progress_callback
+        )
+        return path
+    
+    def cleanup_file(self, filepath: str) -> None:
+        """Видаляє файл після відправки"""
+        self.sources[0].cleanup_file(filepath)
+    
+    def latency_stats(self) -> dict:
+        """Статистика затримок по кожному джерелу"""
+        return {name: stats.snapshot() for name, stats in self.stats.items()}
@@ -0,0 +1,298 @@
+import time
+import asyncio
+import logging
+import itertools
+from collections import deque
+import config
+from cancellation import CancelToken, DownloadCancelledError
+
+
+logger = logging.getLogger(__name__)
+
+# Типи задач: короткі (один трек) обслуговуються раніше за масові
+JOB_TRACK = 'track'
+JOB_BULK = 'bulk'  # альбом або плейліст
+
+JOB_KINDS = (JOB_TRACK, JOB_BULK)
+
+
+class JobRejectedError(Exception):
+    """Черга користувача переповнена"""
+
+
+class JobTicket:
+    """Дозвіл на виконання задачі; повертається в release() після завершення"""
+    
+    def __init__(self, user_id: int, kind: str, notify=None, chat_id: int = None):
+        self.user_id = user_id
+        self.chat_id = user_id if chat_id is None else chat_id
+        self.kind = kind
+        self.notify = notify
+        self.future = None
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.position = None
+    
+    @property
+    def waited(self) -> float:
+        """Скільки секунд задача простояла в черзі"""
+        end = self.started_at if self.started_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+
+class JobScheduler:
+    """
+    Справедливий планувальник завантажень
+    
+    Кожен користувач має власну чергу, черги обслуговуються по колу
+    (round-robin), тож один великий плейліст не блокує інших. Окремі треки
+    завжди запускаються раніше за альбоми та плейлисти. Кількість одночасних
+    задач обмежена глобально, на користувача і окремо для масових задач.
+    Позиція в черзі та орієнтовний час очікування рахуються з виміряної
+    тривалості задач (EWMA).
+    """
+    
+    EWMA_ALPHA = 0.2
+    
+    def __init__(self, max_active: int = None, max_active_per_user: int = None, max_bulk_global: int = None,
+                 max_bulk_per_user: int = None, max_queued_per_user: int = None):
+        self.max_active = max_active or config.JOB_MAX_ACTIVE
+        self.max_active_per_user = max_active_per_user or config.JOB_MAX_ACTIVE_PER_USER
+        self.max_bulk_global = max_bulk_global or config.JOB_MAX_BULK_GLOBAL
+        self.max_bulk_per_user = max_bulk_per_user or config.JOB_MAX_BULK_PER_USER
+        self.max_queued_per_user = max_queued_per_user or config.JOB_MAX_QUEUED_PER_USER
+        
+        # kind -> {user_id: deque[JobTicket]}
+        self._waiting = {kind: {} for kind in JOB_KINDS}
+        # Коли користувача обслуговували востаннє (лічильник) - для обходу по колу
+        self._last_served = {kind: {} for kind in JOB_KINDS}
+        self._serve_counter = itertools.count(1)
+        self._active_by_user = {}  # user_id -> {kind: кількість}
+        self._active = {kind: 0 for kind in JOB_KINDS}
+        self._running = set()  # Активні JobTicket (для /status)
+        self._notify_tasks = set()  # Посилання на задачі сповіщень, щоб їх не зібрав GC
+        self.avg_duration = dict(config.JOB_DEFAULT_DURATION)
+        self.completed = 0
+        self.rejected = 0
+    
+    # ---------- стан черг ----------
+    
+    def _active_total(self) -> int:
+        return sum(self._active.values())
+    
+    def _queued_for_user(self, user_id: int) -> int:
+        return sum(len(self._waiting[kind].get(user_id, ())) for kind in JOB_KINDS)
+    
+    def _can_start(self, user_id: int, kind: str) -> bool:
+        user_active = self._active_by_user.get(user_id, {})
+        if sum(user_active.values()) >= self.max_active_per_user:
+            return False
+        if kind == JOB_BULK:
+            if self._active[JOB_BULK] >= self.max_bulk_global:
+                return False
+            if user_active.get(JOB_BULK, 0) >= self.max_bulk_per_user:
+                return False
+        return True
+    
+    def _enqueue(self, ticket: JobTicket) -> None:
+        queues = self._waiting[ticket.kind]
+        queues.setdefault(ticket.user_id, deque()).append(ticket)
+    
+    def _remove_waiting(self, ticket: JobTicket) -> bool:
+        queue = self._waiting[ticket.kind].get(ticket.user_id)
+        if not queue or ticket not in queue:
+            return False
+        queue.remove(ticket)
+        if not queue:
+            del self._waiting[ticket.kind][ticket.user_id]
+        return True
+    
+    def _users_in_turn(self, kind: str) -> list:
+        """Користувачі з чергами цього типу: спочатку ті, кого найдовше не обслуговували"""
+        last_served = self._last_served[kind]
+        return sorted(self._waiting[kind], key=lambda user_id: last_served.get(user_id, 0))
+    
+    def _pick(self, kind: str) -> JobTicket | None:
+        """Наступна задача цього типу: по колу серед користувачів, яким дозволено стартувати"""
+        for user_id in self._users_in_turn(kind):
+            if not self._can_start(user_id, kind):
+                continue
+            queue = self._waiting[kind][user_id]
+            ticket = queue.popleft()
+            if not queue:
+                del self._waiting[kind][user_id]
+            self._last_served[kind][user_id] = next(self._serve_counter)
+            return ticket
+        return None
+    
+    def _start(self, ticket: JobTicket) -> None:
+        ticket.started_at = time.monotonic()
+        self._running.add(ticket)
+        user_active = self._active_by_user.setdefault(ticket.user_id, {})
+        user_active[ticket.kind] = user_active.get(ticket.kind, 0) + 1
+        self._active[ticket.kind] += 1
+        if not ticket.future.done():
+            ticket.future.set_result(ticket)
+    
+    def _dispatch(self) -> None:
+        while self._active_total() < self.max_active:
+            ticket = None
+            for kind in JOB_KINDS:
+                ticket = self._pick(kind)
+                if ticket:
+                    break
+            if ticket is None:
+                break
+            self._start(ticket)
+        self._notify_positions()
+    
+    # ---------- позиція та ETA ----------
+    
+    def _expected_order(self) -> list:
+        """Очікуваний порядок запуску: спочатку треки, потім масові задачі, всередині - по колу"""
+        order = []
+        for kind in JOB_KINDS:
+            queues = [self._waiting[kind][user_id] for user_id in self._users_in_turn(kind)]
+            depth = max((len(queue) for queue in queues), default=0)
+            for index in range(depth):
+                order.extend(queue[index] for queue in queues if index < len(queue))
+        return order
+    
+    def estimate_wait(self, ahead_same_kind: int, kind: str) -> float:
+        """
+        Орієнтовний час очікування в секундах
+        
+        Args:
+            ahead_same_kind: Скільки задач цього типу в черзі попереду
+            kind: JOB_TRACK або JOB_BULK
+        """
+        capacity = self.max_bulk_global if kind == JOB_BULK else self.max_active
+        rounds = ahead_same_kind // max(1, capacity) + 1
+        return rounds * self.avg_duration[kind]
+    
+    def _notify_positions(self) -> None:
+        ahead = {kind: 0 for kind in JOB_KINDS}
+        for position, ticket in enumerate(self._expected_order(), 1):
+            if ticket.position != position and ticket.notify is not None:
+                eta = self.estimate_wait(ahead[ticket.kind], ticket.kind)
+                task = asyncio.create_task(self._safe_notify(ticket, position, eta))
+                self._notify_tasks.add(task)
+                task.add_done_callback(self._notify_tasks.discard)
+            ticket.position = position
+            ahead[ticket.kind] += 1
+    
+    @staticmethod
+    async def _safe_notify(ticket: JobTicket, position: int, eta: float) -> None:
+        try:
+            await ticket.notify(position, eta)
+        except Exception as e:
+            logger.debug(f"Не вдалося показати позицію в черзі: {e}")
+    
+    # ---------- API ----------
+    
+    async def acquire(self, user_id: int, kind: str, cancel_token: CancelToken = None, notify=None,
+                      chat_id: int = None) -> JobTicket:
+        """
+        Стати в чергу і дочекатися дозволу на виконання
+        
+        Args:
+            user_id: ID користувача
+            kind: JOB_TRACK або JOB_BULK
+            cancel_token: Скасування прибирає задачу з черги
+            notify: async-функція (position, eta_seconds), викликається при зміні позиції
+            chat_id: Чат, у якому виконується задача (за замовчуванням - чат користувача)
+        
+        Returns:
+            JobTicket, який треба передати в release()
+        
+        Raises:
+            JobRejectedError: у користувача забагато задач у черзі
+            DownloadCancelledError: задачу скасовано, поки вона чекала
+        """
+        if self._queued_for_user(user_id) >= self.max_queued_per_user:
+            self.rejected += 1
+            raise JobRejectedError("Забагато завантажень у черзі")
+        
+        loop = asyncio.get_running_loop()
+        ticket = JobTicket(user_id, kind, notify, chat_id)
+        ticket.future = loop.create_future()
+        self._enqueue(ticket)
+        self._dispatch()
+        
+        if ticket.future.done():
+            return ticket
+        
+        logger.info(f"Задача {kind} користувача {user_id} в черзі: позиція {ticket.position}")
+        
+        def on_cancel():
+            loop.call_soon_threadsafe(self._cancel_waiting, ticket)
+        
+        if cancel_token is not None:
+            cancel_token.add_callback(on_cancel)
+        try:
+            return await ticket.future
+        except asyncio.CancelledError:
+            if self._remove_waiting(ticket):
+                self._notify_positions()
+            elif ticket.started_at is not None:
+                self.release(ticket, record=False)
+            raise
+        finally:
+            if cancel_token is not None:
+                cancel_token.remove_callback(on_cancel)
+    
+    def _cancel_waiting(self, ticket: JobTicket) -> None:
+        if self._remove_waiting(ticket) and not ticket.future.done():
+            ticket.future.set_exception(DownloadCancelledError("Завантаження скасовано"))
+            self._notify_positions()
+    
+    def release(self, ticket: JobTicket, record: bool = True) -> None:
+        """
+        Звільнити місце після завершення задачі
+        
+        Args:
+            record: Враховувати тривалість у середньому (False для скасованих)
+        """
+        if ticket.started_at is None:
+            return
+        duration = time.monotonic() - ticket.started_at
+        ticket.started_at = None
+        self._running.discard(ticket)
+        
+        user_active = self._active_by_user.get(ticket.user_id, {})
+        user_active[ticket.kind] = max(0, user_active.get(ticket.kind, 0) - 1)
+        if not any(user_active.values()):
+            self._active_by_user.pop(ticket.user_id, None)
+        self._active[ticket.kind] = max(0, self._active[ticket.kind] - 1)
+        
+        if record:
+            self.completed += 1
+            previous = self.avg_duration[ticket.kind]
+            self.avg_duration[ticket.kind] = previous + self.EWMA_ALPHA * (duration - previous)
+        
+        self._dispatch()
+    
+    def active_jobs(self) -> list:
+        """Активні задачі: [{'user_id', 'chat_id', 'kind', 'running_sec'}], найдовші першими"""
+        now = time.monotonic()
+        jobs = [
+            {'user_id': ticket.user_id, 'chat_id': ticket.chat_id, 'kind': ticket.kind,
+             'running_sec': now - ticket.started_at}
+            for ticket in self._running if ticket.started_at is not None
+        ]
+        return sorted(jobs, key=lambda job: job['running_sec'], reverse=True)
+    
+    def snapshot(self) -> dict:
+        """Стан планувальника: активні та очікуючі задачі, середня тривалість"""
+        return {
+            'active': dict(self._active),
+            'queued': {kind: sum(len(queue) for queue in self._waiting[kind].values()) for kind in JOB_KINDS},
+            'users_waiting': len({user_id for kind in JOB_KINDS for user_id in self._waiting[kind]}),
+            'avg_duration_sec': {kind: round(value, 1) for kind, value in self.avg_duration.items()},
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+
+# Спільний планувальник для всього бота
+job_scheduler = JobScheduler()
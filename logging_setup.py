@@ -0,0 +1,185 @@
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import logging.handlers
+import threading
+from datetime import datetime, timezone
+import config
+import tracing
+from loop_watchdog import current_handler
+
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+class ContextFilter(logging.Filter):
+    """
+    Додає до запису ID запиту, користувача та назву хендлера
+    
+    Працює в потоці, який пише лог (до черги), бо contextvars з контекстом
+    запиту доступні тільки там.
+    """
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        span = tracing.current_span()
+        if span is not None:
+            record.request_id = span.trace.request_id
+            record.user_id = span.trace.root.attributes.get('user_id')
+        else:
+            record.request_id = None
+            record.user_id = None
+        record.handler = current_handler()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Обмеження частоти для однотипних повідомлень
+    
+    Записи з extra={'rate_key': '...'} пропускаються не частіше limit разів
+    за window секунд для кожного ключа; перший запис наступного вікна
+    отримує позначку, скільки подібних було пропущено. Записи без rate_key
+    не обмежуються.
+    """
+    
+    def __init__(self, limit: int = None, window: float = None):
+        super().__init__()
+        self.limit = limit or config.LOG_RATE_LIMIT
+        self.window = window or config.LOG_RATE_WINDOW_SEC
+        self._lock = threading.Lock()
+        self._windows = {}  # key -> [початок вікна, пропущено, кількість у вікні]
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, 'rate_key', None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[1] if state else 0
+                self._windows[key] = [now, 0, 1]
+                if suppressed:
+                    record.msg = f"{record.msg} (пропущено подібних: {suppressed})"
+                return True
+            if state[2] < self.limit:
+                state[2] += 1
+                return True
+            state[1] += 1
+            return False
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, що не блокує і не падає при переповненій черзі"""
+    
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Форматуємо повідомлення та traceback тут: аргументи можуть змінитись,
+        # поки запис чекає в черзі, а exc_info не переживає копіювання
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TextFormatter(logging.Formatter):
+    """Звичний текстовий формат; ID запиту додається перед повідомленням"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        request_id = getattr(record, 'request_id', None)
+        if request_id and not getattr(record, '_request_tagged', False):
+            record.msg = f"[{request_id}] {record.msg}"
+            record._request_tagged = True
+        return super().format(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """Один JSON-об'єкт на рядок (для Loki, ELK, jq)"""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        for key in ('request_id', 'user_id', 'handler'):
+            value = getattr(record, key, None)
+            if value is not None:
+                data[key] = value
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+def parse_levels(value: str) -> dict:
+    """"aiogram.event=WARNING,soundcloud_downloader=DEBUG" -> {логер: рівень}"""
+    levels = {}
+    for part in value.split(','):
+        name, _, level = part.partition('=')
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> None:
+    """
+    Налаштування логування всього процесу
+    
+    Всі записи потрапляють у чергу, а в stderr/файл їх пише фоновий потік
+    (QueueListener), тож event loop не чекає на I/O. Повторний виклик нічого
+    не робить.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    
+    formatter = JsonFormatter() if config.LOG_FORMAT == 'json' else TextFormatter(TEXT_FORMAT)
+    outputs = [logging.StreamHandler(sys.stderr)]
+    if config.LOG_FILE:
+        outputs.append(logging.handlers.WatchedFileHandler(config.LOG_FILE, encoding='utf-8'))
+    for output in outputs:
+        output.setFormatter(formatter)
+    
+    log_queue = queue.Queue(maxsize=config.LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(RateLimitFilter())
+    
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(config.LOG_LEVEL)
+    for name, level in parse_levels(config.LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+    
+    _listener = logging.handlers.QueueListener(log_queue, *outputs, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Дописує чергу та зупиняє фоновий потік"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
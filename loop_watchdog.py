@@ -0,0 +1,168 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+import contextvars
+import weakref
+from aiogram import BaseMiddleware
+import config
+import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Назва хендлера, який обробляє поточне оновлення
+_active_handler = contextvars.ContextVar('active_handler', default=None)
+
+
+def current_handler() -> str | None:
+    return _active_handler.get()
+
+
+class HandlerNameMiddleware(BaseMiddleware):
+    """
+    Middleware для dp.message / dp.callback_query: запам'ятовує назву хендлера
+    
+    Назва кладеться в contextvar (для коду в loop) і в таблицю задач
+    сторожового потоку, бо з іншого потоку contextvar не прочитати.
+    """
+    
+    def __init__(self, watchdog: 'LoopWatchdog'):
+        self.watchdog = watchdog
+    
+    async def __call__(self, handler, event, data):
+        handler_object = data.get('handler')
+        callback = getattr(handler_object, 'callback', None)
+        name = getattr(callback, '__name__', None) or type(event).__name__
+        token = _active_handler.set(name)
+        task = asyncio.current_task()
+        if task is not None:
+            self.watchdog.task_handlers[task] = name
+        try:
+            return await handler(event, data)
+        finally:
+            _active_handler.reset(token)
+            if task is not None:
+                self.watchdog.task_handlers.pop(task, None)
+
+
+class LoopWatchdog:
+    """
+    Сторож event loop
+    
+    Задача в loop кожні interval секунд оновлює "серцебиття" і вимірює,
+    наскільки пізніше вона прокинулась (затримка loop). Окремий потік
+    перевіряє серцебиття: якщо loop не відповідає довше threshold, він
+    знімає стек головного потоку через sys._current_frames() - саме там
+    видно блокуючий виклик - і пише його в лог разом з назвою хендлера.
+    """
+    
+    def __init__(self, interval: float = None, threshold: float = None, stack_depth: int = None):
+        self.interval = interval or config.LOOP_LAG_INTERVAL_SEC
+        self.threshold = threshold or config.LOOP_STALL_THRESHOLD_SEC
+        self.stack_depth = stack_depth or config.LOOP_STALL_STACK_DEPTH
+        self.task_handlers = weakref.WeakKeyDictionary()
+        self._loop = None
+        self._loop_thread_id = None
+        self._beat_task = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._last_beat = time.monotonic()
+        self._reported_beat = None
+        
+        # Статистика для /status
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.last_stall = None
+    
+    def start(self) -> None:
+        """Запуск з event loop (у main() перед polling)"""
+        if self._beat_task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._beat_task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+        logger.info(f"Сторож event loop запущено (поріг {self.threshold:.2f} с)")
+    
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._beat_task is not None:
+            self._beat_task.cancel()
+            try:
+                await self._beat_task
+            except asyncio.CancelledError:
+                pass
+            self._beat_task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+    
+    async def _heartbeat(self) -> None:
+        while True:
+            started = time.monotonic()
+            self._last_beat = started
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - started - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            metrics.loop_lag_seconds.observe(lag)
+            if lag >= self.threshold:
+                logger.warning(f"Event loop відновився після зависання на {lag:.2f} с")
+    
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            beat = self._last_beat
+            stalled = time.monotonic() - beat
+            # Одне зависання - один запис, навіть якщо воно триває довго
+            if stalled >= self.threshold and beat != self._reported_beat:
+                self._reported_beat = beat
+                self._report(stalled)
+    
+    def _active_task_handler(self) -> tuple[str | None, str | None]:
+        """Хендлер і назва задачі, яка зараз виконується в loop"""
+        try:
+            task = asyncio.current_task(self._loop)
+        except Exception:
+            return None, None
+        if task is None:
+            return None, None
+        return self.task_handlers.get(task), task.get_name()
+    
+    def _report(self, stalled: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = ''.join(traceback.format_stack(frame, limit=self.stack_depth)) if frame else 'стек недоступний\n'
+        del frame
+        handler, task_name = self._active_task_handler()
+        
+        self.stalls += 1
+        self.last_stall = {
+            'at': time.time(),
+            'stalled_sec': round(stalled, 3),
+            'handler': handler,
+            'task': task_name,
+            'stack': stack,
+        }
+        metrics.loop_stalls.inc(handler=handler or 'unknown')
+        logger.warning(
+            f"Event loop не відповідає {stalled:.2f} с "
+            f"(хендлер: {handler or 'невідомо'}, задача: {task_name or '-'}). Стек головного потоку:\n{stack}"
+        )
+    
+    def snapshot(self) -> dict:
+        """Стан для /status"""
+        return {
+            'last_lag': round(self.last_lag, 4),
+            'max_lag': round(self.max_lag, 4),
+            'stalls': self.stalls,
+            'last_stall': dict(self.last_stall) if self.last_stall else None,
+        }
+
+
+loop_watchdog = LoopWatchdog()
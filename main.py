@@ -1,38 +1,182 @@
+import time
+_import_started = time.perf_counter()  # Для звіту про час старту
 import asyncio
 import logging
 import aiohttp
 import os
+import re
+import html
 import hashlib
 import json
-import yt_dlp
-from aiogram import Bot, Dispatcher, F, types
+import shutil
+from datetime import datetime
+from contextlib import contextmanager
+from aiogram import Bot, Dispatcher, Router, F, types
 from aiogram.filters import Command, CommandStart
-from aiogram.types import Message, FSInputFile, BufferedInputFile, InputMediaAudio, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
+from aiogram.types import Message, BufferedInputFile, InputMediaAudio, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramRetryAfter, TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.fsm.storage.memory import MemoryStorage
 
 import config
 from spotify_service import SpotifyService
-from soundcloud_downloader import SoundCloudDownloader
+from soundcloud_downloader import SoundCloudDownloader, split_mp3
+from youtube_downloader import YouTubeMusicDownloader
+from hedged_downloader import HedgedDownloader
+from cancellation import CancelToken, DownloadCancelledError
+from download_pool import DownloadPool
+from progress_reporter import ProgressReporter
+from send_scheduler import send_scheduler, PRIORITY_INTERACTIVE, PRIORITY_STATUS, PRIORITY_BULK
+from job_scheduler import job_scheduler, JobRejectedError, JOB_TRACK, JOB_BULK
+import metrics
+import tracing
+from loop_watchdog import loop_watchdog, HandlerNameMiddleware
+from upstream_governor import governor
+from ydl_pool import ydl_pool
+from disk_manager import disk_manager, DiskFullError, estimate_track_bytes, estimate_bulk_bytes
+from staging import staging
+import bot_api
+from audio_quality import plan_quality, parts_for_size
+from cache_uploader import cache_uploader
+from audio_store import audio_store
+import profiler
+from logging_setup import setup_logging
 
 
-# Налаштування логування
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-# Ініціалізація бота з FSM storage
-storage = MemoryStorage()
-bot = Bot(token=config.TELEGRAM_BOT_TOKEN)
-dp = Dispatcher(storage=storage)
+# Хендлери реєструються на router; бот, Dispatcher і сервіси створює create_app()
+router = Router()
+bot: Bot = None
+dp: Dispatcher = None
+spotify: SpotifyService = None
+soundcloud: SoundCloudDownloader = None
+audio_sources = []
+downloader: HedgedDownloader = None
 
-# Ініціалізація сервісів
-spotify = SpotifyService()
-soundcloud = SoundCloudDownloader()
+# Пул потоків для завантажень та активні токени скасування користувачів
+download_pool: DownloadPool = None
+active_downloads = {}  # user_id -> set[CancelToken]
+background_tasks = set()  # Фонові задачі (посилання, щоб їх не прибрав збирач сміття)
+
+# Тривалість етапів старту (секунди) для лога та /status
+startup_timings = {'imports': time.perf_counter() - _import_started}
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Записує тривалість етапу старту в startup_timings"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = time.perf_counter() - started
+
+
+def format_startup_timings() -> str:
+    """Рядок на кшталт "2.10 с (imports 1.95, config 0.01, ...)"""
+    total = sum(startup_timings.values())
+    parts = ', '.join(f"{name} {seconds:.2f}" for name, seconds in startup_timings.items())
+    return f"{total:.2f} с ({parts})"
+
+
+def create_app(session=None) -> Dispatcher:
+    """
+    Фабрика застосунку: конфігурація, логування, сервіси, бот та Dispatcher
+    
+    Під час імпорту main.py нічого не створюється, тому імпорт швидкий, а
+    бенчмарки та утиліти можуть підставити власну сесію Bot API. Повторний
+    виклик повертає вже створений Dispatcher.
+    
+    Args:
+        session: Сесія aiogram (наприклад, з адресою іншого сервера Bot API)
+    
+    Returns:
+        Dispatcher з підключеним router
+    """
+    global bot, dp, spotify, soundcloud, downloader, download_pool
+    if dp is not None:
+        return dp
+    
+    with startup_phase('config'):
+        setup_logging()
+        config.validate()
+    
+    with startup_phase('services'):
+        spotify = SpotifyService()
+        soundcloud = SoundCloudDownloader()
+        
+        # Завантажувач з резервним джерелом: YouTube Music стартує, якщо SoundCloud повільний
+        audio_sources[:] = [soundcloud]
+        if config.ENABLE_YOUTUBE_FALLBACK:
+            audio_sources.append(YouTubeMusicDownloader())
+        downloader = HedgedDownloader(audio_sources)
+        download_pool = DownloadPool(config.DOWNLOAD_WORKERS)
+        metrics.queue_depth.set_callback(collect_queue_depths)
+        if config.AUDIO_STORE_ENABLED:
+            # Індекс сховища і прибирання його папки - при старті, а не під час імпорту
+            audio_store.load()
+    
+    with startup_phase('dispatcher'):
+        # Ініціалізація бота з FSM storage
+        bot = Bot(token=config.TELEGRAM_BOT_TOKEN, session=session or bot_api.create_session())
+        dp = Dispatcher(storage=MemoryStorage())
+        
+        # Метрики: час обробки оновлень
+        if config.METRICS_ENABLED:
+            dp.update.outer_middleware(metrics.HandlerLatencyMiddleware())
+        
+        # Сторож event loop: назва активного хендлера для звітів про зависання
+        if config.LOOP_WATCHDOG_ENABLED:
+            dp.message.middleware(HandlerNameMiddleware(loop_watchdog))
+            dp.callback_query.middleware(HandlerNameMiddleware(loop_watchdog))
+        
+        dp.include_router(router)
+    return dp
+
+
+def start_background(coro, name: str) -> asyncio.Task:
+    """Фонова задача, помилка якої потрапляє в лог, а не губиться"""
+    task = asyncio.create_task(coro, name=name)
+    background_tasks.add(task)
+    
+    def done(task: asyncio.Task) -> None:
+        background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Фонова задача {name} завершилась з помилкою: {task.exception()}")
+    
+    task.add_done_callback(done)
+    return task
+
+
+def prewarm_imports() -> None:
+    """Фоновий імпорт yt-dlp та spotipy, щоб перший запит не чекав на нього"""
+    started = time.perf_counter()
+    import yt_dlp  # noqa: F401
+    import spotipy  # noqa: F401
+    logger.info(f"yt-dlp та spotipy завантажено у фоні за {time.perf_counter() - started:.2f} с")
+
+
+def collect_queue_depths() -> dict:
+    """Довжина черг для метрики sluhay_queue_depth"""
+    send = send_scheduler.snapshot()
+    jobs = job_scheduler.snapshot()
+    pool = download_pool.utilization()
+    return {
+        ('send',): sum(send['queued'].values()),
+        ('jobs_track',): jobs['queued']['track'],
+        ('jobs_bulk',): jobs['queued']['bulk'],
+        ('download_pool',): pool['queued'],
+    }
+
+
+# Підписи джерел для опису треку
+SOURCE_LABELS = {
+    'SoundCloud': '🟢 SoundCloud',
+    'YouTube Music': '🔴 YouTube Music',
+}
 
 # Файл для збереження налаштувань
 SETTINGS_FILE = "user_settings.json"
@@ -62,9 +206,9 @@ def save_user_settings():
     try:
         # Конвертуємо ключі в string для JSON
         to_save = {str(k): v for k, v in user_settings.items()}
-        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
+        with metrics.settings_save_seconds.time(), open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
             json.dump(to_save, f, ensure_ascii=False, indent=2)
-        logger.info(f"Збережено налаштування для {len(user_settings)} користувачів")
+        logger.debug(f"Збережено налаштування для {len(user_settings)} користувачів")
     except Exception as e:
         logger.error(f"Помилка при збереженні налаштувань: {e}")
 
@@ -178,7 +322,7 @@ def add_download_stats(user_id: int, item_type: str, duration_sec: int = 0, size
     settings['stats']['total_size_mb'] += size_mb
     
     save_user_settings()
-    logger.info(f"Статистика оновлена для користувача {user_id}: {item_type}, {duration_sec}s, {size_mb}MB")
+    logger.debug(f"Статистика оновлена для користувача {user_id}: {item_type}, {duration_sec}s, {size_mb}MB")
 
 
 def get_user_stats(user_id: int) -> dict:
@@ -187,6 +331,38 @@ def get_user_stats(user_id: int) -> dict:
     return settings['stats']
 
 
+def start_download_job(user_id: int) -> CancelToken:
+    """Зареєструвати нове завантаження користувача і отримати його токен скасування"""
+    token = CancelToken()
+    active_downloads.setdefault(user_id, set()).add(token)
+    return token
+
+
+def finish_download_job(user_id: int, token: CancelToken):
+    """Прибрати завершене завантаження з активних"""
+    tokens = active_downloads.get(user_id)
+    if tokens:
+        tokens.discard(token)
+        if not tokens:
+            del active_downloads[user_id]
+
+
+def cancel_user_downloads(user_id: int) -> int:
+    """Скасувати всі активні завантаження користувача (yt-dlp та FFmpeg зупиняються одразу)"""
+    tokens = active_downloads.get(user_id, set())
+    for token in list(tokens):
+        token.cancel()
+    if tokens:
+        logger.info(f"Користувач {user_id} скасував {len(tokens)} завантажень")
+    return len(tokens)
+
+
+def extract_playlist_info(profile: str, ydl_opts: dict, playlist_url: str) -> dict | None:
+    """Метадані плейліста через теплий екземпляр YoutubeDL (виконується в потоці)"""
+    with ydl_pool.acquire(profile, ydl_opts) as ydl:
+        return ydl.extract_info(playlist_url, download=False)
+
+
 async def get_youtube_playlist_tracks(playlist_url: str) -> list:
     """Отримати треки з YouTube Music плейліста"""
     try:
@@ -197,32 +373,31 @@ async def get_youtube_playlist_tracks(playlist_url: str) -> list:
             'force_generic_extractor': False,
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(playlist_url, download=False)
-            
-            if not info or 'entries' not in info:
-                return []
-            
-            tracks = []
-            for entry in info['entries']:
-                if entry:
-                    track_name = entry.get('title', 'Unknown Track')
-                    artist = entry.get('uploader', 'Unknown Artist')
-                    
-                    # Спробуємо витягти виконавця з назви
-                    if ' - ' in track_name:
-                        parts = track_name.split(' - ', 1)
-                        artist = parts[0].strip()
-                        track_name = parts[1].strip()
-                    
-                    tracks.append({
-                        'name': track_name,
-                        'artist': artist,
-                        'url': f"https://www.youtube.com/watch?v={entry.get('id', '')}"
-                    })
-            
-            return tracks
-            
+        info = await asyncio.to_thread(extract_playlist_info, 'playlist:yt', ydl_opts, playlist_url)
+        
+        if not info or 'entries' not in info:
+            return []
+        
+        tracks = []
+        for entry in info['entries']:
+            if entry:
+                track_name = entry.get('title', 'Unknown Track')
+                artist = entry.get('uploader', 'Unknown Artist')
+                
+                # Спробуємо витягти виконавця з назви
+                if ' - ' in track_name:
+                    parts = track_name.split(' - ', 1)
+                    artist = parts[0].strip()
+                    track_name = parts[1].strip()
+                
+                tracks.append({
+                    'name': track_name,
+                    'artist': artist,
+                    'url': f"https://www.youtube.com/watch?v={entry.get('id', '')}"
+                })
+        
+        return tracks
+    
     except Exception as e:
         logger.error(f"Помилка при парсингу YouTube Music: {e}")
         return []
@@ -239,79 +414,77 @@ async def get_soundcloud_playlist_tracks(playlist_url: str) -> list:
             'ignoreerrors': True,
         }
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            logger.info(f"SoundCloud: парсинг плейліста {playlist_url}")
-            info = ydl.extract_info(playlist_url, download=False)
-            
-            if not info:
-                logger.error("SoundCloud: info is None")
-                return []
+        logger.info(f"SoundCloud: парсинг плейліста {playlist_url}")
+        info = await asyncio.to_thread(extract_playlist_info, 'playlist:sc', ydl_opts, playlist_url)
+        
+        if not info:
+            logger.error("SoundCloud: info is None")
+            return []
+        
+        # Для SoundCloud може бути різна структура
+        entries = info.get('entries', [])
+        
+        # Якщо це окремий трек, а не плейліст
+        if not entries and info.get('title'):
+            tracks = [{
+                'name': info.get('title', 'Unknown Track'),
+                'artist': info.get('uploader', 'Unknown Artist'),
+                'url': info.get('webpage_url', playlist_url)
+            }]
+            logger.info(f"SoundCloud: це окремий трек, не плейліст")
+            return tracks
+        
+        if not entries:
+            logger.error(f"SoundCloud: no entries found. Info keys: {info.keys()}")
+            logger.error(f"SoundCloud: info type: {info.get('_type')}, url: {info.get('url')}")
+            return []
+        
+        tracks = []
+        for idx, entry in enumerate(entries):
+            if not entry:
+                continue
             
-            # Для SoundCloud може бути різна структура
-            entries = info.get('entries', [])
+            # Логуємо ключі першого треку для дебагу (весь словник - занадто великий)
+            if idx == 0:
+                logger.debug(f"SoundCloud entry keys: {sorted(entry.keys())}")
             
-            # Якщо це окремий трек, а не плейліст
-            if not entries and info.get('title'):
-                tracks = [{
-                    'name': info.get('title', 'Unknown Track'),
-                    'artist': info.get('uploader', 'Unknown Artist'),
-                    'url': info.get('webpage_url', playlist_url)
-                }]
-                logger.info(f"SoundCloud: це окремий трек, не плейліст")
-                return tracks
+            # Спочатку пробуємо взяти з метаданих
+            track_name = entry.get('title') or entry.get('track')
+            artist = entry.get('uploader') or entry.get('artist') or entry.get('creator') or entry.get('album_artist') or entry.get('channel')
             
-            if not entries:
-                logger.error(f"SoundCloud: no entries found. Info keys: {info.keys()}")
-                logger.error(f"SoundCloud: info type: {info.get('_type')}, url: {info.get('url')}")
-                return []
+            # Якщо немає - парсимо з URL
+            track_url = entry.get('url', '')
+            if not track_name and track_url:
+                try:
+                    # https://soundcloud.com/artist/track-name
+                    parts = track_url.rstrip('/').split('/')
+                    if len(parts) >= 2:
+                        url_track_name = parts[-1]
+                        # Якщо назва треку - це просто ID (тільки цифри), не використовуємо
+                        if not url_track_name.isdigit():
+                            track_name = url_track_name.replace('-', ' ').title()
+                        if not artist:
+                            artist = parts[-2].replace('-', ' ').title()
+                except Exception as e:
+                    logger.warning(f"Не вдалося парсити URL {track_url}: {e}", extra={'rate_key': 'soundcloud.parse_url'})
             
-            tracks = []
-            for idx, entry in enumerate(entries):
-                if not entry:
-                    continue
-                    
-                # Логуємо перший трек для дебагу
-                if idx == 0:
-                    logger.info(f"SoundCloud entry sample (all keys): {list(entry.keys())}")
-                    logger.info(f"SoundCloud entry sample (values): {entry}")
-                
-                # Спочатку пробуємо взяти з метаданих
-                track_name = entry.get('title') or entry.get('track')
-                artist = entry.get('uploader') or entry.get('artist') or entry.get('creator') or entry.get('album_artist') or entry.get('channel')
-                
-                # Якщо немає - парсимо з URL
-                track_url = entry.get('url', '')
-                if not track_name and track_url:
-                    try:
-                        # https://soundcloud.com/artist/track-name
-                        parts = track_url.rstrip('/').split('/')
-                        if len(parts) >= 2:
-                            url_track_name = parts[-1]
-                            # Якщо назва треку - це просто ID (тільки цифри), не використовуємо
-                            if not url_track_name.isdigit():
-                                track_name = url_track_name.replace('-', ' ').title()
-                            if not artist:
-                                artist = parts[-2].replace('-', ' ').title()
-                    except Exception as e:
-                        logger.warning(f"Не вдалося парсити URL {track_url}: {e}")
-                
-                # Фінальні значення за замовчуванням
-                if not track_name:
-                    track_name = 'Unknown Track'
-                if not artist:
-                    artist = 'Unknown Artist'
-                
-                logger.debug(f"SoundCloud parsed: {artist} - {track_name}")
-                
-                tracks.append({
-                    'name': track_name,
-                    'artist': artist,
-                    'url': track_url
-                })
+            # Фінальні значення за замовчуванням
+            if not track_name:
+                track_name = 'Unknown Track'
+            if not artist:
+                artist = 'Unknown Artist'
             
-            logger.info(f"SoundCloud: успішно парсано {len(tracks)} треків")
-            return tracks
+            logger.debug(f"SoundCloud parsed: {artist} - {track_name}")
             
+            tracks.append({
+                'name': track_name,
+                'artist': artist,
+                'url': track_url
+            })
+        
+        logger.info(f"SoundCloud: успішно парсано {len(tracks)} треків")
+        return tracks
+    
     except Exception as e:
         logger.error(f"Помилка при парсингу SoundCloud: {e}")
         import traceback
@@ -382,7 +555,7 @@ def get_bitrate_menu_keyboard():
     return keyboard
 
 
-@dp.message(CommandStart())
+@router.message(CommandStart())
 async def cmd_start(message: Message):
     """Обробник команди /start"""
     user_name = message.from_user.first_name or "друже"
@@ -395,7 +568,7 @@ async def cmd_start(message: Message):
 
 
 # Callback handlers
-@dp.callback_query(F.data == "search")
+@router.callback_query(F.data == "search")
 async def callback_search(callback: CallbackQuery):
     """Обробник кнопки Пошук"""
     await callback.message.edit_text(
@@ -406,7 +579,7 @@ async def callback_search(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "back_to_main")
+@router.callback_query(F.data == "back_to_main")
 async def callback_back_to_main(callback: CallbackQuery, state: FSMContext):
     """Повернення до головного меню"""
     await state.clear()
@@ -428,7 +601,7 @@ async def callback_back_to_main(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "search_track")
+@router.callback_query(F.data == "search_track")
 async def callback_search_track(callback: CallbackQuery, state: FSMContext):
     """Початок пошуку треку"""
     await state.set_state(SearchStates.waiting_for_track)
@@ -450,7 +623,7 @@ async def callback_search_track(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "search_album")
+@router.callback_query(F.data == "search_album")
 async def callback_search_album(callback: CallbackQuery, state: FSMContext):
     """Початок пошуку альбому"""
     await state.set_state(SearchStates.waiting_for_album)
@@ -472,7 +645,7 @@ async def callback_search_album(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "search_playlist")
+@router.callback_query(F.data == "search_playlist")
 async def callback_search_playlist(callback: CallbackQuery, state: FSMContext):
     """Початок пошуку плейліста"""
     await state.set_state(SearchStates.waiting_for_playlist)
@@ -495,7 +668,7 @@ async def callback_search_playlist(callback: CallbackQuery, state: FSMContext):
 
 
 # Заглушки для інших кнопок
-@dp.callback_query(F.data == "top50")
+@router.callback_query(F.data == "top50")
 async def callback_top50(callback: CallbackQuery):
     """ТОП-50 треків"""
     try:
@@ -568,7 +741,7 @@ async def show_top50_page(callback: CallbackQuery, tracks: list, page: int, trac
     await callback.message.edit_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
 
 
-@dp.callback_query(F.data.startswith("top50_page_"))
+@router.callback_query(F.data.startswith("top50_page_"))
 async def callback_top50_page(callback: CallbackQuery):
     """Перехід на іншу сторінку ТОП-50"""
     try:
@@ -589,7 +762,7 @@ async def callback_top50_page(callback: CallbackQuery):
         await callback.answer("❌ Помилка", show_alert=True)
 
 
-@dp.callback_query(F.data.startswith("top50_track_"))
+@router.callback_query(F.data.startswith("top50_track_"))
 async def callback_top50_track(callback: CallbackQuery, state: FSMContext):
     """Завантаження треку з ТОП-50"""
     try:
@@ -625,7 +798,7 @@ async def callback_top50_track(callback: CallbackQuery, state: FSMContext):
         await callback.answer("❌ Помилка завантаження", show_alert=True)
 
 
-@dp.callback_query(F.data == "settings")
+@router.callback_query(F.data == "settings")
 async def callback_settings(callback: CallbackQuery):
     """Налаштування"""
     await callback.message.edit_text(
@@ -637,7 +810,7 @@ async def callback_settings(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "set_bitrate")
+@router.callback_query(F.data == "set_bitrate")
 async def callback_set_bitrate(callback: CallbackQuery):
     """Меню вибору бітрейту"""
     current_bitrate = get_user_bitrate(callback.from_user.id)
@@ -657,7 +830,7 @@ async def callback_set_bitrate(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data.startswith("bitrate_"))
+@router.callback_query(F.data.startswith("bitrate_"))
 async def callback_bitrate_selected(callback: CallbackQuery):
     """Обробка вибору бітрейту"""
     bitrate = int(callback.data.split("_")[1])
@@ -676,7 +849,7 @@ async def callback_bitrate_selected(callback: CallbackQuery):
     await callback.answer(f"✅ Бітрейт {bitrate} kbps встановлено!")
 
 
-@dp.callback_query(F.data == "import_favorites")
+@router.callback_query(F.data == "import_favorites")
 async def callback_import_favorites(callback: CallbackQuery):
     """Меню імпорту улюблених"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -697,7 +870,7 @@ async def callback_import_favorites(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "import_spotify")
+@router.callback_query(F.data == "import_spotify")
 async def callback_import_spotify(callback: CallbackQuery, state: FSMContext):
     """Імпорт з Spotify"""
     await callback.message.edit_text(
@@ -719,7 +892,7 @@ async def callback_import_spotify(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "import_youtube")
+@router.callback_query(F.data == "import_youtube")
 async def callback_import_youtube(callback: CallbackQuery, state: FSMContext):
     """Імпорт з YouTube Music"""
     await callback.message.edit_text(
@@ -740,7 +913,7 @@ async def callback_import_youtube(callback: CallbackQuery, state: FSMContext):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "import_soundcloud")
+@router.callback_query(F.data == "import_soundcloud")
 async def callback_import_soundcloud(callback: CallbackQuery, state: FSMContext):
     """Імпорт з SoundCloud"""
     await callback.message.edit_text(
@@ -763,7 +936,7 @@ async def callback_import_soundcloud(callback: CallbackQuery, state: FSMContext)
     await callback.answer()
 
 
-@dp.callback_query(F.data == "clear_history")
+@router.callback_query(F.data == "clear_history")
 async def callback_clear_history(callback: CallbackQuery):
     """Очистка історії чата - підтвердження"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -787,7 +960,7 @@ async def callback_clear_history(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "clear_history_confirm")
+@router.callback_query(F.data == "clear_history_confirm")
 async def callback_clear_history_confirm(callback: CallbackQuery):
     """Виконання очистки історії"""
     try:
@@ -846,7 +1019,7 @@ async def callback_clear_history_confirm(callback: CallbackQuery):
         )
 
 
-@dp.callback_query(F.data == "profile")
+@router.callback_query(F.data == "profile")
 async def callback_profile(callback: CallbackQuery):
     """Профіль користувача"""
     user_id = callback.from_user.id
@@ -912,7 +1085,7 @@ async def callback_profile(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "clear_menu")
+@router.callback_query(F.data == "clear_menu")
 async def callback_clear_menu(callback: CallbackQuery):
     """Меню очищення даних"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -939,7 +1112,7 @@ async def callback_clear_menu(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "clear_saved_tracks")
+@router.callback_query(F.data == "clear_saved_tracks")
 async def callback_clear_saved_tracks(callback: CallbackQuery):
     """Очистити збережені треки"""
     user_id = callback.from_user.id
@@ -961,7 +1134,7 @@ async def callback_clear_saved_tracks(callback: CallbackQuery):
     await callback_clear_menu(callback)
 
 
-@dp.callback_query(F.data == "clear_all_saved")
+@router.callback_query(F.data == "clear_all_saved")
 async def callback_clear_all_saved(callback: CallbackQuery):
     """Очистити всі збережені"""
     user_id = callback.from_user.id
@@ -1002,7 +1175,7 @@ async def callback_clear_all_saved(callback: CallbackQuery):
         pass  # Ігноруємо помилку "message is not modified"
 
 
-@dp.callback_query(F.data == "reset_settings")
+@router.callback_query(F.data == "reset_settings")
 async def callback_reset_settings(callback: CallbackQuery):
     """Скинути налаштування"""
     user_id = callback.from_user.id
@@ -1025,7 +1198,7 @@ async def callback_reset_settings(callback: CallbackQuery):
     await callback_profile(callback)
 
 
-@dp.callback_query(F.data == "clear_stats")
+@router.callback_query(F.data == "clear_stats")
 async def callback_clear_stats(callback: CallbackQuery):
     """Очищення статистики"""
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
@@ -1048,7 +1221,7 @@ async def callback_clear_stats(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data == "clear_stats_confirm")
+@router.callback_query(F.data == "clear_stats_confirm")
 async def callback_clear_stats_confirm(callback: CallbackQuery):
     """Підтвердження очищення статистики"""
     user_id = callback.from_user.id
@@ -1070,7 +1243,7 @@ async def callback_clear_stats_confirm(callback: CallbackQuery):
     await callback_profile(callback)
 
 
-@dp.callback_query(F.data == "favorites")
+@router.callback_query(F.data == "favorites")
 async def callback_favorites(callback: CallbackQuery):
     """Показати збережені"""
     user_id = callback.from_user.id
@@ -1113,7 +1286,7 @@ async def callback_favorites(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data.startswith("fav_"))
+@router.callback_query(F.data.startswith("fav_"))
 async def callback_favorites_category(callback: CallbackQuery):
     """Показати категорію збережених"""
     user_id = callback.from_user.id
@@ -1209,7 +1382,7 @@ async def callback_favorites_category(callback: CallbackQuery):
     await callback.answer()
 
 
-@dp.callback_query(F.data.startswith("load_fav_"))
+@router.callback_query(F.data.startswith("load_fav_"))
 async def callback_load_favorite(callback: CallbackQuery, state: FSMContext):
     """Завантажити збережений трек/альбом/плейліст"""
     parts = callback.data.split("_")
@@ -1251,7 +1424,7 @@ async def callback_load_favorite(callback: CallbackQuery, state: FSMContext):
         await handle_playlist(callback.message, status_msg, url, state, is_search=False, user_id=user_id)
 
 
-@dp.callback_query(F.data.startswith("del_fav_"))
+@router.callback_query(F.data.startswith("del_fav_"))
 async def callback_delete_favorite(callback: CallbackQuery):
     """Видалити зі збережених"""
     parts = callback.data.split("_")
@@ -1295,7 +1468,7 @@ async def callback_delete_favorite(callback: CallbackQuery):
 
 
 # Обробник кнопки "Скасувати"
-@dp.message(F.text == "❌ Скасувати")
+@router.message(F.text == "❌ Скасувати")
 async def cancel_search(message: Message, state: FSMContext):
     """Скасування пошуку або завантаження"""
     current_state = await state.get_state()
@@ -1303,6 +1476,8 @@ async def cancel_search(message: Message, state: FSMContext):
     # Якщо йде завантаження - встановлюємо прапорець
     if current_state in [SearchStates.downloading_album, SearchStates.downloading_playlist]:
         await state.update_data(cancelled=True)
+        # Зупиняємо поточне завантаження, а не лише наступні треки
+        cancel_user_downloads(message.from_user.id)
         await message.answer(
             "⏸️ Зупиняю завантаження...",
             reply_markup=ReplyKeyboardRemove()
@@ -1324,7 +1499,7 @@ async def cancel_search(message: Message, state: FSMContext):
     )
 
 
-@dp.callback_query(F.data.startswith("save_"))
+@router.callback_query(F.data.startswith("save_"))
 async def callback_save_item(callback: CallbackQuery):
     """Збереження треку/альбому/плейліста"""
     parts = callback.data.split("_")
@@ -1361,19 +1536,19 @@ async def callback_save_item(callback: CallbackQuery):
         await callback.answer("ℹ️ Вже збережено раніше", show_alert=True)
 
 
-@dp.callback_query(F.data == "already_saved")
+@router.callback_query(F.data == "already_saved")
 async def callback_already_saved(callback: CallbackQuery):
     """Повідомлення що вже збережено"""
     await callback.answer("✅ Цей елемент вже в збережених!", show_alert=True)
 
 
-@dp.callback_query(F.data == "ignore")
+@router.callback_query(F.data == "ignore")
 async def callback_ignore(callback: CallbackQuery):
     """Ігнорувати натискання на індикатор сторінки"""
     await callback.answer()
 
 
-@dp.message(Command("help"))
+@router.message(Command("help"))
 async def cmd_help(message: Message):
     """Обробник команди /help"""
     help_text = (
@@ -1400,7 +1575,7 @@ async def cmd_help(message: Message):
     await message.answer(help_text, parse_mode=ParseMode.HTML)
 
 
-@dp.message(Command("test"))
+@router.message(Command("test"))
 async def cmd_test(message: Message):
     """Обробник команди /test для тестування без завантаження"""
     # Отримуємо аргумент команди
@@ -1428,7 +1603,7 @@ async def cmd_test(message: Message):
             await status_msg.edit_text("🔍 Шукаю трек...")
             await asyncio.sleep(0.5)
             
-            track_info = spotify.search_track("The Weeknd Blinding Lights")
+            track_info = await asyncio.to_thread(spotify.search_track, "The Weeknd Blinding Lights")
             
             if track_info:
                 info_text = (
@@ -1455,7 +1630,11 @@ async def cmd_test(message: Message):
                                         f"💿 <b>Альбом:</b> {track_info['album']}\n\n"
                                         f"✅ Всі дані отримано успішно!"
                                     )
-                                    await message.answer_photo(photo=photo, caption=caption, parse_mode=ParseMode.HTML)
+                                    await send_scheduler.send(
+                                        message.chat.id,
+                                        lambda: message.answer_photo(photo=photo, caption=caption, parse_mode=ParseMode.HTML),
+                                        priority=PRIORITY_INTERACTIVE
+                                    )
                                     await status_msg.delete()
                     except Exception as e:
                         logger.warning(f"Не вдалося завантажити обкладинку: {e}")
@@ -1467,10 +1646,10 @@ async def cmd_test(message: Message):
             await status_msg.edit_text("🔍 Шукаю альбом...")
             await asyncio.sleep(0.5)
             
-            search_result = spotify.search_album("The Weeknd After Hours")
+            search_result = await asyncio.to_thread(spotify.search_album, "The Weeknd After Hours")
             
             if search_result:
-                album_info = spotify.get_album_info(search_result['url'])
+                album_info = await asyncio.to_thread(spotify.get_album_info, search_result['url'])
                 
                 if album_info:
                     tracks = album_info['tracks']
@@ -1505,7 +1684,11 @@ async def cmd_test(message: Message):
                                             f"✅ Всі дані отримано успішно!\n"
                                             f"💡 У реальному режимі буде завантажено {total_tracks} треків."
                                         )
-                                        await message.answer_photo(photo=photo, caption=caption, parse_mode=ParseMode.HTML)
+                                        await send_scheduler.send(
+                                            message.chat.id,
+                                            lambda: message.answer_photo(photo=photo, caption=caption, parse_mode=ParseMode.HTML),
+                                            priority=PRIORITY_INTERACTIVE
+                                        )
                                         await status_msg.delete()
                         except Exception as e:
                             logger.warning(f"Не вдалося завантажити обкладинку: {e}")
@@ -1519,10 +1702,10 @@ async def cmd_test(message: Message):
             await status_msg.edit_text("🔍 Шукаю плейліст...")
             await asyncio.sleep(0.5)
             
-            search_result = spotify.search_playlist("Today's Top Hits")
+            search_result = await asyncio.to_thread(spotify.search_playlist, "Today's Top Hits")
             
             if search_result:
-                playlist_info = spotify.get_playlist_info(search_result['url'])
+                playlist_info = await asyncio.to_thread(spotify.get_playlist_info, search_result['url'])
                 
                 if playlist_info:
                     tracks = playlist_info['tracks']
@@ -1556,7 +1739,11 @@ async def cmd_test(message: Message):
                                             f"✅ Всі дані отримано успішно!\n"
                                             f"💡 У реальному режимі буде завантажено {total_tracks} треків."
                                         )
-                                        await message.answer_photo(photo=photo, caption=caption, parse_mode=ParseMode.HTML)
+                                        await send_scheduler.send(
+                                            message.chat.id,
+                                            lambda: message.answer_photo(photo=photo, caption=caption, parse_mode=ParseMode.HTML),
+                                            priority=PRIORITY_INTERACTIVE
+                                        )
                                         await status_msg.delete()
                         except Exception as e:
                             logger.warning(f"Не вдалося завантажити обкладинку: {e}")
@@ -1579,7 +1766,242 @@ async def cmd_test(message: Message):
         )
 
 
-@dp.message(SearchStates.waiting_for_track)
+def is_admin(user_id: int) -> bool:
+    """Чи є користувач адміністратором бота (config.ADMIN_USER_IDS)"""
+    return user_id in config.ADMIN_USER_IDS
+
+
+@router.message(Command("profile"))
+async def cmd_profile(message: Message):
+    """Профілювання живого процесу (тільки для адміністраторів)"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ Команда доступна лише адміністраторам.")
+        return
+    
+    # /profile [cpu|mem] [секунди] [top|collapsed]
+    args = message.text.split()[1:]
+    mode = 'cpu'
+    duration = config.PROFILE_DEFAULT_SEC
+    report = 'top'
+    for arg in args:
+        arg = arg.lower()
+        if arg in ('cpu', 'mem'):
+            mode = arg
+        elif arg in ('top', 'collapsed'):
+            report = arg
+        elif arg.isdigit():
+            duration = min(max(int(arg), 1), config.PROFILE_MAX_SEC)
+        else:
+            await message.answer(
+                "🧪 <b>Профілювання</b>\n\n"
+                "Використання: /profile [cpu|mem] [секунди] [top|collapsed]\n\n"
+                "• <code>/profile cpu 30</code> - топ функцій за 30 с (всі потоки)\n"
+                "• <code>/profile cpu 30 collapsed</code> - стеки для flamegraph\n"
+                "• <code>/profile mem 60</code> - різниця знімків tracemalloc",
+                parse_mode=ParseMode.HTML
+            )
+            return
+    
+    status_msg = await message.answer(f"⏳ Профілюю ({mode}, {duration} с)...")
+    try:
+        if mode == 'mem':
+            text = await profiler.profile_memory(duration)
+        else:
+            text = await profiler.profile_cpu(duration, report)
+    except profiler.ProfilerBusyError:
+        await status_msg.edit_text("⏳ Профайлер вже працює, спробуй пізніше.")
+        return
+    except Exception as e:
+        logger.error(f"Помилка профілювання: {e}")
+        await status_msg.edit_text(f"❌ Помилка профілювання: {e}")
+        return
+    
+    suffix = 'folded' if mode == 'cpu' and report == 'collapsed' else 'txt'
+    filename = f"profile_{mode}_{int(time.time())}.{suffix}"
+    await message.answer_document(
+        BufferedInputFile(text.encode('utf-8'), filename=filename),
+        caption=f"📊 Профіль {mode}, {duration} с"
+    )
+    await status_msg.delete()
+
+
+def directory_usage(path: str) -> tuple[int, int]:
+    """Кількість файлів та їх сумарний розмір у папці (байти)"""
+    files, total = 0, 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+                files += 1
+            except OSError:
+                pass  # Файл видалили під час обходу
+    return files, total
+
+
+def format_hit_rate(hits: int, misses: int) -> str:
+    """Частка влучань у кеш за лічильниками сервісу"""
+    if not hits + misses:
+        return "hit -"
+    return f"hit {100 * hits / (hits + misses):.0f}% з {int(hits + misses)}"
+
+
+async def build_status_text() -> str:
+    """Текст /status: задачі, черги, кеші, диск, event loop та джерела"""
+    jobs = job_scheduler.snapshot()
+    send = send_scheduler.snapshot()
+    pool = download_pool.utilization()
+    progress_texts = ProgressReporter.current_texts()
+    
+    lines = [f"📊 <b>Стан бота</b> ({datetime.now().strftime('%H:%M:%S')})", ""]
+    
+    # Задачі та прогрес по користувачах
+    lines.append(
+        f"⚙️ <b>Задачі:</b> треки {jobs['active']['track']}, альбоми/плейлисти {jobs['active']['bulk']} "
+        f"(ліміт {job_scheduler.max_active})\n"
+        f"   у черзі: треки {jobs['queued']['track']}, масові {jobs['queued']['bulk']}, "
+        f"користувачів {jobs['users_waiting']}\n"
+        f"   виконано {jobs['completed']}, відхилено {jobs['rejected']}, "
+        f"середня тривалість {jobs['avg_duration_sec']['track']:.0f} с / {jobs['avg_duration_sec']['bulk']:.0f} с"
+    )
+    active_jobs = job_scheduler.active_jobs()
+    for job in active_jobs[:config.STATUS_MAX_JOBS]:
+        running = int(job['running_sec'])
+        progress = progress_texts.get(job['chat_id'])
+        if progress:
+            # Останній рядок статусу без HTML-розмітки
+            # (текст лише з тегів чи пробілів - без рядка прогресу)
+            progress_lines = re.sub(r'<[^>]+>', '', progress).strip().splitlines()
+            progress = progress_lines[-1].strip()[:60] if progress_lines else None
+        lines.append(
+            f"   • <code>{job['user_id']}</code> {job['kind']} {running // 60}:{running % 60:02d}"
+            + (f" - {html.escape(progress)}" if progress else "")
+        )
+    if len(active_jobs) > config.STATUS_MAX_JOBS:
+        lines.append(f"   … ще {len(active_jobs) - config.STATUS_MAX_JOBS}")
+    lines.append("")
+    
+    ydl = ydl_pool.snapshot()
+    lines.append(
+        f"⬇️ <b>Пул завантажень:</b> {pool['active']}/{pool['workers']} зайнято, у черзі {pool['queued']}\n"
+        f"   YoutubeDL: {ydl['instances']} теплих, створено {ydl['created']}, повторно {ydl['reused']}"
+    )
+    lines.append(
+        f"📤 <b>Відправка:</b> у черзі {sum(send['queued'].values())} "
+        f"({', '.join(f'{name} {count}' for name, count in send['queued'].items())}), "
+        f"в роботі {send['in_flight']}, найдовше чекає {send['oldest_wait_sec']:.1f} с\n"
+        f"   відправлено {send['sent']}, повторів {send['retries']}, flood wait {send['flood_waits']}"
+    )
+    
+    # Кеші відповідностей
+    cache_parts = []
+    for source in audio_sources:
+        with source._cache_lock:
+            size = len(source.resolved_cache)
+            hit_rate = format_hit_rate(source.resolve_hits, source.resolve_misses)
+        cache_parts.append(f"{source.SOURCE_NAME} {size} ({hit_rate})")
+    lines.append(f"💾 <b>Кеш відповідностей:</b> {', '.join(cache_parts)}")
+    
+    # Диск та налаштування
+    files, used = await asyncio.to_thread(directory_usage, config.DOWNLOADS_DIR)
+    free = shutil.disk_usage(config.DOWNLOADS_DIR).free
+    disk = disk_manager.snapshot()
+    quota = f"{disk['quota'] / 1024 / 1024:.0f} МБ" if disk['quota'] else 'без квоти'
+    lines.append(
+        f"🗂 <b>{config.DOWNLOADS_DIR}/:</b> {files} файлів, {used / 1024 / 1024:.1f} МБ з {quota} "
+        f"(вільно {free / 1024 ** 3:.1f} ГБ)\n"
+        f"   зарезервовано {disk['reserved'] / 1024 / 1024:.0f} МБ ({disk['reservations']} задач), "
+        f"прибрано {disk['swept_files']} файлів, відмов {disk['refused']}"
+    )
+    stage = staging.snapshot()
+    if 'ram' in stage:
+        lines.append(
+            f"🧠 <b>Аудіо в пам'яті ({stage['ram_dir']}):</b> {stage['ram']['used'] / 1024 / 1024:.1f} МБ "
+            f"з {stage['ram']['quota'] / 1024 / 1024:.0f} МБ, треків {stage['placed']['ram']}, "
+            f"на диск {stage['spills']}"
+        )
+    settings_size = os.path.getsize(SETTINGS_FILE) if os.path.exists(SETTINGS_FILE) else 0
+    lines.append(
+        f"👥 <b>Налаштування:</b> {len(user_settings)} користувачів, {SETTINGS_FILE} {settings_size / 1024:.0f} КБ"
+    )
+    lines.append(f"🚀 <b>Старт:</b> {format_startup_timings()}")
+    if config.AUDIO_STORE_ENABLED:
+        store = audio_store.snapshot()
+        lines.append(
+            f"🗃 <b>Сховище аудіо:</b> {store['stored']} файлів, {store['bytes'] / 1024 / 1024:.1f} МБ "
+            f"з {config.AUDIO_STORE_MAX_MB} МБ, file_id {store['file_ids']}, посилань {store['refs']}\n"
+            f"   з кешу {store['hits']} ({format_hit_rate(store['hits'], store['misses'])}), дублікатів {store['deduplicated']}, витіснено {store['evicted']}"
+        )
+    if cache_uploader.enabled:
+        cache = cache_uploader.snapshot()
+        lines.append(
+            f"📎 <b>Чат кешу:</b> завантажено {cache['uploaded']} треків "
+            f"({cache['uploaded_bytes'] / 1024 / 1024:.1f} МБ), помилок {cache['failed']}"
+        )
+    if config.TELEGRAM_API_URL:
+        mode = "локальний, файли за шляхом" if bot_api.is_local(bot) else "звичайний"
+        lines.append(
+            f"📡 <b>Bot API:</b> {config.TELEGRAM_API_URL} ({mode}), "
+            f"ліміт {bot_api.upload_limit_bytes(bot) / 1024 / 1024:.0f} МБ"
+        )
+    
+    # Event loop
+    if config.LOOP_WATCHDOG_ENABLED:
+        loop_state = loop_watchdog.snapshot()
+        loop_line = (
+            f"🔄 <b>Event loop:</b> затримка {loop_state['last_lag'] * 1000:.0f} мс "
+            f"(макс {loop_state['max_lag'] * 1000:.0f} мс), зависань {loop_state['stalls']}"
+        )
+        if loop_state['last_stall']:
+            loop_line += f", останнє в {loop_state['last_stall']['handler'] or 'невідомо'}"
+        lines.append(loop_line)
+    else:
+        lines.append("🔄 <b>Event loop:</b> сторож вимкнено")
+    
+    # Зовнішні джерела
+    sources = governor.snapshot()
+    if sources:
+        lines.append("🌐 <b>Джерела:</b>")
+        for name, state in sources.items():
+            latency = f", p50 {state['p50_latency']:.1f} с" if state['p50_latency'] is not None else ""
+            lines.append(
+                f"   • {name}: {state['state']}, помилки {state['error_rate'] * 100:.0f}% "
+                f"з {state['requests']}, в роботі {state['in_flight']}/{state['limit']:g}{latency}"
+            )
+    return "\n".join(lines)
+
+
+def get_status_keyboard():
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Оновити", callback_data="status_refresh")]
+    ])
+
+
+@router.message(Command("status"))
+async def cmd_status(message: Message):
+    """Поточний стан бота (тільки для адміністраторів)"""
+    if not is_admin(message.from_user.id):
+        await message.answer("⛔ Команда доступна лише адміністраторам.")
+        return
+    await message.answer(await build_status_text(), parse_mode=ParseMode.HTML, reply_markup=get_status_keyboard())
+
+
+@router.callback_query(F.data == "status_refresh")
+async def callback_status_refresh(callback: CallbackQuery):
+    """Оновити /status"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Лише для адміністраторів", show_alert=True)
+        return
+    try:
+        await callback.message.edit_text(
+            await build_status_text(), parse_mode=ParseMode.HTML, reply_markup=get_status_keyboard()
+        )
+    except Exception as e:
+        # "message is not modified", якщо нічого не змінилось
+        logger.debug(f"Не вдалося оновити /status: {e}")
+    await callback.answer("Оновлено")
+
+
+@router.message(SearchStates.waiting_for_track)
 async def process_track_search(message: Message, state: FSMContext):
     """Обробка пошуку треку після натискання кнопки"""
     user_input = message.text.strip()
@@ -1601,7 +2023,7 @@ async def process_track_search(message: Message, state: FSMContext):
         await state.clear()
 
 
-@dp.message(SearchStates.waiting_for_album)
+@router.message(SearchStates.waiting_for_album)
 async def process_album_search(message: Message, state: FSMContext):
     """Обробка пошуку альбому після натискання кнопки"""
     user_input = message.text.strip()
@@ -1623,7 +2045,7 @@ async def process_album_search(message: Message, state: FSMContext):
         await state.clear()
 
 
-@dp.message(SearchStates.waiting_for_playlist)
+@router.message(SearchStates.waiting_for_playlist)
 async def process_playlist_search(message: Message, state: FSMContext):
     """Обробка пошуку плейліста після натискання кнопки"""
     user_input = message.text.strip()
@@ -1645,7 +2067,7 @@ async def process_playlist_search(message: Message, state: FSMContext):
         await state.clear()
 
 
-@dp.message(SearchStates.waiting_for_import_spotify)
+@router.message(SearchStates.waiting_for_import_spotify)
 async def process_import_spotify(message: Message, state: FSMContext):
     """Обробка імпорту з Spotify"""
     user_input = message.text.strip()
@@ -1660,7 +2082,7 @@ async def process_import_spotify(message: Message, state: FSMContext):
             return
         
         # Отримуємо інформацію про плейліст
-        playlist_info = spotify.get_playlist_info(user_input)
+        playlist_info = await asyncio.to_thread(spotify.get_playlist_info, user_input)
         
         if not playlist_info:
             await message.answer("❌ Не вдалося отримати інформацію про плейліст.\n\nПеревір посилання і спробуй ще раз.")
@@ -1687,13 +2109,12 @@ async def process_import_spotify(message: Message, state: FSMContext):
                 'url': f"https://open.spotify.com/track/{track_info.get('id', '')}"
             }
             
-            logger.info(f"Trying to add track: {track_data['name']} by {track_data['artist']}")
-            
             if add_to_favorites(user_id, 'track', track_data):
                 imported_count += 1
-                logger.info(f"Track added successfully, count: {imported_count}")
             else:
-                logger.warning(f"Track NOT added: {track_data['name']}")
+                logger.debug(f"Track NOT added (duplicate): {track_data['name']}")
+        
+        logger.info(f"Spotify import: added {imported_count} of {len(tracks)} tracks")
         
         await message.answer(
             f"✅ <b>Імпорт завершено!</b>\n\n"
@@ -1711,7 +2132,7 @@ async def process_import_spotify(message: Message, state: FSMContext):
         await state.clear()
 
 
-@dp.message(SearchStates.waiting_for_import_youtube)
+@router.message(SearchStates.waiting_for_import_youtube)
 async def process_import_youtube(message: Message, state: FSMContext):
     """Обробка імпорту з YouTube Music"""
     user_input = message.text.strip()
@@ -1739,7 +2160,7 @@ async def process_import_youtube(message: Message, state: FSMContext):
         for track in tracks:
             # Шукаємо трек на Spotify
             search_query = f"{track['artist']} {track['name']}"
-            spotify_track = spotify.search_track(search_query)
+            spotify_track = await asyncio.to_thread(spotify.search_track, search_query)
             
             if spotify_track:
                 track_data = {
@@ -1751,7 +2172,7 @@ async def process_import_youtube(message: Message, state: FSMContext):
                     imported_count += 1
             else:
                 skipped_count += 1
-                logger.warning(f"Не знайдено на Spotify: {search_query}")
+                logger.warning(f"Не знайдено на Spotify: {search_query}", extra={'rate_key': 'import.not_found'})
         
         result_text = f"✅ <b>Імпорт завершено!</b>\n\n"
         result_text += f"📥 Додано треків: <b>{imported_count}</b> з {len(tracks)}\n"
@@ -1770,7 +2191,7 @@ async def process_import_youtube(message: Message, state: FSMContext):
         await state.clear()
 
 
-@dp.message(SearchStates.waiting_for_import_soundcloud)
+@router.message(SearchStates.waiting_for_import_soundcloud)
 async def process_import_soundcloud(message: Message, state: FSMContext):
     """Обробка імпорту з SoundCloud"""
     user_input = message.text.strip()
@@ -1804,12 +2225,12 @@ async def process_import_soundcloud(message: Message, state: FSMContext):
             # Пропускаємо якщо назва треку - це тільки цифри (ID з SoundCloud) або Unknown Track
             if track['name'].replace(' ', '').isdigit() or track['name'] == 'Unknown Track':
                 skipped_count += 1
-                logger.warning(f"Пропущено трек з невідомою назвою: {track['name']}")
+                logger.warning(f"Пропущено трек з невідомою назвою: {track['name']}", extra={'rate_key': 'import.unknown_name'})
                 continue
             
-            logger.info(f"SoundCloud import [{idx+1}/{len(tracks)}]: searching '{search_query}' on Spotify")
+            logger.debug(f"SoundCloud import [{idx+1}/{len(tracks)}]: searching '{search_query}' on Spotify")
             
-            spotify_track = spotify.search_track(search_query)
+            spotify_track = await asyncio.to_thread(spotify.search_track, search_query)
             
             if spotify_track:
                 track_data = {
@@ -1817,16 +2238,15 @@ async def process_import_soundcloud(message: Message, state: FSMContext):
                     'artist': spotify_track['artists'],
                     'url': spotify_track.get('spotify_url', '')
                 }
-                logger.info(f"Found on Spotify: {spotify_track['artists']} - {spotify_track['name']}")
-                
                 if add_to_favorites(user_id, 'track', track_data):
                     imported_count += 1
-                    logger.info(f"Added to favorites, total: {imported_count}")
                 else:
-                    logger.warning(f"Not added (duplicate): {spotify_track['name']}")
+                    logger.debug(f"Not added (duplicate): {spotify_track['name']}")
             else:
                 skipped_count += 1
-                logger.warning(f"Не знайдено на Spotify: {search_query}")
+                logger.warning(f"Не знайдено на Spotify: {search_query}", extra={'rate_key': 'import.not_found'})
+        
+        logger.info(f"SoundCloud import: added {imported_count}, skipped {skipped_count} of {len(tracks)} tracks")
         
         result_text = f"✅ <b>Імпорт завершено!</b>\n\n"
         result_text += f"📥 Додано треків: <b>{imported_count}</b> з {len(tracks)}\n"
@@ -1847,7 +2267,7 @@ async def process_import_soundcloud(message: Message, state: FSMContext):
         await state.clear()
 
 
-@dp.message(F.text)
+@router.message(F.text)
 async def handle_message(message: Message):
     """Обробник текстових повідомлень"""
     user_input = message.text.strip()
@@ -1901,31 +2321,162 @@ async def handle_message(message: Message):
         )
 
 
+async def abort_cancelled_download(message: Message, progress: ProgressReporter, downloaded_files: list):
+    """Повідомити про скасування та видалити вже завантажені файли"""
+    await progress.update("❌ Завантаження скасовано!", force=True)
+    await message.answer(
+        "🎵 Що далі?",
+        reply_markup=get_main_menu_keyboard()
+    )
+    discard_downloaded_files(downloaded_files)
+
+
+def discard_downloaded_files(downloaded_files: list) -> None:
+    """Зупиняє завантаження в чат кешу та видаляє файли, що залишились (повторний виклик безпечний)"""
+    cache_uploader.cancel(downloaded_files)
+    for file_info in downloaded_files:
+        soundcloud.cleanup_file(file_info['path'])
+
+
+async def send_media_groups(message: Message, downloaded_files: list, what: str) -> None:
+    """
+    Відправляє завантажені файли альбому чи плейлиста групами по 10
+    
+    Треки, вже завантажені в чат кешу або відправлені раніше (той самий
+    вміст у сховищі аудіо), відправляються за file_id: такий запит не несе
+    байтів, тож невдалу групу можна одразу повторити.
+    Після відправки файли видаляються.
+    
+    Args:
+        message: Повідомлення, у чат якого відправляти
+        downloaded_files: Словники треків (path, title, performer, size_mb)
+        what: "альбому" / "плейлиста" для логів
+    """
+    # Telegram дозволяє відправляти до 10 медіа-файлів за раз
+    for i in range(0, len(downloaded_files), 10):
+        batch = downloaded_files[i:i+10]
+        file_ids = [await cache_uploader.file_id(file_info) for file_info in batch]
+        upload_bytes = sum(f['size_mb'] for f, file_id in zip(batch, file_ids) if not file_id) * 1024 * 1024
+        
+        # Групу лише з file_id повторюємо ще раз, перш ніж відправляти по одному
+        attempts = 2 if all(file_ids) else 1
+        fallback = True
+        for attempt in range(1, attempts + 1):
+            # Не додаємо thumbnail - він не працює коректно в медіа-групах
+            # Обкладинка вже показана в окремому повідомленні вище
+            media_group = [
+                InputMediaAudio(
+                    media=file_id or bot_api.audio_input(bot, file_info['path']),
+                    title=file_info['title'],
+                    performer=file_info['performer']
+                )
+                for file_info, file_id in zip(batch, file_ids)
+            ]
+            
+            # Відправляємо групу
+            try:
+                sent = await send_scheduler.send(
+                    message.chat.id,
+                    lambda: message.answer_media_group(media=media_group),
+                    priority=PRIORITY_BULK,
+                    cost=len(media_group)
+                )
+                metrics.upload_bytes.inc(upload_bytes, kind='bulk')
+                # file_id завантажених файлів - для наступних запитів того ж аудіо
+                for file_info, file_id, sent_message in zip(batch, file_ids, sent or []):
+                    if not file_id and sent_message.audio is not None:
+                        audio_store.set_file_id(file_info['path'], sent_message.audio.file_id)
+                fallback = False
+                break
+            except TelegramRetryAfter as e:
+                # Планувальник вже вичерпав повтори - поштучна відправка лише додасть запитів
+                logger.error(f"Flood control: медіа-групу {what} не відправлено: {e}")
+                fallback = False
+                break
+            except Exception as e:
+                logger.warning(f"Помилка при відправці медіа-групи {what} (спроба {attempt}): {e}")
+        
+        if fallback:
+            # Якщо не вдалося відправити групою, відправляємо по одному
+            for file_info, file_id in zip(batch, file_ids):
+                try:
+                    audio_file = file_id or bot_api.audio_input(bot, file_info['path'])
+                    await send_scheduler.send(
+                        message.chat.id,
+                        lambda: message.answer_audio(
+                            audio=audio_file,
+                            title=file_info['title'],
+                            performer=file_info['performer']
+                        ),
+                        priority=PRIORITY_BULK
+                    )
+                    if not file_id:
+                        metrics.upload_bytes.inc(file_info['size_mb'] * 1024 * 1024, kind='bulk')
+                except Exception as e:
+                    logger.error(f"Помилка при відправці файлу {file_info['title']}: {e}")
+        
+        # Видаляємо файли після відправки
+        for file_info in batch:
+            soundcloud.cleanup_file(file_info['path'])
+
+
+def format_eta(seconds: float) -> str:
+    """Форматує орієнтовний час очікування"""
+    minutes = int(seconds // 60)
+    if minutes < 1:
+        return "менше хвилини"
+    return f"~{minutes} хв"
+
+
+def queue_notifier(progress: ProgressReporter):
+    """Створює callback, що показує позицію в черзі завантажень у статусному повідомленні"""
+    async def notify(position: int, eta: float):
+        await progress.update(
+            f"🕐 Ти в черзі: {position}-й\n"
+            f"⏳ Орієнтовне очікування: {format_eta(eta)}"
+        )
+    return notify
+
+
 async def handle_track(message: Message, status_msg: Message, user_input: str, is_search: bool = False, user_id: int = None):
     """Обробка одного треку"""
+    actual_user_id = user_id if user_id is not None else message.from_user.id
+    cancel_token = start_download_job(actual_user_id)
+    progress = ProgressReporter(status_msg)
+    # Трейс запиту: етапи Spotify, пошук, завантаження, FFmpeg, відправка
+    trace = tracing.start_trace('handle_track', user_id=actual_user_id, query=user_input)
+    ticket = None
+    reservation = None
     try:
+        # Окремі треки обслуговуються раніше за альбоми та плейлисти
+        with tracing.span('queue.wait', kind=JOB_TRACK):
+            ticket = await job_scheduler.acquire(
+                actual_user_id, JOB_TRACK, cancel_token, notify=queue_notifier(progress), chat_id=progress.chat_id
+            )
         track_info = None
         
         if is_search:
             logger.info(f"Пошук треку: {user_input}")
-            await status_msg.edit_text("🔍 Шукаю трек...")
-            track_info = spotify.search_track(user_input)
+            await progress.update("🔍 Шукаю трек...", force=True)
+            track_info = await asyncio.to_thread(spotify.search_track, user_input)
             
             if not track_info:
-                await status_msg.edit_text(
+                await progress.update(
                     "❌ Трек не знайдено на Spotify.\n"
-                    "Спробуй інший запит або надішли посилання."
+                    "Спробуй інший запит або надішли посилання.",
+                    force=True
                 )
                 return
         else:
             logger.info(f"Обробка Spotify URL: {user_input}")
-            await status_msg.edit_text("🔍 Шукаю трек...")
-            track_info = spotify.get_track_info(user_input)
+            await progress.update("🔍 Шукаю трек...", force=True)
+            track_info = await asyncio.to_thread(spotify.get_track_info, user_input)
             
             if not track_info:
-                await status_msg.edit_text(
+                await progress.update(
                     "❌ Не вдалося отримати інформацію про трек зі Spotify.\n"
-                    "Перевір посилання і спробуй ще раз."
+                    "Перевір посилання і спробуй ще раз.",
+                    force=True
                 )
                 return
         
@@ -1937,35 +2488,53 @@ async def handle_track(message: Message, status_msg: Message, user_input: str, i
             f"💿 Альбом: {track_info['album']}\n\n"
             f"⏳ Шукаю трек на SoundCloud..."
         )
-        await status_msg.edit_text(info_text, parse_mode=ParseMode.HTML)
+        await progress.update(info_text, force=True)
         
         # Завантаження з SoundCloud
         # Використовуємо переданий user_id або з message
         actual_user_id = user_id if user_id is not None else message.from_user.id
         user_bitrate = get_user_bitrate(actual_user_id)
-        logger.info(f"Завантаження: {track_info['search_query']} ({user_bitrate} kbps)")
-        audio_path = soundcloud.download_audio(
+        
+        # Якість обираємо до завантаження, щоб файл пройшов через ліміт Bot API
+        upload_limit = bot_api.upload_limit_bytes(bot)
+        quality = plan_quality(track_info.get('duration_ms'), user_bitrate, upload_limit)
+        if quality.parts > config.SPLIT_MAX_PARTS:
+            await progress.update(
+                f"❌ Трек задовгий для Telegram: навіть з якістю {quality.bitrate} kbps "
+                f"його треба ділити на {quality.parts} частин (максимум {config.SPLIT_MAX_PARTS}).",
+                force=True
+            )
+            return
+        
+        reservation = await disk_manager.reserve(estimate_track_bytes(track_info.get('duration_ms'), quality.bitrate), JOB_TRACK)
+        logger.info(f"Завантаження: {track_info['search_query']} ({quality.describe()})")
+        audio_path, audio_source = await download_pool.run(
+            downloader.download_with_source,
             track_info['search_query'],
             f"{track_info['artists']} - {track_info['name']}",
             actual_user_id,
-            user_bitrate
+            quality.bitrate,
+            track_info=track_info,
+            cancel_token=cancel_token,
+            progress_callback=progress.hook(info_text.rsplit('\n\n', 1)[0])
         )
         
         if not audio_path:
-            await status_msg.edit_text(
-                "❌ Не вдалося завантажити трек з SoundCloud.\n\n"
+            await progress.update(
+                "❌ Не вдалося завантажити трек.\n\n"
                 "💡 Можливі причини:\n"
-                "• Трек недоступний на SoundCloud\n"
+                "• Трек недоступний на SoundCloud та YouTube Music\n"
                 "• Проблеми з доступом до сервісу\n"
                 "Спробуй:\n"
                 "1. Надіслати інший трек\n"
                 "2. Використати пряме посилання на Spotify",
-                parse_mode=ParseMode.HTML
+                force=True
             )
             return
+        disk_manager.hold(reservation, audio_path)
         
         # Відправляємо аудіо файл
-        await status_msg.edit_text(f"📤 Відправляю аудіо...")
+        await progress.update("📤 Відправляю аудіо...", force=True)
         
         # Форматуємо тривалість треку
         duration_ms = track_info.get('duration_ms', 0)
@@ -1979,6 +2548,27 @@ async def handle_track(message: Message, status_msg: Message, user_input: str, i
         file_size_mb = file_size / (1024 * 1024)
         file_size_str = f"{file_size_mb:.2f} МБ"
         
+        # Оцінка могла помилитися (VBR джерела) - ділимо за фактичним розміром
+        quality.parts = max(quality.parts, parts_for_size(file_size, upload_limit))
+        if quality.parts > config.SPLIT_MAX_PARTS or (quality.parts > 1 and not duration_sec):
+            soundcloud.cleanup_file(audio_path)
+            await progress.update(
+                f"❌ Трек завеликий для Telegram ({file_size_str}, "
+                f"ліміт {upload_limit / 1024 / 1024:.0f} МБ).\n"
+                "Спробуй нижчу якість у налаштуваннях.",
+                force=True
+            )
+            return
+        part_paths = [audio_path]
+        if quality.parts > 1:
+            await progress.update(f"✂️ Трек довгий - ділю на частини ({quality.parts})...", force=True)
+            try:
+                part_paths = await download_pool.run(
+                    split_mp3, audio_path, quality.parts, duration_sec, cancel_token=cancel_token
+                )
+            finally:
+                soundcloud.cleanup_file(audio_path)
+        
         # Формуємо детальний опис треку
         caption = (
             f"🎵 <b>{track_info['name']}</b>\n"
@@ -1986,8 +2576,8 @@ async def handle_track(message: Message, status_msg: Message, user_input: str, i
             f"💿 <b>Альбом:</b> {track_info['album']}\n"
             f"⏱ <b>Тривалість:</b> {duration_str}\n"
             f"📦 <b>Розмір:</b> {file_size_str}\n"
-            f"🎧 <b>Якість:</b> MP3 {user_bitrate} kbps\n"
-            f"📥 <b>Джерело:</b> 🟢 SoundCloud\n\n"
+            f"🎧 <b>Якість:</b> {quality.describe()}\n"
+            f"📥 <b>Джерело:</b> {SOURCE_LABELS.get(audio_source, audio_source)}\n\n"
             f"<i>Завантажено ботом @Sluhayy_bot</i> 🎶"
         )
         
@@ -1995,30 +2585,63 @@ async def handle_track(message: Message, status_msg: Message, user_input: str, i
         thumbnail = None
         if track_info.get('image_url'):
             try:
-                async with aiohttp.ClientSession() as session:
-                    async with session.get(track_info['image_url']) as resp:
-                        if resp.status == 200:
-                            thumbnail_data = await resp.read()
-                            thumbnail = BufferedInputFile(thumbnail_data, filename="cover.jpg")
+                with tracing.span('cover.fetch'):
+                    async with aiohttp.ClientSession() as session:
+                        async with session.get(track_info['image_url']) as resp:
+                            if resp.status == 200:
+                                thumbnail_data = await resp.read()
+                                thumbnail = BufferedInputFile(thumbnail_data, filename="cover.jpg")
             except Exception as e:
                 logger.warning(f"Не вдалося завантажити обкладинку: {e}")
         
-        audio_file = FSInputFile(audio_path)
-        await message.answer_audio(
-            audio=audio_file,
-            title=track_info['name'],
-            performer=track_info['artists'],
-            caption=caption,
-            parse_mode=ParseMode.HTML,
-            thumbnail=thumbnail
-        )
+        try:
+            for index, part_path in enumerate(part_paths, 1):
+                title = track_info['name']
+                part_caption = caption
+                if len(part_paths) > 1:
+                    title = f"{track_info['name']} ({index}/{len(part_paths)})"
+                    part_caption = f"🧩 <b>Частина {index}/{len(part_paths)}</b>\n" + caption
+                
+                def send_part(audio):
+                    return send_scheduler.send(
+                        message.chat.id,
+                        lambda: message.answer_audio(
+                            audio=audio,
+                            title=title,
+                            performer=track_info['artists'],
+                            caption=part_caption,
+                            parse_mode=ParseMode.HTML,
+                            thumbnail=thumbnail
+                        ),
+                        priority=PRIORITY_INTERACTIVE
+                    )
+                
+                # Такий самий вміст уже відправлявся - повторно використовуємо file_id без завантаження
+                file_id = audio_store.file_id_for(part_path) if len(part_paths) == 1 else None
+                if file_id:
+                    try:
+                        await send_part(file_id)
+                        continue
+                    except TelegramBadRequest as e:
+                        logger.warning(f"file_id не прийнято, відправляю файлом: {e}")
+                        audio_store.forget_file_id(file_id)
+                sent = await send_part(bot_api.audio_input(bot, part_path))
+                metrics.upload_bytes.inc(os.path.getsize(part_path), kind='track')
+                if len(part_paths) == 1 and sent is not None and sent.audio is not None:
+                    audio_store.set_file_id(part_path, sent.audio.file_id)
+        finally:
+            # Частини видаляються і тоді, коли відправка однієї з них не вдалась
+            for part_path in part_paths:
+                if part_path != audio_path:
+                    soundcloud.cleanup_file(part_path)
         
         # Оновлюємо статистику користувача
         actual_user_id = user_id if user_id is not None else message.from_user.id
         add_download_stats(actual_user_id, 'track', duration_sec, file_size_mb)
         
         # Видаляємо статусне повідомлення
-        await status_msg.delete()
+        progress.close()
+        await send_scheduler.send(message.chat.id, lambda: status_msg.delete(), priority=PRIORITY_STATUS)
         
         # Видаляємо файл після відправки
         soundcloud.cleanup_file(audio_path)
@@ -2050,23 +2673,56 @@ async def handle_track(message: Message, status_msg: Message, user_input: str, i
         }
         
         # Показуємо меню з кнопкою збереження
-        await message.answer(
-            "✅ Трек відправлено!\n\n🎵 Бажаєш зберегти цей трек?",
-            reply_markup=save_keyboard
+        await send_scheduler.send(
+            message.chat.id,
+            lambda: message.answer(
+                "✅ Трек відправлено!\n\n🎵 Бажаєш зберегти цей трек?",
+                reply_markup=save_keyboard
+            )
         )
         
         logger.info(f"Успішно відправлено: {track_info['name']}")
-        
+    
+    except JobRejectedError:
+        await progress.update(
+            "⏳ У тебе вже забагато завантажень у черзі.\n"
+            "Дочекайся завершення попередніх і спробуй ще раз.",
+            force=True
+        )
+    except DiskFullError:
+        await progress.update(
+            "💾 На сервері закінчується місце для завантажень.\n"
+            "Спробуй за кілька хвилин.",
+            force=True
+        )
+    except DownloadCancelledError:
+        await progress.update("❌ Завантаження скасовано!", force=True)
     except Exception as e:
         logger.error(f"Помилка при обробці запиту: {e}")
-        await status_msg.edit_text(
+        await progress.update(
             "❌ Виникла помилка при обробці запиту.\n"
-            "Спробуй ще раз або звернись до розробника."
+            "Спробуй ще раз або звернись до розробника.",
+            force=True
         )
+    finally:
+        progress.close()
+        if ticket:
+            job_scheduler.release(ticket, record=not cancel_token.cancelled)
+        disk_manager.release(reservation)
+        finish_download_job(actual_user_id, cancel_token)
+        tracing.finish_trace(trace)
 
 
 async def handle_playlist(message: types.Message, status_msg: types.Message, user_input: str, state: FSMContext = None, is_search: bool = False, user_id: int | None = None):
     """Обробка плейлиста зі Spotify"""
+    actual_user_id = user_id if user_id is not None else message.from_user.id
+    cancel_token = start_download_job(actual_user_id)
+    progress = ProgressReporter(status_msg)
+    # Трейс запиту: етапи Spotify, пошук, завантаження, FFmpeg, відправка
+    trace = tracing.start_trace('handle_playlist', user_id=actual_user_id, query=user_input)
+    ticket = None
+    reservation = None
+    downloaded_files = []
     try:
         playlist_url = user_input
         
@@ -2080,41 +2736,67 @@ async def handle_playlist(message: types.Message, status_msg: types.Message, use
                 keyboard=[[KeyboardButton(text="❌ Скасувати")]],
                 resize_keyboard=True
             )
-            cancel_msg = await message.answer(
-                "⚠️ Завантаження розпочато...",
-                reply_markup=cancel_keyboard
+            cancel_msg = await send_scheduler.send(
+                message.chat.id,
+                lambda: message.answer(
+                    "⚠️ Завантаження розпочато...",
+                    reply_markup=cancel_keyboard
+                )
+            )
+        
+        # Якщо диск майже заповнений, масову задачу навіть не ставимо в чергу
+        await disk_manager.check_bulk()
+        
+        # Чекаємо своєї черги (кнопка скасування вже доступна)
+        with tracing.span('queue.wait', kind=JOB_BULK):
+            ticket = await job_scheduler.acquire(
+                actual_user_id, JOB_BULK, cancel_token, notify=queue_notifier(progress), chat_id=progress.chat_id
             )
         
         # Якщо це текстовий пошук, спочатку шукаємо плейліст
         if is_search:
             logger.info(f"Пошук плейлиста: {user_input}")
-            await status_msg.edit_text("🔍 Шукаю плейліст...")
+            await progress.update("🔍 Шукаю плейліст...", force=True)
             
-            search_result = spotify.search_playlist(user_input)
+            search_result = await asyncio.to_thread(spotify.search_playlist, user_input)
             if not search_result:
-                await status_msg.edit_text(
+                await progress.update(
                     "❌ Плейліст не знайдено.\n\n"
                     "💡 Спробуй:\n"
                     "• Інший запит\n"
-                    "• Пряме посилання на плейліст Spotify"
+                    "• Пряме посилання на плейліст Spotify",
+                    force=True
                 )
                 return
             
             playlist_url = search_result['url']
         
         # Отримуємо інформацію про плейліст
-        playlist_info = spotify.get_playlist_info(playlist_url)
+        playlist_info = await asyncio.to_thread(spotify.get_playlist_info, playlist_url)
         
         if not playlist_info:
-            await status_msg.edit_text(
+            await progress.update(
                 "❌ Не вдалося отримати інформацію про плейліст зі Spotify.\n"
-                "Перевір посилання і спробуй ще раз."
+                "Перевір посилання і спробуй ще раз.",
+                force=True
             )
             return
         
         tracks = playlist_info['tracks']
         total_tracks = len(tracks)
         
+        # Резервуємо місце під усі треки до початку завантаження
+        # (з бітрейтом, який обере plan_quality для кожного треку)
+        bulk_bitrate = get_user_bitrate(actual_user_id)
+        upload_limit = bot_api.upload_limit_bytes(bot)
+        reservation = await disk_manager.reserve(
+            estimate_bulk_bytes([
+                (track.get('duration_ms'), plan_quality(track.get('duration_ms'), bulk_bitrate, upload_limit).bitrate)
+                for track in tracks
+            ]),
+            JOB_BULK
+        )
+        
         # Виводимо інформацію про плейліст
         info_text = (
             f"✅ Знайдено плейліст!\n\n"
@@ -2123,49 +2805,57 @@ async def handle_playlist(message: types.Message, status_msg: types.Message, use
             f"🎵 Треків: {total_tracks}\n\n"
             f"⏳ Починаю завантаження..."
         )
-        await status_msg.edit_text(info_text, parse_mode=ParseMode.HTML)
+        await progress.update(info_text, force=True)
         
         # Завантажуємо всі треки
-        downloaded_files = []
         failed_tracks = []
         
         for index, track_info in enumerate(tracks, 1):
-            # Перевірка на скасування (якщо є state)
-            if state:
+            # Перевірка на скасування (токен або прапорець у state)
+            cancelled = cancel_token.cancelled
+            if state and not cancelled:
                 data = await state.get_data()
-                if data.get('cancelled', False):
-                    logger.info("Завантаження плейлиста скасовано користувачем")
-                    await status_msg.edit_text("❌ Завантаження скасовано!")
-                    await message.answer(
-                        "🎵 Що далі?",
-                        reply_markup=get_main_menu_keyboard()
-                    )
-                    # Видаляємо вже завантажені файли
-                    for file_info in downloaded_files:
-                        soundcloud.cleanup_file(file_info['path'])
-                    return
+                cancelled = data.get('cancelled', False)
+            if cancelled:
+                logger.info("Завантаження плейлиста скасовано користувачем")
+                await abort_cancelled_download(message, progress, downloaded_files)
+                return
             
             try:
-                await status_msg.edit_text(
+                track_header = (
                     f"📋 <b>{playlist_info['name']}</b>\n\n"
                     f"⏳ Завантаження: {index}/{total_tracks}\n"
                     f"🎵 {track_info['name']}\n"
-                    f"👤 {track_info['artists']}",
-                    parse_mode=ParseMode.HTML
+                    f"👤 {track_info['artists']}"
                 )
+                await progress.update(track_header)
                 
                 # Завантаження з SoundCloud
                 # Використовуємо переданий user_id або з message
                 actual_user_id = user_id if user_id is not None else message.from_user.id
                 user_bitrate = get_user_bitrate(actual_user_id)
-                audio_path = soundcloud.download_audio(
+                # Довгий трек - з нижчою якістю, щоб не випав з медіа-групи через ліміт
+                track_bitrate = plan_quality(track_info.get('duration_ms'), user_bitrate, bot_api.upload_limit_bytes(bot)).bitrate
+                audio_path = await download_pool.run(
+                    downloader.download_audio,
                     track_info['search_query'],
                     f"{track_info['artists']} - {track_info['name']}",
                     actual_user_id,
-                    user_bitrate
+                    track_bitrate,
+                    track_info=track_info,
+                    cancel_token=cancel_token,
+                    progress_callback=progress.hook(track_header)
                 )
                 
-                if audio_path:
+                if audio_path and os.path.getsize(audio_path) > bot_api.upload_limit_bytes(bot):
+                    # Не пройде через ліміт Bot API - не ламаємо через нього всю медіа-групу
+                    soundcloud.cleanup_file(audio_path)
+                    failed_tracks.append(track_info['name'])
+                    logger.warning(f"Трек завеликий для відправки: {track_info['name']}", extra={'rate_key': 'bulk.too_large'})
+                elif audio_path:
+                    # Файл лежить до відправки медіа-груп - прибирання його не чіпає
+                    disk_manager.hold(reservation, audio_path)
+                    
                     # Отримуємо розмір файлу
                     file_size = os.path.getsize(audio_path)
                     file_size_mb = file_size / (1024 * 1024)
@@ -2181,21 +2871,28 @@ async def handle_playlist(message: types.Message, status_msg: types.Message, use
                         'duration_sec': duration_sec,
                         'size_mb': file_size_mb
                     })
+                    # Поки завантажуються наступні треки, цей вже йде в чат кешу
+                    cache_uploader.start(bot, downloaded_files[-1])
                 else:
                     failed_tracks.append(track_info['name'])
-                    logger.warning(f"Пропущено трек: {track_info['name']}")
-                
+                    logger.warning(f"Пропущено трек: {track_info['name']}", extra={'rate_key': 'bulk.skipped'})
+            
             except Exception as e:
                 failed_tracks.append(track_info['name'])
                 logger.error(f"Помилка при завантаженні треку {track_info['name']}: {e}")
         
+        # Скасування могло надійти під час останнього треку
+        if cancel_token.cancelled:
+            await abort_cancelled_download(message, progress, downloaded_files)
+            return
+        
         # Відправляємо завантажені файли групами по 10
         if downloaded_files:
-            await status_msg.edit_text(
+            await progress.update(
                 f"📋 <b>{playlist_info['name']}</b>\n\n"
                 f"✅ Завантажено: {len(downloaded_files)}/{total_tracks}\n"
                 f"📤 Відправляю файли...",
-                parse_mode=ParseMode.HTML
+                force=True
             )
             
             # Спочатку відправляємо обкладинку плейлиста з описом
@@ -2211,54 +2908,28 @@ async def handle_playlist(message: types.Message, status_msg: types.Message, use
                     if failed_tracks:
                         caption += f"\n❌ <b>Пропущено:</b> {len(failed_tracks)}"
                     
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(playlist_info['image_url']) as resp:
-                            if resp.status == 200:
-                                photo_data = await resp.read()
-                                photo = BufferedInputFile(photo_data, filename="playlist_cover.jpg")
-                                await message.answer_photo(photo=photo, caption=caption, parse_mode=ParseMode.HTML)
+                    photo = None
+                    with tracing.span('cover.fetch'):
+                        async with aiohttp.ClientSession() as session:
+                            async with session.get(playlist_info['image_url']) as resp:
+                                if resp.status == 200:
+                                    photo_data = await resp.read()
+                                    photo = BufferedInputFile(photo_data, filename="playlist_cover.jpg")
+                    if photo is not None:
+                        with tracing.span('cover.send'):
+                            await send_scheduler.send(
+                                message.chat.id,
+                                lambda: message.answer_photo(photo=photo, caption=caption, parse_mode=ParseMode.HTML),
+                                priority=PRIORITY_BULK
+                            )
                 except Exception as e:
                     logger.warning(f"Не вдалося відправити обкладинку плейлиста: {e}")
             
-            # Telegram дозволяє відправляти до 10 медіа-файлів за раз
-            for i in range(0, len(downloaded_files), 10):
-                batch = downloaded_files[i:i+10]
-                media_group = []
-                
-                for file_info in batch:
-                    audio_file = FSInputFile(file_info['path'])
-                    
-                    # Не додаємо thumbnail - він не працює коректно в медіа-групах
-                    # Обкладинка вже показана в окремому повідомленні вище
-                    media_group.append(InputMediaAudio(
-                        media=audio_file,
-                        title=file_info['title'],
-                        performer=file_info['performer']
-                    ))
-                
-                # Відправляємо групу
-                try:
-                    await message.answer_media_group(media=media_group)
-                except Exception as e:
-                    logger.warning(f"Помилка при відправці медіа-групи плейлиста: {e}")
-                    # Якщо не вдалося відправити групою, відправляємо по одному
-                    for file_info in batch:
-                        try:
-                            audio_file = FSInputFile(file_info['path'])
-                            await message.answer_audio(
-                                audio=audio_file,
-                                title=file_info['title'],
-                                performer=file_info['performer']
-                            )
-                        except Exception as e2:
-                            logger.error(f"Помилка при відправці файлу {file_info['title']}: {e2}")
-                
-                # Видаляємо файли після відправки
-                for file_info in batch:
-                    soundcloud.cleanup_file(file_info['path'])
+            await send_media_groups(message, downloaded_files, "плейлиста")
             
             # Видаляємо статусне повідомлення
-            await status_msg.delete()
+            progress.close()
+            await send_scheduler.send(message.chat.id, lambda: status_msg.delete(), priority=PRIORITY_STATUS)
             
             # Оновлюємо статистику користувача
             actual_user_id = user_id if user_id is not None else message.from_user.id
@@ -2293,30 +2964,68 @@ async def handle_playlist(message: types.Message, status_msg: types.Message, use
             }
             
             # Показуємо меню (прибираємо Reply клавіатуру)
-            await message.answer(
-                f"✅ Плейліст відправлено! ({len(downloaded_files)} треків)\n\n📀 Бажаєш зберегти цей плейліст?",
-                reply_markup=ReplyKeyboardRemove()
+            await send_scheduler.send(
+                message.chat.id,
+                lambda: message.answer(
+                    f"✅ Плейліст відправлено! ({len(downloaded_files)} треків)\n\n📀 Бажаєш зберегти цей плейліст?",
+                    reply_markup=ReplyKeyboardRemove()
+                )
             )
-            await message.answer(
-                "Вибери опцію:",
-                reply_markup=save_keyboard
+            await send_scheduler.send(
+                message.chat.id,
+                lambda: message.answer(
+                    "Вибери опцію:",
+                    reply_markup=save_keyboard
+                )
             )
         else:
-            await status_msg.edit_text(
+            await progress.update(
                 "❌ Не вдалося завантажити жодного треку з плейлиста.",
-                parse_mode=ParseMode.HTML
+                force=True
             )
-        
+    
+    except JobRejectedError:
+        await progress.update(
+            "⏳ У тебе вже забагато завантажень у черзі.\n"
+            "Дочекайся завершення попередніх і спробуй ще раз.",
+            force=True
+        )
+    except DiskFullError:
+        await progress.update(
+            "💾 На сервері закінчується місце для завантажень.\n"
+            "Спробуй пізніше або завантаж окремі треки.",
+            force=True
+        )
+    except DownloadCancelledError:
+        await abort_cancelled_download(message, progress, [])
     except Exception as e:
         logger.error(f"Помилка при обробці плейлиста: {e}")
-        await status_msg.edit_text(
+        await progress.update(
             "❌ Виникла помилка при обробці плейлиста.\n"
-            "Спробуй ще раз або звернись до розробника."
+            "Спробуй ще раз або звернись до розробника.",
+            force=True
         )
+    finally:
+        progress.close()
+        # Після помилки не залишаємо фонових завантажень у чат кешу і файлів на диску
+        discard_downloaded_files(downloaded_files)
+        if ticket:
+            job_scheduler.release(ticket, record=not cancel_token.cancelled)
+        disk_manager.release(reservation)
+        finish_download_job(actual_user_id, cancel_token)
+        tracing.finish_trace(trace)
 
 
 async def handle_album(message: types.Message, status_msg: types.Message, user_input: str, state: FSMContext = None, is_search: bool = False, user_id: int | None = None):
     """Обробка альбому зі Spotify"""
+    actual_user_id = user_id if user_id is not None else message.from_user.id
+    cancel_token = start_download_job(actual_user_id)
+    progress = ProgressReporter(status_msg)
+    # Трейс запиту: етапи Spotify, пошук, завантаження, FFmpeg, відправка
+    trace = tracing.start_trace('handle_album', user_id=actual_user_id, query=user_input)
+    ticket = None
+    reservation = None
+    downloaded_files = []
     try:
         album_url = user_input
         
@@ -2330,41 +3039,67 @@ async def handle_album(message: types.Message, status_msg: types.Message, user_i
                 keyboard=[[KeyboardButton(text="❌ Скасувати")]],
                 resize_keyboard=True
             )
-            cancel_msg = await message.answer(
-                "⚠️ Завантаження розпочато...",
-                reply_markup=cancel_keyboard
+            cancel_msg = await send_scheduler.send(
+                message.chat.id,
+                lambda: message.answer(
+                    "⚠️ Завантаження розпочато...",
+                    reply_markup=cancel_keyboard
+                )
+            )
+        
+        # Якщо диск майже заповнений, масову задачу навіть не ставимо в чергу
+        await disk_manager.check_bulk()
+        
+        # Чекаємо своєї черги (кнопка скасування вже доступна)
+        with tracing.span('queue.wait', kind=JOB_BULK):
+            ticket = await job_scheduler.acquire(
+                actual_user_id, JOB_BULK, cancel_token, notify=queue_notifier(progress), chat_id=progress.chat_id
             )
         
         # Якщо це текстовий пошук, спочатку шукаємо альбом
         if is_search:
             logger.info(f"Пошук альбому: {user_input}")
-            await status_msg.edit_text("🔍 Шукаю альбом...")
+            await progress.update("🔍 Шукаю альбом...", force=True)
             
-            search_result = spotify.search_album(user_input)
+            search_result = await asyncio.to_thread(spotify.search_album, user_input)
             if not search_result:
-                await status_msg.edit_text(
+                await progress.update(
                     "❌ Альбом не знайдено.\n\n"
                     "💡 Спробуй:\n"
                     "• Інший запит\n"
-                    "• Пряме посилання на альбом Spotify"
+                    "• Пряме посилання на альбом Spotify",
+                    force=True
                 )
                 return
             
             album_url = search_result['url']
         
         # Отримуємо інформацію про альбом
-        album_info = spotify.get_album_info(album_url)
+        album_info = await asyncio.to_thread(spotify.get_album_info, album_url)
         
         if not album_info:
-            await status_msg.edit_text(
+            await progress.update(
                 "❌ Не вдалося отримати інформацію про альбом зі Spotify.\n"
-                "Перевір посилання і спробуй ще раз."
+                "Перевір посилання і спробуй ще раз.",
+                force=True
             )
             return
         
         tracks = album_info['tracks']
         total_tracks = len(tracks)
         
+        # Резервуємо місце під усі треки до початку завантаження
+        # (з бітрейтом, який обере plan_quality для кожного треку)
+        bulk_bitrate = get_user_bitrate(actual_user_id)
+        upload_limit = bot_api.upload_limit_bytes(bot)
+        reservation = await disk_manager.reserve(
+            estimate_bulk_bytes([
+                (track.get('duration_ms'), plan_quality(track.get('duration_ms'), bulk_bitrate, upload_limit).bitrate)
+                for track in tracks
+            ]),
+            JOB_BULK
+        )
+        
         # Виводимо інформацію про альбом
         info_text = (
             f"✅ Знайдено альбом!\n\n"
@@ -2374,49 +3109,57 @@ async def handle_album(message: types.Message, status_msg: types.Message, user_i
             f"🎵 Треків: {total_tracks}\n\n"
             f"⏳ Починаю завантаження..."
         )
-        await status_msg.edit_text(info_text, parse_mode=ParseMode.HTML)
+        await progress.update(info_text, force=True)
         
         # Завантажуємо всі треки
-        downloaded_files = []
         failed_tracks = []
         
         for index, track_info in enumerate(tracks, 1):
-            # Перевірка на скасування (якщо є state)
-            if state:
+            # Перевірка на скасування (токен або прапорець у state)
+            cancelled = cancel_token.cancelled
+            if state and not cancelled:
                 data = await state.get_data()
-                if data.get('cancelled', False):
-                    logger.info("Завантаження альбому скасовано користувачем")
-                    await status_msg.edit_text("❌ Завантаження скасовано!")
-                    await message.answer(
-                        "🎵 Що далі?",
-                        reply_markup=get_main_menu_keyboard()
-                    )
-                    # Видаляємо вже завантажені файли
-                    for file_info in downloaded_files:
-                        soundcloud.cleanup_file(file_info['path'])
-                    return
+                cancelled = data.get('cancelled', False)
+            if cancelled:
+                logger.info("Завантаження альбому скасовано користувачем")
+                await abort_cancelled_download(message, progress, downloaded_files)
+                return
             
             try:
-                await status_msg.edit_text(
+                track_header = (
                     f"💿 <b>{album_info['name']}</b>\n\n"
                     f"⏳ Завантаження: {index}/{total_tracks}\n"
                     f"🎵 {track_info['name']}\n"
-                    f"👤 {track_info['artists']}",
-                    parse_mode=ParseMode.HTML
+                    f"👤 {track_info['artists']}"
                 )
+                await progress.update(track_header)
                 
                 # Завантаження з SoundCloud
                 # Використовуємо переданий user_id або з message
                 actual_user_id = user_id if user_id is not None else message.from_user.id
                 user_bitrate = get_user_bitrate(actual_user_id)
-                audio_path = soundcloud.download_audio(
+                # Довгий трек - з нижчою якістю, щоб не випав з медіа-групи через ліміт
+                track_bitrate = plan_quality(track_info.get('duration_ms'), user_bitrate, bot_api.upload_limit_bytes(bot)).bitrate
+                audio_path = await download_pool.run(
+                    downloader.download_audio,
                     track_info['search_query'],
                     f"{track_info['artists']} - {track_info['name']}",
                     actual_user_id,
-                    user_bitrate
+                    track_bitrate,
+                    track_info=track_info,
+                    cancel_token=cancel_token,
+                    progress_callback=progress.hook(track_header)
                 )
                 
-                if audio_path:
+                if audio_path and os.path.getsize(audio_path) > bot_api.upload_limit_bytes(bot):
+                    # Не пройде через ліміт Bot API - не ламаємо через нього всю медіа-групу
+                    soundcloud.cleanup_file(audio_path)
+                    failed_tracks.append(track_info['name'])
+                    logger.warning(f"Трек завеликий для відправки: {track_info['name']}", extra={'rate_key': 'bulk.too_large'})
+                elif audio_path:
+                    # Файл лежить до відправки медіа-груп - прибирання його не чіпає
+                    disk_manager.hold(reservation, audio_path)
+                    
                     # Отримуємо розмір файлу
                     file_size = os.path.getsize(audio_path)
                     file_size_mb = file_size / (1024 * 1024)
@@ -2432,21 +3175,28 @@ async def handle_album(message: types.Message, status_msg: types.Message, user_i
                         'duration_sec': duration_sec,
                         'size_mb': file_size_mb
                     })
+                    # Поки завантажуються наступні треки, цей вже йде в чат кешу
+                    cache_uploader.start(bot, downloaded_files[-1])
                 else:
                     failed_tracks.append(track_info['name'])
-                    logger.warning(f"Пропущено трек: {track_info['name']}")
-                
+                    logger.warning(f"Пропущено трек: {track_info['name']}", extra={'rate_key': 'bulk.skipped'})
+            
             except Exception as e:
                 failed_tracks.append(track_info['name'])
                 logger.error(f"Помилка при завантаженні треку {track_info['name']}: {e}")
         
+        # Скасування могло надійти під час останнього треку
+        if cancel_token.cancelled:
+            await abort_cancelled_download(message, progress, downloaded_files)
+            return
+        
         # Відправляємо завантажені файли групами по 10
         if downloaded_files:
-            await status_msg.edit_text(
+            await progress.update(
                 f"💿 <b>{album_info['name']}</b>\n\n"
                 f"✅ Завантажено: {len(downloaded_files)}/{total_tracks}\n"
                 f"📤 Відправляю файли...",
-                parse_mode=ParseMode.HTML
+                force=True
             )
             
             # Спочатку відправляємо обкладинку альбому з описом
@@ -2463,54 +3213,28 @@ async def handle_album(message: types.Message, status_msg: types.Message, user_i
                     if failed_tracks:
                         caption += f"\n❌ <b>Пропущено:</b> {len(failed_tracks)}"
                     
-                    async with aiohttp.ClientSession() as session:
-                        async with session.get(album_info['image_url']) as resp:
-                            if resp.status == 200:
-                                photo_data = await resp.read()
-                                photo = BufferedInputFile(photo_data, filename="album_cover.jpg")
-                                await message.answer_photo(photo=photo, caption=caption, parse_mode=ParseMode.HTML)
+                    photo = None
+                    with tracing.span('cover.fetch'):
+                        async with aiohttp.ClientSession() as session:
+                            async with session.get(album_info['image_url']) as resp:
+                                if resp.status == 200:
+                                    photo_data = await resp.read()
+                                    photo = BufferedInputFile(photo_data, filename="album_cover.jpg")
+                    if photo is not None:
+                        with tracing.span('cover.send'):
+                            await send_scheduler.send(
+                                message.chat.id,
+                                lambda: message.answer_photo(photo=photo, caption=caption, parse_mode=ParseMode.HTML),
+                                priority=PRIORITY_BULK
+                            )
                 except Exception as e:
                     logger.warning(f"Не вдалося відправити обкладинку альбому: {e}")
             
-            # Telegram дозволяє відправляти до 10 медіа-файлів за раз
-            for i in range(0, len(downloaded_files), 10):
-                batch = downloaded_files[i:i+10]
-                media_group = []
-                
-                for file_info in batch:
-                    audio_file = FSInputFile(file_info['path'])
-                    
-                    # Не додаємо thumbnail - він не працює коректно в медіа-групах
-                    # Обкладинка вже показана в окремому повідомленні вище
-                    media_group.append(InputMediaAudio(
-                        media=audio_file,
-                        title=file_info['title'],
-                        performer=file_info['performer']
-                    ))
-                
-                # Відправляємо групу
-                try:
-                    await message.answer_media_group(media=media_group)
-                except Exception as e:
-                    logger.warning(f"Помилка при відправці медіа-групи альбому: {e}")
-                    # Якщо не вдалося відправити групою, відправляємо по одному
-                    for file_info in batch:
-                        try:
-                            audio_file = FSInputFile(file_info['path'])
-                            await message.answer_audio(
-                                audio=audio_file,
-                                title=file_info['title'],
-                                performer=file_info['performer']
-                            )
-                        except Exception as e2:
-                            logger.error(f"Помилка при відправці файлу {file_info['title']}: {e2}")
-                
-                # Видаляємо файли після відправки
-                for file_info in batch:
-                    soundcloud.cleanup_file(file_info['path'])
+            await send_media_groups(message, downloaded_files, "альбому")
             
             # Видаляємо статусне повідомлення
-            await status_msg.delete()
+            progress.close()
+            await send_scheduler.send(message.chat.id, lambda: status_msg.delete(), priority=PRIORITY_STATUS)
             
             # Оновлюємо статистику користувача
             actual_user_id = user_id if user_id is not None else message.from_user.id
@@ -2545,38 +3269,91 @@ async def handle_album(message: types.Message, status_msg: types.Message, user_i
             }
             
             # Показуємо меню (прибираємо Reply клавіатуру)
-            await message.answer(
-                f"✅ Альбом відправлено! ({len(downloaded_files)} треків)\n\n💿 Бажаєш зберегти цей альбом?",
-                reply_markup=ReplyKeyboardRemove()
+            await send_scheduler.send(
+                message.chat.id,
+                lambda: message.answer(
+                    f"✅ Альбом відправлено! ({len(downloaded_files)} треків)\n\n💿 Бажаєш зберегти цей альбом?",
+                    reply_markup=ReplyKeyboardRemove()
+                )
             )
-            await message.answer(
-                "Вибери опцію:",
-                reply_markup=save_keyboard
+            await send_scheduler.send(
+                message.chat.id,
+                lambda: message.answer(
+                    "Вибери опцію:",
+                    reply_markup=save_keyboard
+                )
             )
         else:
-            await status_msg.edit_text(
+            await progress.update(
                 "❌ Не вдалося завантажити жодного треку з альбому.",
-                parse_mode=ParseMode.HTML
+                force=True
             )
-        
+    
+    except JobRejectedError:
+        await progress.update(
+            "⏳ У тебе вже забагато завантажень у черзі.\n"
+            "Дочекайся завершення попередніх і спробуй ще раз.",
+            force=True
+        )
+    except DiskFullError:
+        await progress.update(
+            "💾 На сервері закінчується місце для завантажень.\n"
+            "Спробуй пізніше або завантаж окремі треки.",
+            force=True
+        )
+    except DownloadCancelledError:
+        await abort_cancelled_download(message, progress, [])
     except Exception as e:
         logger.error(f"Помилка при обробці альбому: {e}")
-        await status_msg.edit_text(
+        await progress.update(
             "❌ Виникла помилка при обробці альбому.\n"
-            "Спробуй ще раз або звернись до розробника."
+            "Спробуй ще раз або звернись до розробника.",
+            force=True
         )
+    finally:
+        progress.close()
+        # Після помилки не залишаємо фонових завантажень у чат кешу і файлів на диску
+        discard_downloaded_files(downloaded_files)
+        if ticket:
+            job_scheduler.release(ticket, record=not cancel_token.cancelled)
+        disk_manager.release(reservation)
+        finish_download_job(actual_user_id, cancel_token)
+        tracing.finish_trace(trace)
 
 
 async def main():
     """Головна функція запуску бота"""
+    create_app()
+    
     # Завантажуємо налаштування користувачів
-    load_user_settings()
+    with startup_phase('settings'):
+        load_user_settings()
     
     logger.info("Бот Sluhay запущено!")
+    metrics_runner = None
     try:
+        # HTTP-сервер /metrics (тільки якщо METRICS_ENABLED=1)
+        with startup_phase('metrics'):
+            metrics_runner = await metrics.start_server()
+        
+        # Сторож event loop (лог зі стеком, якщо loop блокується)
+        if config.LOOP_WATCHDOG_ENABLED:
+            loop_watchdog.start()
+        
+        # Прибирання файлів, що залишились після попереднього запуску
+        with startup_phase('disk'):
+            await disk_manager.start()
+            await staging.start()
+        
         # Видаляємо старі оновлення та webhook
-        await bot.delete_webhook(drop_pending_updates=True)
+        with startup_phase('webhook'):
+            await bot.delete_webhook(drop_pending_updates=True)
         logger.info("Webhook очищено, старі оновлення видалено")
+        logger.info(f"Старт за {format_startup_timings()}")
+        
+        # Важкі бібліотеки джерел підвантажуються вже після старту
+        if config.STARTUP_PREWARM:
+            start_background(asyncio.to_thread(prewarm_imports), 'prewarm_imports')
         
         # Запускаємо polling
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
@@ -2590,6 +3367,12 @@ async def main():
     finally:
         # Зберігаємо налаштування перед виходом
         save_user_settings()
+        if metrics_runner:
+            await metrics_runner.cleanup()
+        await loop_watchdog.stop()
+        await disk_manager.stop()
+        await staging.stop()
+        ydl_pool.close()
         await bot.session.close()
 
 
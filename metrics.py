@@ -0,0 +1,263 @@
+import time
+import logging
+import threading
+from aiogram import BaseMiddleware
+import config
+
+
+logger = logging.getLogger(__name__)
+
+# Якщо метрики вимкнені, всі методи одразу повертаються
+ENABLED = config.METRICS_ENABLED
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Всі створені метрики (в порядку оголошення)
+REGISTRY = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in (extra or {}).items()]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """Базовий клас метрики з мітками"""
+    
+    TYPE = 'untyped'
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        REGISTRY.append(self)
+    
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+    
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+    
+    def value(self, **labels):
+        """Поточне значення для міток (None, якщо ще не записувалось)"""
+        with self._lock:
+            return self._values.get(self._key(labels))
+    
+    def render(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    """Лічильник, що тільки зростає"""
+    
+    TYPE = 'counter'
+    
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """
+    Поточне значення
+    
+    Замість set() можна задати callback, який викликається при кожному
+    зчитуванні /metrics і повертає {(значення міток, ...): число}.
+    """
+    
+    TYPE = 'gauge'
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callback = None
+    
+    def set(self, value: float, **labels) -> None:
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def set_callback(self, callback) -> None:
+        self._callback = callback
+    
+    def render(self) -> list:
+        if self._callback is None:
+            return super().render()
+        lines = self._header()
+        try:
+            values = self._callback()
+        except Exception as e:
+            logger.warning(f"Не вдалося зібрати метрику {self.name}: {e}")
+            return lines
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class _Timer:
+    """Контекстний менеджер для вимірювання тривалості"""
+    
+    __slots__ = ('histogram', 'labels', 'started')
+    
+    def __init__(self, histogram: 'Histogram', labels: dict):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc) -> bool:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class _NullTimer:
+    """Порожній таймер для вимкнених метрик"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc) -> bool:
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Histogram(_Metric):
+    """Розподіл значень (тривалості, розміри) по кошиках"""
+    
+    TYPE = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, **labels) -> None:
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][index] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+    
+    def time(self, **labels):
+        """with histogram.time(label=...): ... - вимірює тривалість блоку"""
+        if not ENABLED:
+            return _NULL_TIMER
+        return _Timer(self, labels)
+    
+    def render(self) -> list:
+        with self._lock:
+            items = sorted((key, {'buckets': list(state['buckets']), 'sum': state['sum'], 'count': state['count']})
+                           for key, state in self._values.items())
+        lines = self._header()
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['buckets']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, {'le': bound})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, {'le': '+Inf'})
+            lines.append(f"{self.name}_bucket{labels} {state['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+def render_all() -> str:
+    """Всі метрики у текстовому форматі Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+class HandlerLatencyMiddleware(BaseMiddleware):
+    """Middleware для dp.update: час обробки та помилки по типу оновлення"""
+    
+    async def __call__(self, handler, event, data):
+        update_type = getattr(event, 'event_type', None) or 'unknown'
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(update_type=update_type)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, update_type=update_type)
+
+
+async def start_server(host: str = None, port: int = None):
+    """
+    Запускає HTTP-сервер з /metrics
+    
+    Returns:
+        aiohttp AppRunner (для зупинки) або None, якщо метрики вимкнені
+    """
+    if not ENABLED:
+        return None
+    from aiohttp import web
+    
+    async def handle_metrics(request):
+        return web.Response(text=render_all(), content_type='text/plain', charset='utf-8')
+    
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    host = host or config.METRICS_HOST
+    port = port or config.METRICS_PORT
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики доступні на http://{host}:{port}/metrics")
+    return runner
+
+
+# ---------- Метрики бота ----------
+
+handler_seconds = Histogram('sluhay_handler_seconds', 'Час обробки оновлення Telegram', ['update_type'])
+handler_errors = Counter('sluhay_handler_errors_total', 'Необроблені помилки в хендлерах', ['update_type'])
+spotify_seconds = Histogram('sluhay_spotify_request_seconds', 'Затримка запитів до Spotify API', ['method'])
+search_seconds = Histogram('sluhay_source_search_seconds', 'Пошук кандидатів у джерелі', ['source'])
+download_seconds = Histogram('sluhay_source_download_seconds', 'Завантаження з джерела (yt-dlp)', ['source'])
+downloads = Counter('sluhay_downloads_total', 'Завантаження за джерелом і результатом', ['source', 'result'])
+transcode_seconds = Histogram('sluhay_transcode_seconds', 'Конвертація в MP3 (FFmpeg)')
+send_seconds = Histogram('sluhay_telegram_send_seconds', 'Тривалість запитів до Bot API', ['priority'])
+flood_waits = Counter('sluhay_telegram_flood_waits_total', 'Відповіді 429 від Telegram')
+upload_bytes = Counter('sluhay_upload_bytes_total', 'Відправлено аудіо в Telegram (байт)', ['kind'])
+cache_requests = Counter('sluhay_cache_requests_total', 'Звернення до кешів', ['cache', 'result'])
+queue_depth = Gauge('sluhay_queue_depth', 'Довжина черг', ['queue'])
+loop_lag_seconds = Histogram('sluhay_event_loop_lag_seconds', 'Затримка event loop',
+                             buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+loop_stalls = Counter('sluhay_event_loop_stalls_total', 'Зависання event loop понад поріг', ['handler'])
+settings_save_seconds = Histogram('sluhay_settings_save_seconds', 'Збереження налаштувань користувачів')
+ydl_instances = Counter('sluhay_ydl_instances_total', 'Екземпляри YoutubeDL: створені та повторно використані', ['result'])
+disk_used_bytes = Gauge('sluhay_downloads_dir_bytes', 'Обсяг папки завантажень (на момент перерахунку)', ['dir'])
+disk_swept_bytes = Counter('sluhay_downloads_swept_bytes_total', 'Видалено забутих файлів з папки завантажень (байт)')
+disk_refusals = Counter('sluhay_disk_refusals_total', 'Задачі, відхилені через брак місця', ['kind'])
+staging_files = Counter('sluhay_staging_files_total', 'Куди записано треки: папка в пам\'яті чи диск', ['place'])
+download_resumes = Counter('sluhay_download_resumes_total', 'Продовжені обірвані завантаження', ['source'])
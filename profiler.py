@@ -0,0 +1,171 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+import config
+
+
+logger = logging.getLogger(__name__)
+
+# Одночасно працює тільки один профайлер
+_profile_lock = asyncio.Lock()
+
+REPORT_TOP = 40
+
+
+class ProfilerBusyError(Exception):
+    """Інший профайлер вже працює"""
+    pass
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _sample_threads(duration: float, interval: float) -> tuple[Counter, int]:
+    """
+    Семплювання стеків усіх потоків через sys._current_frames()
+    
+    Працює в окремому потоці, тож не зупиняє event loop і бачить і loop,
+    і потоки завантажень.
+    
+    Returns:
+        (Counter згорнутих стеків, кількість семплів)
+    """
+    own_ident = threading.get_ident()
+    stacks = Counter()
+    samples = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+            stacks[(names.get(ident, str(ident)), tuple(labels))] += 1
+        frame = None  # Не тримаємо посилання на кадри між семплами
+        samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+
+def format_collapsed(stacks: Counter) -> str:
+    """Формат flamegraph.pl / speedscope: "потік;файл:функція;... кількість\""""
+    lines = [
+        f"{thread};{';'.join(frames)} {count}"
+        for (thread, frames), count in stacks.most_common()
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def format_top(stacks: Counter, samples: int, duration: float, interval: float) -> str:
+    """Топ функцій за власним (self) та загальним (total) часом"""
+    self_counts = Counter()
+    total_counts = Counter()
+    thread_counts = Counter()
+    for (thread, frames), count in stacks.items():
+        thread_counts[thread] += count
+        if frames:
+            self_counts[frames[-1]] += count
+        for label in set(frames):
+            total_counts[label] += count
+    
+    def share(count: int) -> str:
+        return f"{100 * count / samples:6.1f}%" if samples else '   n/a'
+    
+    lines = [
+        f"Sampling profile: {duration:.0f} s, {samples} семплів (кожні {interval * 1000:.0f} мс)",
+        "Відсоток - частка семплів, у яких потік/функція була у стеку.",
+        "",
+        "Потоки:",
+    ]
+    lines += [f"  {share(count)}  {thread}" for thread, count in thread_counts.most_common()]
+    lines += ["", f"Топ-{REPORT_TOP} за власним часом (self):"]
+    lines += [f"  {share(count)}  {label}" for label, count in self_counts.most_common(REPORT_TOP)]
+    lines += ["", f"Топ-{REPORT_TOP} за загальним часом (total):"]
+    lines += [f"  {share(count)}  {label}" for label, count in total_counts.most_common(REPORT_TOP)]
+    return '\n'.join(lines) + '\n'
+
+
+async def profile_cpu(duration: float, report: str = 'top') -> str:
+    """
+    Семплювальний профайлер живого процесу
+    
+    Args:
+        duration: Скільки секунд збирати семпли
+        report: 'top' (топ функцій) або 'collapsed' (згорнуті стеки для flamegraph)
+    
+    Returns:
+        Текст звіту
+    
+    Raises:
+        ProfilerBusyError: якщо інший профайлер вже працює
+    """
+    if _profile_lock.locked():
+        raise ProfilerBusyError("Профайлер вже працює")
+    async with _profile_lock:
+        interval = config.PROFILE_SAMPLE_INTERVAL_SEC
+        stacks, samples = await asyncio.to_thread(_sample_threads, duration, interval)
+        logger.info(f"Профілювання CPU завершено: {samples} семплів за {duration:.0f} с")
+    if report == 'collapsed':
+        return format_collapsed(stacks)
+    return format_top(stacks, samples, duration, interval)
+
+
+async def profile_memory(duration: float) -> str:
+    """
+    Різниця двох знімків tracemalloc з інтервалом duration секунд
+    
+    Якщо tracemalloc не був увімкнений, вмикається тільки на час вимірювання
+    (поки він працює, алокації помітно повільніші).
+    
+    Raises:
+        ProfilerBusyError: якщо інший профайлер вже працює
+    """
+    if _profile_lock.locked():
+        raise ProfilerBusyError("Профайлер вже працює")
+    async with _profile_lock:
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(config.PROFILE_TRACEMALLOC_FRAMES)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(duration)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+    
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ]
+    before = before.filter_traces(filters)
+    after = after.filter_traces(filters)
+    diff = after.compare_to(before, 'lineno')
+    growth = sum(stat.size_diff for stat in diff)
+    
+    lines = [
+        f"tracemalloc: різниця знімків за {duration:.0f} с",
+        f"Відстежується зараз: {current / 1024 / 1024:.1f} МБ, пік: {peak / 1024 / 1024:.1f} МБ",
+        f"Зміна за інтервал: {growth / 1024:+.1f} КБ",
+        "",
+        f"Топ-{REPORT_TOP} рядків за зміною пам'яті:",
+    ]
+    lines += [f"  {stat}" for stat in diff[:REPORT_TOP]]
+    
+    lines += ["", "Топ-10 алокацій (найбільші, з трасою):"]
+    for stat in after.statistics('traceback')[:10]:
+        lines.append(f"  {stat.size / 1024:.1f} КБ в {stat.count} блоках")
+        lines += [f"    {line}" for line in stat.traceback.format(limit=8)]
+    return '\n'.join(lines) + '\n'
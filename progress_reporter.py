@@ -0,0 +1,210 @@
+import time
+import asyncio
+import logging
+import weakref
+import threading
+from aiogram.enums import ParseMode
+from aiogram.types import Message
+import config
+from send_scheduler import send_scheduler, PRIORITY_STATUS
+
+
+logger = logging.getLogger(__name__)
+
+
+def format_size(num_bytes: float | None) -> str:
+    """Форматує розмір у МБ"""
+    if not num_bytes:
+        return "?"
+    return f"{num_bytes / (1024 * 1024):.1f} МБ"
+
+
+def format_progress(progress: dict) -> str | None:
+    """
+    Формує рядок прогресу з даних progress hook yt-dlp
+    
+    Args:
+        progress: Словник yt-dlp (status, downloaded_bytes, total_bytes, speed, eta)
+    
+    Returns:
+        Рядок для статусного повідомлення або None
+    """
+    status = progress.get('status')
+    if status == 'finished':
+        return "🎛 Конвертую в MP3..."
+    if status != 'downloading':
+        return None
+    
+    downloaded = progress.get('downloaded_bytes')
+    total = progress.get('total_bytes') or progress.get('total_bytes_estimate')
+    parts = []
+    if total:
+        percent = min(100, int(downloaded * 100 / total)) if downloaded else 0
+        parts.append(f"⬇️ {percent}% ({format_size(downloaded)} з {format_size(total)})")
+    else:
+        parts.append(f"⬇️ {format_size(downloaded)}")
+    
+    speed = progress.get('speed')
+    if speed:
+        parts.append(f"{speed / (1024 * 1024):.1f} МБ/с")
+    
+    eta = progress.get('eta')
+    if eta is not None:
+        parts.append(f"⏱ {int(eta) // 60}:{int(eta) % 60:02d}")
+    
+    return " • ".join(parts)
+
+
+class ProgressReporter:
+    """
+    Оновлення статусного повідомлення з обмеженням частоти
+    
+    Всі оновлення зливаються: в чат відправляється не більше одного
+    редагування за interval секунд (ліміт спільний для всіх повідомлень
+    чату), однакові тексти не надсилаються повторно.
+    """
+    
+    # chat_id -> час останнього редагування (спільно для всіх репортерів)
+    _last_edit_by_chat = {}
+    # Як часто прибирати з _last_edit_by_chat чати без свіжих редагувань (секунди)
+    PRUNE_INTERVAL = 60.0
+    _next_prune = 0.0
+    # Відкриті репортери (для /status)
+    _open = weakref.WeakSet()
+    
+    def __init__(self, status_msg: Message, interval: float = None, parse_mode: str = ParseMode.HTML):
+        self.status_msg = status_msg
+        self.chat_id = status_msg.chat.id
+        self.interval = config.PROGRESS_EDIT_INTERVAL if interval is None else interval
+        self.parse_mode = parse_mode
+        self._loop = asyncio.get_running_loop()
+        self._last_text = None
+        self._pending_text = None
+        self._flush_task = None
+        self._closed = False
+        # Останній текст з progress hook (з потоку завантаження) і чи запланована його передача
+        self._hook_lock = threading.Lock()
+        self._hook_text = None
+        self._hook_scheduled = False
+        self._open.add(self)
+    
+    @classmethod
+    def current_texts(cls) -> dict:
+        """Останній показаний текст статусу по чатах: {chat_id: текст}"""
+        return {reporter.chat_id: reporter._last_text for reporter in list(cls._open) if reporter._last_text}
+    
+    def _since_last_edit(self) -> float:
+        return time.monotonic() - self._last_edit_by_chat.get(self.chat_id, 0.0)
+    
+    @classmethod
+    def _prune(cls, now: float, max_age: float) -> None:
+        """Видаляє чати, останнє редагування яких вже не впливає на інтервал"""
+        if now < cls._next_prune:
+            return
+        cls._next_prune = now + cls.PRUNE_INTERVAL
+        for chat_id, edited in list(cls._last_edit_by_chat.items()):
+            if now - edited > max_age:
+                del cls._last_edit_by_chat[chat_id]
+    
+    async def _edit(self, text: str) -> None:
+        now = time.monotonic()
+        self._prune(now, max(self.PRUNE_INTERVAL, self.interval))
+        self._last_edit_by_chat[self.chat_id] = now
+        self._last_text = text
+        try:
+            # Ще не відправлене редагування цього ж повідомлення замінюється новим
+            await send_scheduler.send(
+                self.chat_id,
+                lambda: self.status_msg.edit_text(text, parse_mode=self.parse_mode),
+                priority=PRIORITY_STATUS,
+                key=('status', self.chat_id, self.status_msg.message_id)
+            )
+        except Exception as e:
+            # "message is not modified" та подібне не критичні
+            logger.debug(f"Не вдалося оновити статус: {e}")
+    
+    async def _delayed_flush(self, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        self._flush_task = None
+        if self._pending_text is not None and not self._closed:
+            text, self._pending_text = self._pending_text, None
+            if text != self._last_text:
+                await self._edit(text)
+    
+    async def update(self, text: str, force: bool = False) -> None:
+        """
+        Запланувати оновлення тексту
+        
+        Args:
+            text: Новий текст повідомлення
+            force: Відправити одразу, ігноруючи інтервал (для ключових етапів)
+        """
+        if self._closed:
+            return
+        if text == self._last_text:
+            self._pending_text = None
+            return
+        
+        wait = self.interval - self._since_last_edit()
+        if force or wait <= 0:
+            if self._flush_task:
+                self._flush_task.cancel()
+                self._flush_task = None
+            self._pending_text = None
+            await self._edit(text)
+            return
+        
+        self._pending_text = text
+        if not self._flush_task:
+            self._flush_task = asyncio.create_task(self._delayed_flush(wait))
+    
+    def hook(self, header: str):
+        """
+        Створює progress hook для yt-dlp
+        
+        Hook викликається в потоці завантаження (на кожен шматок чи фрагмент),
+        тому він лише запам'ятовує останній текст; в event loop через
+        call_soon_threadsafe передається не більше однієї задачі за раз.
+        
+        Args:
+            header: Текст над рядком прогресу (назва треку, номер тощо)
+        """
+        def progress_hook(progress: dict) -> None:
+            line = format_progress(progress)
+            if line is None or self._closed:
+                return
+            with self._hook_lock:
+                self._hook_text = f"{header}\n\n{line}"
+                if self._hook_scheduled:
+                    return
+                self._hook_scheduled = True
+            self._loop.call_soon_threadsafe(lambda: asyncio.ensure_future(self._drain_hook()))
+        
+        return progress_hook
+    
+    async def _drain_hook(self) -> None:
+        """Передає в update останній текст hook, поки з'являються нові"""
+        while True:
+            with self._hook_lock:
+                text, self._hook_text = self._hook_text, None
+                if text is None or self._closed:
+                    self._hook_scheduled = False
+                    return
+            try:
+                await self.update(text)
+            except BaseException:
+                with self._hook_lock:
+                    self._hook_scheduled = False
+                raise
+    
+    def close(self) -> None:
+        """Зупиняє відкладені оновлення (перед видаленням або ручним редагуванням повідомлення)"""
+        self._closed = True
+        self._open.discard(self)
+        self._pending_text = None
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
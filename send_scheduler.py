@@ -0,0 +1,300 @@
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+import contextvars
+from aiogram.exceptions import TelegramRetryAfter
+import config
+import metrics
+import tracing
+
+
+logger = logging.getLogger(__name__)
+
+# Пріоритети відправки (менше число - раніше)
+PRIORITY_INTERACTIVE = 0    # Відповіді користувачу (один трек, обкладинка)
+PRIORITY_STATUS = 1         # Редагування статусних повідомлень
+PRIORITY_BULK = 2           # Масові відправки (плейлисти, альбоми)
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: 'interactive',
+    PRIORITY_STATUS: 'status',
+    PRIORITY_BULK: 'bulk',
+}
+
+
+class TokenBucket:
+    """
+    Відро токенів: rate токенів на секунду, не більше capacity
+    
+    Баланс може піти в мінус (медіа-група з 10 файлів коштує 10 токенів),
+    тоді наступні відправки просто чекають довше.
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+    
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def delay(self, now: float = None) -> float:
+        """Скільки секунд чекати до наступної відправки (0 - можна одразу)"""
+        now = time.monotonic() if now is None else now
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+    
+    def consume(self, cost: float = 1.0) -> None:
+        self._refill(time.monotonic())
+        self.tokens -= cost
+    
+    def block(self, seconds: float) -> None:
+        """Заборона відправки на seconds секунд (retry_after від Telegram)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class _Job:
+    """Одна відправка в черзі"""
+    
+    def __init__(self, chat_id: int, factory, priority: int, cost: float, key, future: asyncio.Future):
+        self.chat_id = chat_id
+        self.factory = factory
+        self.priority = priority
+        self.cost = cost
+        self.key = key
+        self.future = future
+        self.attempts = 0
+        self.seq = 0
+        self.enqueued_at = time.monotonic()
+        # Контекст відправника: етап відправки потрапляє в трейс його запиту
+        self.context = contextvars.copy_context()
+
+
+class SendScheduler:
+    """
+    Центральна черга вихідних запитів до Telegram
+    
+    Відправки виконуються в порядку пріоритету з дотриманням глобального
+    ліміту та ліміту на чат (token bucket). Після 429 чат блокується на
+    retry_after секунд, а запит повертається в чергу. У межах одного чату
+    порядок відправок зберігається: наступний запит чату стартує лише після
+    завершення попереднього (крім чатів з власним in_flight, наприклад
+    службового чату кешу, де порядок не важливий).
+    """
+    
+    def __init__(self, global_rate: float = None, chat_rate: float = None, group_chat_rate: float = None,
+                 chat_burst: float = None, concurrency: int = None, max_retries: int = None):
+        global_rate = global_rate or config.SEND_GLOBAL_RATE
+        self.chat_rate = chat_rate or config.SEND_CHAT_RATE
+        self.group_chat_rate = group_chat_rate or config.SEND_GROUP_CHAT_RATE
+        self.chat_burst = chat_burst or config.SEND_CHAT_BURST
+        self.concurrency = concurrency or config.SEND_CONCURRENCY
+        self.max_retries = config.SEND_MAX_RETRIES if max_retries is None else max_retries
+        
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_buckets = {}
+        self._queue = []  # heap: (priority, seq, job)
+        self._seq = itertools.count()
+        self._pending_by_key = {}
+        self._in_flight = 0
+        self._chat_in_flight = {}       # chat_id -> запитів у роботі
+        self._chat_in_flight_limit = {}  # chat_id -> власний ліміт (за замовчуванням 1)
+        self._wakeup = None
+        self._worker = None
+        self._last_depth_warning = 0.0
+        
+        self.sent = 0
+        self.retries = 0
+        self.flood_waits = 0
+        self.replaced = 0
+    
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            # Від'ємний chat_id - група або канал, там ліміт суворіший
+            rate = self.group_chat_rate if chat_id < 0 else self.chat_rate
+            bucket = TokenBucket(rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+    
+    def set_chat_rate(self, chat_id: int, rate: float, burst: float = None, in_flight: int = None) -> None:
+        """
+        Власний ліміт для чату (наприклад, службового чату кешу)
+        
+        Args:
+            in_flight: Скільки запитів чату може виконуватись одночасно; більше 1 -
+                без гарантії порядку відправок у цьому чаті
+        """
+        self._chat_buckets[chat_id] = TokenBucket(rate, burst or self.chat_burst)
+        if in_flight:
+            self._chat_in_flight_limit[chat_id] = in_flight
+    
+    def _chat_busy(self, chat_id: int) -> bool:
+        return self._chat_in_flight.get(chat_id, 0) >= self._chat_in_flight_limit.get(chat_id, 1)
+    
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._dispatch_loop())
+    
+    async def send(self, chat_id: int, factory, priority: int = PRIORITY_INTERACTIVE, cost: float = 1,
+                   key=None):
+        """
+        Поставити відправку в чергу та дочекатися результату
+        
+        Args:
+            chat_id: ID чату (для ліміту на чат)
+            factory: Функція без аргументів, що повертає корутину запиту
+                     (викликається повторно після 429)
+            priority: PRIORITY_INTERACTIVE, PRIORITY_STATUS або PRIORITY_BULK
+            cost: Кількість повідомлень (для медіа-групи - кількість файлів)
+            key: Ключ для злиття: новий запит з тим самим ключем замінює
+                 ще не відправлений (наприклад, редагування одного статусу)
+        
+        Returns:
+            Результат запиту або None, якщо його замінив новіший
+        """
+        self._ensure_worker()
+        job = _Job(chat_id, factory, priority, cost, key, asyncio.get_running_loop().create_future())
+        
+        if key is not None:
+            previous = self._pending_by_key.pop(key, None)
+            if previous is not None and not previous.future.done():
+                previous.future.set_result(None)
+                self.replaced += 1
+            self._pending_by_key[key] = job
+        
+        job.seq = next(self._seq)
+        heapq.heappush(self._queue, (priority, job.seq, job))
+        self._warn_depth()
+        self._wakeup.set()
+        return await job.future
+    
+    def _warn_depth(self) -> None:
+        depth = len(self._queue)
+        now = time.monotonic()
+        if depth >= config.SEND_QUEUE_WARN_DEPTH and now - self._last_depth_warning >= 30:
+            self._last_depth_warning = now
+            logger.warning(f"Черга відправки: {depth} запитів, в роботі {self._in_flight}")
+    
+    async def _dispatch_loop(self) -> None:
+        while True:
+            self._wakeup.clear()
+            delay = self._dispatch_ready()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+    
+    def _dispatch_ready(self) -> float | None:
+        """
+        Запускає всі відправки, для яких є токени
+        
+        Returns:
+            Через скільки секунд з'явиться наступний токен (None - чекати події)
+        """
+        now = time.monotonic()
+        soonest = None
+        deferred = []
+        blocked_chats = set()
+        
+        while self._queue and self._in_flight < self.concurrency:
+            item = heapq.heappop(self._queue)
+            job = item[2]
+            if job.future.done():
+                # Замінено новішим запитом або відправник вже не чекає
+                continue
+            
+            global_wait = self._global.delay(now)
+            wait = max(global_wait, self._chat_bucket(job.chat_id).delay(now))
+            
+            if wait > 0 or job.chat_id in blocked_chats or self._chat_busy(job.chat_id):
+                # Наступні запити цього чату теж чекають, щоб не порушити порядок
+                # (зайнятий чат розблокує завершення його запиту в _execute)
+                blocked_chats.add(job.chat_id)
+                deferred.append(item)
+                if wait > 0:
+                    soonest = wait if soonest is None else min(soonest, wait)
+                if global_wait > 0:
+                    break
+                continue
+            
+            self._start(job)
+        
+        for item in deferred:
+            heapq.heappush(self._queue, item)
+        return soonest
+    
+    def _start(self, job: _Job) -> None:
+        self._global.consume(job.cost)
+        self._chat_bucket(job.chat_id).consume(job.cost)
+        if job.key is not None and self._pending_by_key.get(job.key) is job:
+            del self._pending_by_key[job.key]
+        self._in_flight += 1
+        self._chat_in_flight[job.chat_id] = self._chat_in_flight.get(job.chat_id, 0) + 1
+        job.context.run(asyncio.create_task, self._execute(job))
+    
+    async def _execute(self, job: _Job) -> None:
+        try:
+            priority = PRIORITY_NAMES.get(job.priority, job.priority)
+            queued = round(time.monotonic() - job.enqueued_at, 3)
+            with tracing.span('telegram.send', priority=priority, queued_sec=queued, attempt=job.attempts), \
+                    metrics.send_seconds.time(priority=priority):
+                result = await job.factory()
+        except TelegramRetryAfter as e:
+            self.flood_waits += 1
+            metrics.flood_waits.inc()
+            self._chat_bucket(job.chat_id).block(e.retry_after)
+            if job.attempts < self.max_retries and not job.future.done():
+                job.attempts += 1
+                self.retries += 1
+                logger.warning(f"Flood control в чаті {job.chat_id}: чекаю {e.retry_after} с")
+                # Повертаємо на своє місце в черзі, щоб не порушити порядок у чаті
+                heapq.heappush(self._queue, (job.priority, job.seq, job))
+            elif not job.future.done():
+                job.future.set_exception(e)
+        except Exception as e:
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.sent += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self._in_flight -= 1
+            remaining = self._chat_in_flight.pop(job.chat_id, 1) - 1
+            if remaining:
+                self._chat_in_flight[job.chat_id] = remaining
+            self._wakeup.set()
+    
+    def snapshot(self) -> dict:
+        """Поточний стан черги: глибина по пріоритетах, запити в роботі, лічильники"""
+        now = time.monotonic()
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        oldest = 0.0
+        for priority, _, job in self._queue:
+            if job.future.done():
+                continue
+            depth[PRIORITY_NAMES.get(priority, str(priority))] += 1
+            oldest = max(oldest, now - job.enqueued_at)
+        return {
+            'queued': depth,
+            'in_flight': self._in_flight,
+            'oldest_wait_sec': round(oldest, 1),
+            'sent': self.sent,
+            'retries': self.retries,
+            'flood_waits': self.flood_waits,
+            'replaced': self.replaced,
+        }
+
+
+# Спільний планувальник для всього бота
+send_scheduler = SendScheduler()
@@ -1,16 +1,323 @@
 import os
-import yt_dlp
+import json
+import hashlib
+import threading
+import subprocess
+from datetime import datetime
 import config
+from track_matcher import normalize, pick_best_candidate
+from upstream_governor import governor
+from cancellation import CancelToken, DownloadCancelledError
+from ydl_pool import ydl_pool
+from staging import staging
+from audio_store import audio_store
+from disk_manager import estimate_track_bytes, PARTIAL_SUFFIXES
+import metrics
+import tracing
+
+
+def transcode_mp3(source_path: str, output_path: str, bitrate: int, cancel_token: CancelToken = None) -> None:
+    """
+    Конвертує аудіо в MP3 через FFmpeg
+    
+    Процес перевіряє токен скасування кожні 100 мс і при скасуванні
+    завершується (terminate, потім kill), а недописаний файл видаляється.
+    
+    Args:
+        source_path: Вхідний файл
+        output_path: Вихідний MP3
+        bitrate: Бітрейт у kbps
+        cancel_token: Токен скасування
+    
+    Raises:
+        DownloadCancelledError: якщо конвертацію скасовано
+        RuntimeError: якщо FFmpeg завершився з помилкою
+    """
+    cmd = [
+        config.FFMPEG_PATH, '-y', '-hide_banner', '-loglevel', 'error',
+        '-i', source_path, '-vn', '-codec:a', 'libmp3lame', '-b:a', f"{bitrate}k",
+        output_path,
+    ]
+    _run_ffmpeg(cmd, output_path, cancel_token)
+
+
+def split_mp3(source_path: str, parts: int, duration_sec: float, cancel_token: CancelToken = None) -> list[str]:
+    """
+    Ділить MP3 на рівні за тривалістю частини без перекодування
+    
+    Args:
+        source_path: Готовий MP3
+        parts: Кількість частин
+        duration_sec: Тривалість треку
+        cancel_token: Токен скасування
+    
+    Returns:
+        Шляхи до частин ("..._part1.mp3", ...); вихідний файл не видаляється
+    
+    Raises:
+        DownloadCancelledError: якщо розділення скасовано
+        RuntimeError: якщо FFmpeg завершився з помилкою
+    """
+    base = source_path[:-len('.mp3')] if source_path.endswith('.mp3') else source_path
+    part_sec = duration_sec / parts
+    paths = []
+    try:
+        for index in range(parts):
+            output_path = f"{base}_part{index + 1}.mp3"
+            cmd = [
+                config.FFMPEG_PATH, '-y', '-hide_banner', '-loglevel', 'error',
+                '-ss', f"{index * part_sec:.3f}", '-i', source_path,
+                '-t', f"{part_sec:.3f}", '-codec:a', 'copy', output_path,
+            ]
+            _run_ffmpeg(cmd, output_path, cancel_token)
+            paths.append(output_path)
+    except BaseException:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return paths
+
+
+def _run_ffmpeg(cmd: list, output_path: str, cancel_token: CancelToken = None) -> None:
+    """Запускає FFmpeg з підтримкою скасування; при помилці видаляє output_path"""
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if cancel_token is not None:
+        cancel_token.add_callback(process.terminate)
+    try:
+        while True:
+            try:
+                process.wait(timeout=0.1)
+                break
+            except subprocess.TimeoutExpired:
+                if cancel_token is not None and cancel_token.cancelled:
+                    process.terminate()
+                    try:
+                        process.wait(timeout=0.5)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+                        process.wait()
+                    raise DownloadCancelledError("Конвертацію скасовано")
+        
+        # Процес міг завершитись через callback скасування
+        if cancel_token is not None and cancel_token.cancelled:
+            raise DownloadCancelledError("Конвертацію скасовано")
+        
+        if process.returncode != 0:
+            error = process.stderr.read().decode(errors='replace').strip()
+            raise RuntimeError(f"FFmpeg завершився з кодом {process.returncode}: {error[-300:]}")
+    except BaseException:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    finally:
+        if cancel_token is not None:
+            cancel_token.remove_callback(process.terminate)
+        process.stderr.close()
+
+
+# Стабільні імена, які зараз завантажуються: два запити одного треку
+# не повинні писати в один .part
+_partials_in_use = set()
+_partials_lock = threading.Lock()
+
+
+def is_valid_audio(path: str, expected_size: int = None) -> bool:
+    """
+    Перевірка готового файлу перед використанням
+    
+    Args:
+        path: Шлях до файлу
+        expected_size: Точний розмір від джерела (filesize з yt-dlp), якщо відомий
+    
+    Returns:
+        True, якщо файл існує, не порожній, має очікуваний розмір, а MP3
+        починається з тегу ID3 або заголовка MPEG-кадру
+    """
+    try:
+        size = os.path.getsize(path)
+        if size < config.DOWNLOAD_MIN_AUDIO_BYTES:
+            return False
+        if expected_size and size != expected_size:
+            return False
+        if path.endswith('.mp3'):
+            with open(path, 'rb') as f:
+                header = f.read(3)
+            return header == b'ID3' or (header[0] == 0xFF and header[1] & 0xE0 == 0xE0)
+        return True
+    except (OSError, IndexError):
+        return False
 
 
 class SoundCloudDownloader:
     """Клас для завантаження музики з SoundCloud"""
     
-    def __init__(self):
-        """Ініціалізація завантажувача"""
+    SOURCE_NAME = 'SoundCloud'
+    SOURCE_KEY = 'sc'
+    SEARCH_PREFIX = 'scsearch'
+    GOVERNOR_KEY = 'soundcloud'
+    
+    def __init__(self, ydl_factory=None, cache_file: str = None):
+        """
+        Ініціалізація завантажувача
+        
+        Args:
+            ydl_factory: Фабрика екстрактора (за замовчуванням - фабрика ydl_pool),
+                дозволяє підставити локальний фейковий екстрактор
+            cache_file: Файл кешу знайдених відповідностей
+        """
         self.download_dir = config.DOWNLOADS_DIR
+        os.makedirs(self.download_dir, exist_ok=True)
+        self.ydl_factory = ydl_factory
+        self.cache_file = cache_file or config.RESOLVED_CACHE_FILE
+        self._cache_lock = threading.Lock()
+        self.resolved_cache = self._load_resolved_cache()
+        # Влучання та промахи кешу відповідностей (для /status)
+        self.resolve_hits = 0
+        self.resolve_misses = 0
+    
+    def _load_resolved_cache(self) -> dict:
+        """Завантажує кеш знайдених SoundCloud URL"""
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Не вдалося завантажити кеш відповідностей: {e}")
+        return {}
+    
+    def _save_resolved_cache(self) -> None:
+        """Зберігає кеш знайдених SoundCloud URL (атомарно: тимчасовий файл і os.replace)"""
+        try:
+            # Запис під блокуванням: паралельні потоки не перемішують вміст файлу
+            with self._cache_lock:
+                temporary = f"{self.cache_file}.{os.getpid()}.tmp"
+                with open(temporary, 'w', encoding='utf-8') as f:
+                    json.dump(self.resolved_cache, f, ensure_ascii=False, indent=2)
+                os.replace(temporary, self.cache_file)
+        except Exception as e:
+            print(f"Не вдалося зберегти кеш відповідностей: {e}")
+    
+    @staticmethod
+    def _cache_key(track_info: dict) -> str:
+        """Ключ кешу: Spotify ID або нормалізований пошуковий запит"""
+        if track_info.get('id'):
+            return f"spotify:{track_info['id']}"
+        return f"query:{normalize(track_info.get('search_query', ''))}"
+    
+    def search_url(self, search_query: str, limit: int) -> str:
+        """Рядок пошуку yt-dlp у цьому джерелі (перші limit результатів)"""
+        return f"{self.SEARCH_PREFIX}{limit}:{search_query}"
+    
+    def search_candidates(self, search_query: str, limit: int = None) -> list:
+        """
+        Отримує метадані кількох кандидатів без завантаження
+        
+        Args:
+            search_query: Пошуковий запит (виконавець - назва)
+            limit: Кількість кандидатів
+        
+        Returns:
+            Список словників з метаданими (title, uploader, duration, webpage_url)
+        """
+        limit = limit or config.SOUNDCLOUD_CANDIDATES
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',  # Тільки метадані, без форматів
+            'ignoreerrors': True,
+            'no_check_certificate': True,
+            'geo_bypass': True,
+        }
+        
+        try:
+            with tracing.span('source.search', source=self.GOVERNOR_KEY), governor.slot(self.GOVERNOR_KEY), \
+                    metrics.search_seconds.time(source=self.GOVERNOR_KEY):
+                with ydl_pool.acquire(f"search:{self.SEARCH_PREFIX}", ydl_opts, factory=self.ydl_factory,
+                                      playlistend=limit) as ydl:
+                    info = ydl.extract_info(self.search_url(search_query, limit), download=False)
+        except Exception as e:
+            print(f"❌ Помилка при пошуку кандидатів на {self.SOURCE_NAME}: {e}")
+            return []
+        
+        if not info:
+            return []
+        
+        candidates = []
+        for entry in info.get('entries') or []:
+            if not entry:
+                continue
+            url = entry.get('webpage_url') or entry.get('url')
+            if not url:
+                continue
+            candidates.append({
+                'title': entry.get('title') or '',
+                'uploader': entry.get('uploader') or entry.get('channel') or '',
+                'duration': entry.get('duration'),
+                'webpage_url': url,
+            })
+        return candidates
     
-    def download_audio(self, search_query: str, track_name: str, user_id: int = None, bitrate: int = 128) -> str | None:
+    def resolve_track(self, track_info: dict) -> str | None:
+        """
+        Знаходить найкращу відповідність треку Spotify у цьому джерелі
+        
+        Оцінює кількох кандидатів за тривалістю, назвою та виконавцями,
+        результат кешується за Spotify ID.
+        
+        Args:
+            track_info: Інформація про трек зі SpotifyService
+        
+        Returns:
+            URL треку або None
+        """
+        key = self._cache_key(track_info)
+        with self._cache_lock:
+            cached = self.resolved_cache.get(key)
+            if cached:
+                self.resolve_hits += 1
+            else:
+                self.resolve_misses += 1
+        if cached:
+            metrics.cache_requests.inc(cache=f"resolved_{self.GOVERNOR_KEY}", result='hit')
+            tracing.set_attribute(f"{self.GOVERNOR_KEY}.resolve_cache", 'hit')
+            return cached['url']
+        metrics.cache_requests.inc(cache=f"resolved_{self.GOVERNOR_KEY}", result='miss')
+        tracing.set_attribute(f"{self.GOVERNOR_KEY}.resolve_cache", 'miss')
+        
+        candidates = self.search_candidates(track_info['search_query'])
+        best, score = pick_best_candidate(candidates, track_info, config.MIN_MATCH_SCORE)
+        
+        if not best:
+            print(f"✗ Не знайдено відповідного кандидата: {track_info['search_query']}")
+            return None
+        
+        print(f"✓ Обрано кандидата ({score:.2f}): {best['title']} [{best['webpage_url']}]")
+        with self._cache_lock:
+            self.resolved_cache[key] = {
+                'url': best['webpage_url'],
+                'title': best['title'],
+                'score': round(score, 3),
+                'resolved_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+        self._save_resolved_cache()
+        return best['webpage_url']
+    
+    def forget_resolution(self, track_info: dict) -> None:
+        """Видаляє відповідність з кешу (наприклад, якщо трек став недоступним)"""
+        with self._cache_lock:
+            removed = self.resolved_cache.pop(self._cache_key(track_info), None)
+        if removed:
+            self._save_resolved_cache()
+            # Трек більше не пов'язаний з аудіо цього джерела
+            audio_store.release(self._cache_key(track_info))
+    
+    def download_audio(self, search_query: str, track_name: str, user_id: int = None, bitrate: int = 128,
+                       track_info: dict = None, cancel_token: CancelToken = None,
+                       progress_callback=None) -> str | None:
         """
         Завантажує аудіо з SoundCloud за пошуковим запитом
         
@@ -19,11 +326,32 @@ class SoundCloudDownloader:
             track_name: Назва треку для імені файлу
             user_id: ID користувача для унікальності файлу
             bitrate: Бітрейт для конвертації (64, 96, 128, 192, 320)
-            
+            track_info: Інформація про трек зі Spotify; якщо передано, спочатку
+                обирається найкращий кандидат і завантажується тільки він
+            cancel_token: Токен скасування; зупиняє і завантаження, і FFmpeg
+            progress_callback: Функція для словників прогресу yt-dlp (bytes, speed, eta)
+        
         Returns:
             Шлях до завантаженого файлу або None
         """
+        import yt_dlp  # Відкладений імпорт (див. ydl_pool.default_ydl_factory)
+        
+        safe_filename = None
+        source_name = None
+        work_dir = self.download_dir
+        staging_reservation = None
         try:
+            # Визначаємо, що саме завантажувати
+            target = self.search_url(search_query, 1)
+            if track_info:
+                target = self.resolve_track(track_info)
+                if not target:
+                    metrics.downloads.inc(source=self.GOVERNOR_KEY, result='not_found')
+                    return None
+            
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            
             # Створюємо безпечне ім'я файлу
             safe_filename = "".join(
                 c for c in track_name if c.isalnum() or c in (' ', '-', '_')
@@ -33,80 +361,245 @@ class SoundCloudDownloader:
                 import time
                 safe_filename = f"track_{int(time.time())}"
             
+            # Оригінал має стабільне ім'я (хеш джерела): після обриву чи перезапуску
+            # yt-dlp продовжить .part з місця зупинки (HTTP Range), а не почне з нуля
+            source_name = self._claim_source_name(safe_filename, target)
+            
             # Додаємо user_id та timestamp для унікальності
             import time
             unique_id = f"{user_id}_{int(time.time() * 1000)}" if user_id else f"{int(time.time() * 1000)}"
-            safe_filename = f"{safe_filename}_{unique_id}"
+            safe_filename = f"{safe_filename}_{unique_id}_{self.SOURCE_KEY}"
+            if source_name is None:
+                # Цей трек зараз завантажує інший запит - пишемо окремий файл
+                source_name = safe_filename
+            
+            # Папка в пам'яті, якщо вона увімкнена і трек вміщується, інакше диск
+            work_dir, staging_reservation = staging.acquire(
+                estimate_track_bytes((track_info or {}).get('duration_ms'), bitrate)
+            )
+            output_path = os.path.join(work_dir, f"{safe_filename}.mp3")
+            
+            # Це джерело з цим бітрейтом вже завантажувалось (можливо, для іншого треку Spotify)
+            store_ref = self._cache_key(track_info) if track_info else f"query:{normalize(search_query)}"
+            if config.AUDIO_STORE_ENABLED and audio_store.checkout(target, bitrate, output_path, store_ref):
+                print(f"✓ Взято зі сховища аудіо: {track_name}")
+                metrics.downloads.inc(source=self.GOVERNOR_KEY, result='stored')
+                return output_path
+            
+            # Недозавантажений оригінал продовжуємо там, де він лежить
+            source_dir = self._partial_dir(source_name) or work_dir
+            
+            def cancel_hook(progress):
+                if cancel_token is not None and cancel_token.cancelled:
+                    raise yt_dlp.utils.DownloadCancelled('Завантаження скасовано')
             
-            output_path = os.path.join(self.download_dir, f"{safe_filename}.mp3")
+            progress_hooks = [cancel_hook]
+            if progress_callback:
+                progress_hooks.append(progress_callback)
             
-            # Оптимізовані налаштування для SoundCloud
+            # Оптимізовані налаштування для SoundCloud (спільні для всіх викликів,
+            # екземпляр YoutubeDL з ними береться з пулу)
             ydl_opts = {
                 'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': str(bitrate),  # Використовуємо бітрейт користувача
-                }],
-                'outtmpl': os.path.join(self.download_dir, f"{safe_filename}.%(ext)s"),
                 'quiet': True,
                 'no_warnings': True,
-                'default_search': 'scsearch1',  # SoundCloud пошук
                 'noplaylist': True,
+                'playlistend': 1,  # Пошук у джерелі повертає "плейліст" - беремо перший трек
                 'no_check_certificate': True,
                 'geo_bypass': True,
                 # Швидкісні налаштування
                 'retries': 2,
                 'fragment_retries': 2,
                 'skip_unavailable_fragments': True,
-                'concurrent_fragment_downloads': 16,
                 'http_chunk_size': 1048576,  # 1MB chunks
                 'buffersize': 1024 * 16,
                 'throttled_rate': None,
+                'socket_timeout': 15,
                 'http_headers': {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
                 },
+                # Докачування: .part зберігається і продовжується з того ж місця
+                'continuedl': True,
+                'nopart': False,
                 # Пропускаємо зайві дані
                 'writethumbnail': False,
                 'writesubtitles': False,
                 'writeautomaticsub': False,
             }
             
-            # Завантажуємо з SoundCloud
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([search_query])
-            
-            # Перевіряємо чи файл створено
-            if os.path.exists(output_path):
-                print(f"✓ Завантажено з SoundCloud: {track_name}")
-                return output_path
-            else:
-                # Шукаємо файл в папці downloads
-                print(f"Очікуваний файл не знайдено: {output_path}")
-                print(f"Пошук файлів в {self.download_dir}...")
+            # Завантажуємо з джерела; обірване завантаження продовжується
+            attempts = config.DOWNLOAD_RESUME_ATTEMPTS
+            source_path = None
+            for attempt in range(1, attempts + 1):
+                try:
+                    with governor.slot(self.GOVERNOR_KEY) as outcome:
+                        try:
+                            with tracing.span('source.download', source=self.GOVERNOR_KEY, attempt=attempt), \
+                                    metrics.download_seconds.time(source=self.GOVERNOR_KEY):
+                                with ydl_pool.acquire(
+                                    f"download:{self.SEARCH_PREFIX}", ydl_opts, factory=self.ydl_factory,
+                                    # Оригінальний файл; у MP3 конвертуємо самі, щоб FFmpeg можна було зупинити
+                                    outtmpl=os.path.join(source_dir, f"{source_name}.src.%(ext)s"),
+                                    progress_hooks=progress_hooks,
+                                    # Паралельність фрагментів зменшується, якщо джерело перевантажене
+                                    concurrent_fragment_downloads=governor.get(self.GOVERNOR_KEY).fragment_concurrency(16),
+                                ) as ydl:
+                                    info = ydl.extract_info(target, download=True)
+                        except yt_dlp.utils.DownloadCancelled:
+                            outcome.ignore()  # Скасування - не помилка джерела
+                            raise
+                except Exception as e:
+                    cancelled = cancel_token is not None and cancel_token.cancelled
+                    if (attempt < attempts and not cancelled and isinstance(e, yt_dlp.utils.DownloadError)
+                            and self._has_partial(source_name, source_dir)):
+                        print(f"↻ Завантаження обірвалось, продовжую з місця зупинки (спроба {attempt + 1}): {e}")
+                        metrics.download_resumes.inc(source=self.GOVERNOR_KEY)
+                        continue
+                    # Закешований URL міг стати недоступним - наступного разу шукаємо заново
+                    if track_info and not cancelled:
+                        self.forget_resolution(track_info)
+                    raise
                 
-                import time
-                current_time = time.time()
-                for file in os.listdir(self.download_dir):
-                    if file.endswith('.mp3'):
-                        file_path = os.path.join(self.download_dir, file)
-                        # Файл створено недавно (менше 60 секунд тому)
-                        if current_time - os.path.getmtime(file_path) < 60:
-                            print(f"Знайдено файл: {file_path}")
-                            try:
-                                os.rename(file_path, output_path)
-                                return output_path
-                            except:
-                                return file_path
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
                 
-                print(f"✗ MP3 файл не знайдено в {self.download_dir}")
+                # Готовий оригінал (у т.ч. залишений попереднім запуском) перевіряємо перед конвертацією
+                source_path = self._downloaded_path(info, source_name, source_dir)
+                if source_path and not is_valid_audio(source_path, self._expected_size(info)):
+                    print(f"✗ Оригінал пошкоджений, завантажую заново: {source_path}")
+                    self.cleanup_file(source_path)
+                    source_path = None
+                    if attempt < attempts:
+                        continue
+                break
+            
+            if not source_path:
+                print(f"✗ Завантажений файл не знайдено в {source_dir}")
                 return None
-                
+            
+            # Конвертуємо в MP3 з бітрейтом користувача
+            with tracing.span('transcode', source=self.GOVERNOR_KEY, bitrate=bitrate), metrics.transcode_seconds.time():
+                transcode_mp3(source_path, output_path, bitrate, cancel_token)
+            self.cleanup_file(source_path)
+            
+            if is_valid_audio(output_path):
+                print(f"✓ Завантажено з {self.SOURCE_NAME}: {track_name}")
+                if config.AUDIO_STORE_ENABLED:
+                    try:
+                        audio_store.put(output_path, target, bitrate, self.GOVERNOR_KEY, store_ref)
+                    except Exception as e:
+                        print(f"Не вдалося додати трек у сховище аудіо: {e}")
+                metrics.downloads.inc(source=self.GOVERNOR_KEY, result='ok')
+                return output_path
+            
+            print(f"✗ MP3 файл не створено або пошкоджено: {output_path}")
+            self.cleanup_file(output_path)
+            return None
+        
+        except (yt_dlp.utils.DownloadCancelled, DownloadCancelledError):
+            if safe_filename:
+                self._remove_partial_files(safe_filename, work_dir)
+            if source_name and source_name != safe_filename:
+                # Скасований трек не докачуємо
+                self._remove_partial_files(source_name, self._partial_dir(source_name) or work_dir)
+            print(f"⏹ Завантаження з {self.SOURCE_NAME} скасовано: {track_name}")
+            metrics.downloads.inc(source=self.GOVERNOR_KEY, result='cancelled')
+            return None
         except Exception as e:
-            print(f"❌ Помилка при завантаженні з SoundCloud: {e}")
+            # MP3 прибираємо, а .part стабільного оригіналу залишаємо для наступної спроби
+            if safe_filename:
+                self._remove_partial_files(safe_filename, work_dir)
+            print(f"❌ Помилка при завантаженні з {self.SOURCE_NAME}: {e}")
+            metrics.downloads.inc(source=self.GOVERNOR_KEY, result='error')
             import traceback
             traceback.print_exc()
             return None
+        finally:
+            # Файли треку вже записані - далі їх враховує перерахунок папки
+            staging.release(staging_reservation)
+            self._release_source_name(source_name)
+    
+    def _claim_source_name(self, base: str, target: str) -> str | None:
+        """
+        Стабільне ім'я оригіналу для джерела target
+        
+        Returns:
+            Ім'я або None, якщо цей же трек зараз завантажує інший запит
+        """
+        digest = hashlib.sha1(f"{self.SOURCE_KEY}:{target}".encode()).hexdigest()[:12]
+        name = f"{base[:60].rstrip()}_{digest}_{self.SOURCE_KEY}"
+        with _partials_lock:
+            if name in _partials_in_use:
+                return None
+            _partials_in_use.add(name)
+        return name
+    
+    @staticmethod
+    def _release_source_name(name: str | None) -> None:
+        with _partials_lock:
+            _partials_in_use.discard(name)
+    
+    def _partial_dir(self, name: str) -> str | None:
+        """Папка (диск чи пам'ять), де вже лежить оригінал або його .part"""
+        for directory in staging.directories():
+            try:
+                if any(file.startswith(f"{name}.src.") for file in os.listdir(directory)):
+                    return directory
+            except FileNotFoundError:
+                continue
+        return None
+    
+    @staticmethod
+    def _has_partial(name: str, directory: str) -> bool:
+        """Чи є що докачувати: непорожній .part або стан фрагментів .ytdl"""
+        try:
+            return any(
+                entry.name.startswith(f"{name}.src.") and entry.name.endswith(PARTIAL_SUFFIXES)
+                and entry.stat().st_size > 0
+                for entry in os.scandir(directory)
+            )
+        except OSError:
+            return False
+    
+    @staticmethod
+    def _expected_size(info: dict | None) -> int | None:
+        """Точний розмір оригіналу від джерела (для перевірки цілісності)"""
+        if info and info.get('entries'):
+            info = next((entry for entry in info['entries'] if entry), None)
+        if not info:
+            return None
+        downloads = info.get('requested_downloads') or []
+        if len(downloads) == 1:
+            return downloads[0].get('filesize')
+        return None
+    
+    def _downloaded_path(self, info: dict | None, prefix: str, directory: str = None) -> str | None:
+        """Шлях до оригінального файлу, який завантажив yt-dlp"""
+        if info and info.get('entries'):
+            # Пошуковий запит повертає "плейліст" з одним треком
+            info = next((entry for entry in info['entries'] if entry), None)
+        
+        for download in (info or {}).get('requested_downloads') or []:
+            path = download.get('filepath')
+            if path and os.path.exists(path):
+                return path
+        
+        # Запасний варіант - шукаємо за префіксом
+        directory = directory or self.download_dir
+        for file in os.listdir(directory):
+            if file.startswith(f"{prefix}.src.") and not file.endswith(('.part', '.ytdl')):
+                return os.path.join(directory, file)
+        return None
+    
+    def _remove_partial_files(self, prefix: str, directory: str = None) -> None:
+        """Видаляє недозавантажені файли з вказаним префіксом"""
+        directory = directory or self.download_dir
+        try:
+            for file in os.listdir(directory):
+                if file.startswith(prefix):
+                    self.cleanup_file(os.path.join(directory, file))
+        except Exception as e:
+            print(f"Не вдалося прибрати тимчасові файли {prefix}: {e}")
     
     def cleanup_file(self, filepath: str) -> None:
         """
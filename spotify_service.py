@@ -1,19 +1,48 @@
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
+import threading
 import config
 import re
+from upstream_governor import governor
+import metrics
+import tracing
 
 
 class SpotifyService:
     """Клас для роботи зі Spotify"""
     
     def __init__(self):
-        """Ініціалізація клієнта Spotify"""
-        auth_manager = SpotifyClientCredentials(
-            client_id=config.SPOTIFY_CLIENT_ID,
-            client_secret=config.SPOTIFY_CLIENT_SECRET
-        )
-        self.spotify = spotipy.Spotify(auth_manager=auth_manager)
+        """Ініціалізація сервісу; клієнт Spotify створюється при першому запиті"""
+        self._spotify = None
+        self._client_lock = threading.Lock()
+    
+    @property
+    def spotify(self):
+        """
+        Клієнт spotipy з відкладеним імпортом
+        
+        spotipy (разом з requests/urllib3) імпортується при першому запиті,
+        а не під час старту бота.
+        """
+        if self._spotify is None:
+            with self._client_lock:
+                if self._spotify is None:
+                    import spotipy
+                    from spotipy.oauth2 import SpotifyClientCredentials
+                    auth_manager = SpotifyClientCredentials(
+                        client_id=config.SPOTIFY_CLIENT_ID,
+                        client_secret=config.SPOTIFY_CLIENT_SECRET
+                    )
+                    self._spotify = spotipy.Spotify(auth_manager=auth_manager)
+        return self._spotify
+    
+    def _call(self, method: str, *args, **kwargs):
+        """
+        Виклик Spotify API через регулятор навантаження
+        
+        Якщо Spotify перевантажений або недоступний, регулятор одразу кидає
+        UpstreamUnavailableError замість чергового запиту.
+        """
+        with tracing.span(f"spotify.{method}"), metrics.spotify_seconds.time(method=method), governor.slot('spotify'):
+            return getattr(self.spotify, method)(*args, **kwargs)
     
     def extract_track_id(self, url: str) -> str | None:
         """
@@ -99,7 +128,7 @@ class SpotifyService:
             if not track_id:
                 return None
             
-            track = self.spotify.track(track_id)
+            track = self._call('track', track_id)
             
             # Формуємо інформацію про трек
             artists = ", ".join([artist['name'] for artist in track['artists']])
@@ -133,7 +162,7 @@ class SpotifyService:
             Інформація про знайдений трек або None
         """
         try:
-            results = self.spotify.search(q=query, type='track', limit=1)
+            results = self._call('search', q=query, type='track', limit=1)
             
             if not results['tracks']['items']:
                 return None
@@ -170,7 +199,7 @@ class SpotifyService:
             Інформація про знайдений альбом (ID у форматі URL) або None
         """
         try:
-            results = self.spotify.search(q=query, type='album', limit=1)
+            results = self._call('search', q=query, type='album', limit=1)
             
             if not results['albums']['items']:
                 return None
@@ -196,7 +225,7 @@ class SpotifyService:
             Інформація про знайдений плейлист (ID у форматі URL) або None
         """
         try:
-            results = self.spotify.search(q=query, type='playlist', limit=1)
+            results = self._call('search', q=query, type='playlist', limit=1)
             
             if not results['playlists']['items']:
                 return None
@@ -226,7 +255,7 @@ class SpotifyService:
             if not playlist_id:
                 return None
             
-            playlist = self.spotify.playlist(playlist_id)
+            playlist = self._call('playlist', playlist_id)
             
             tracks = []
             for item in playlist['tracks']['items']:
@@ -274,12 +303,13 @@ class SpotifyService:
             if not album_id:
                 return None
             
-            album = self.spotify.album(album_id)
+            album = self._call('album', album_id)
             
             tracks = []
             for track in album['tracks']['items']:
                 artists = ", ".join([artist['name'] for artist in track['artists']])
                 tracks.append({
+                    'id': track['id'],
                     'name': track['name'],
                     'artists': artists,
                     'album': album['name'],
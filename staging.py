@@ -0,0 +1,111 @@
+import os
+import logging
+import threading
+import config
+import metrics
+from disk_manager import DiskManager, Reservation
+
+
+logger = logging.getLogger(__name__)
+
+
+class StagingArea:
+    """
+    Де тримати аудіо, поки трек завантажується, конвертується і відправляється
+    
+    Файл живе кілька секунд: yt-dlp пише оригінал, FFmpeg - MP3, бот читає
+    його для відправки і видаляє. З бекендом 'ram' ці файли пишуться в
+    папку в пам'яті (tmpfs, наприклад /dev/shm), тож диск не задіяний.
+    Обсяг папки в пам'яті обмежений STAGING_RAM_MAX_MB: трек, який не
+    вміщується, пишеться в звичайну папку завантажень.
+    
+    yt-dlp і FFmpeg працюють з файлами, тому використовується саме
+    папка в пам'яті, а не буфери в процесі.
+    """
+    
+    def __init__(self, backend: str = None, ram_dir: str = None, ram_max_bytes: int = None):
+        self.backend = backend or config.STAGING_BACKEND
+        self.disk_dir = config.DOWNLOADS_DIR
+        self.ram = None
+        self._lock = threading.Lock()
+        self.placed = {'ram': 0, 'disk': 0}
+        self.spills = 0
+        
+        if self.backend == 'ram':
+            # Папка створюється при першому використанні, не під час імпорту
+            self.ram = DiskManager(
+                directory=ram_dir or config.STAGING_RAM_DIR,
+                quota_bytes=ram_max_bytes or config.STAGING_RAM_MAX_MB * 1024 * 1024,
+                min_free_bytes=config.STAGING_RAM_MIN_FREE_MB * 1024 * 1024,
+            )
+        self._ram_ready = False
+    
+    def _ram_available(self) -> bool:
+        """Створює папку в пам'яті; якщо не вдалося - далі працюємо тільки з диском"""
+        if self.ram is None or self._ram_ready:
+            return self.ram is not None
+        with self._lock:
+            if not self._ram_ready and self.ram is not None:
+                try:
+                    os.makedirs(self.ram.directory, exist_ok=True)
+                    self._ram_ready = True
+                except OSError as e:
+                    logger.warning(f"Папка в пам'яті {self.ram.directory} недоступна ({e}), використовується {self.disk_dir}")
+                    self.ram = None
+        return self.ram is not None
+    
+    def acquire(self, nbytes: int) -> tuple[str, Reservation | None]:
+        """
+        Папка для нового треку
+        
+        Args:
+            nbytes: Оцінка обсягу файлів треку (disk_manager.estimate_track_bytes)
+        
+        Returns:
+            (папка, резерв у пам'яті або None) - резерв повернути в release(),
+            коли файли треку записані
+        """
+        reservation = None
+        if self._ram_available():
+            # tmpfs перераховується за мікросекунди, тож облік завжди точний
+            self.ram.refresh()
+            reservation = self.ram.try_reserve(nbytes, 'staging')
+        place = 'ram' if reservation is not None else 'disk'
+        with self._lock:
+            self.placed[place] += 1
+            if self.ram is not None and reservation is None:
+                self.spills += 1
+        metrics.staging_files.inc(place=place)
+        return (self.ram.directory if reservation is not None else self.disk_dir), reservation
+    
+    def directories(self) -> list:
+        """Усі папки, де можуть лежати файли треків"""
+        if self.ram is not None:
+            return [self.ram.directory, self.disk_dir]
+        return [self.disk_dir]
+    
+    def release(self, reservation: Reservation | None) -> None:
+        """Повертає резерв; записані файли враховуються при наступному перерахунку"""
+        if reservation is not None:
+            self.ram.release(reservation)
+    
+    async def start(self) -> None:
+        """Прибирання папки в пам'яті після попереднього запуску (з main())"""
+        if self._ram_available():
+            await self.ram.start()
+    
+    async def stop(self) -> None:
+        if self.ram is not None:
+            await self.ram.stop()
+    
+    def snapshot(self) -> dict:
+        """Стан для /status"""
+        with self._lock:
+            state = {'backend': self.backend, 'placed': dict(self.placed), 'spills': self.spills}
+        if self.ram is not None:
+            state['ram'] = self.ram.snapshot()
+            state['ram_dir'] = self.ram.directory
+        return state
+
+
+staging = StagingArea()
@@ -0,0 +1,130 @@
+"""
+Тест резервного завантаження (HedgedDownloader) з фейковими джерелами
+"""
+import os
+import time
+import tempfile
+import threading
+from cancellation import DownloadCancelledError
+from hedged_downloader import HedgedDownloader
+
+
+class FakeSource:
+    """
+    Джерело без мережі: чекає first_byte секунд, потім steps разів по step секунд
+    звітує прогрес і записує файл. Скасування перевіряється між кроками.
+    """
+    
+    def __init__(self, name: str, directory: str, first_byte: float = 0.0, steps: int = 5, step: float = 0.02,
+                 fail: bool = False):
+        self.SOURCE_NAME = name
+        self.directory = directory
+        self.first_byte = first_byte
+        self.steps = steps
+        self.step = step
+        self.fail = fail
+        self.started = threading.Event()
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self.removed = []
+    
+    def _sleep(self, seconds: float, cancel_token) -> None:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if cancel_token is not None and cancel_token.cancelled:
+                self.cancelled.set()
+                raise DownloadCancelledError("Скасовано")
+            time.sleep(0.005)
+    
+    def download_audio(self, search_query, track_name, user_id=None, bitrate=128, track_info=None,
+                       cancel_token=None, progress_callback=None):
+        self.started.set()
+        try:
+            self._sleep(self.first_byte, cancel_token)
+            for index in range(1, self.steps + 1):
+                self._sleep(self.step, cancel_token)
+                if progress_callback:
+                    progress_callback({'status': 'downloading', 'downloaded_bytes': index, 'total_bytes': self.steps})
+            if self.fail:
+                return None
+            if progress_callback:
+                progress_callback({'status': 'finished'})
+            path = os.path.join(self.directory, f"{self.SOURCE_NAME}.mp3")
+            with open(path, 'wb') as f:
+                f.write(b'ID3' + b'\0' * 1024)
+            return path
+        finally:
+            self.finished.set()
+    
+    def cleanup_file(self, filepath: str) -> None:
+        self.removed.append(filepath)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+def test_primary_wins_without_hedge():
+    """Повільне, але живе основне джерело не запускає резервне"""
+    with tempfile.TemporaryDirectory() as directory:
+        primary = FakeSource('primary', directory, steps=10, step=0.05)
+        backup = FakeSource('backup', directory)
+        downloader = HedgedDownloader([primary, backup], hedge_delay=0.2)
+        
+        path, source = downloader.download_with_source('q', 'Трек')
+        
+        assert source == 'primary' and os.path.exists(path)
+        assert not backup.started.is_set()
+
+
+def test_backup_wins_and_loser_cancelled():
+    """Основне джерело мовчить довше hedge_delay - виграє резервне, основне скасовується"""
+    with tempfile.TemporaryDirectory() as directory:
+        primary = FakeSource('primary', directory, first_byte=5.0)
+        backup = FakeSource('backup', directory)
+        downloader = HedgedDownloader([primary, backup], hedge_delay=0.1)
+        
+        path, source = downloader.download_with_source('q', 'Трек')
+        
+        assert source == 'backup' and os.path.exists(path)
+        assert primary.finished.wait(2) and primary.cancelled.is_set()
+        assert downloader.stats['backup'].wins == 1
+        assert downloader.stats['primary'].cancelled == 1
+
+
+def test_late_loser_file_cleaned_up():
+    """Файл джерела, яке програло, але все ж завершилось, видаляється"""
+    with tempfile.TemporaryDirectory() as directory:
+        primary = FakeSource('primary', directory, first_byte=0.15, steps=1, step=0.0)
+        backup = FakeSource('backup', directory, steps=1, step=0.0)
+        downloader = HedgedDownloader([primary, backup], hedge_delay=0.1)
+        
+        # Основне джерело не перевіряє токен після затримки першого байта
+        original_sleep = primary._sleep
+        primary._sleep = lambda seconds, cancel_token: original_sleep(seconds, None)
+        
+        path, source = downloader.download_with_source('q', 'Трек')
+        
+        assert source == 'backup'
+        assert primary.finished.wait(2)
+        time.sleep(0.05)  # Колбек прибирання виконується після завершення future
+        late_path = os.path.join(directory, 'primary.mp3')
+        assert primary.removed == [late_path] and not os.path.exists(late_path)
+
+
+def test_failed_primary_falls_back_immediately():
+    """Невдача основного джерела запускає резервне без очікування hedge_delay"""
+    with tempfile.TemporaryDirectory() as directory:
+        primary = FakeSource('primary', directory, steps=1, fail=True)
+        backup = FakeSource('backup', directory)
+        downloader = HedgedDownloader([primary, backup], hedge_delay=30)
+        
+        started = time.monotonic()
+        path, source = downloader.download_with_source('q', 'Трек')
+        
+        assert source == 'backup' and time.monotonic() - started < 5
+
+
+if __name__ == "__main__":
+    for test in (test_primary_wins_without_hedge, test_backup_wins_and_loser_cancelled,
+                 test_late_loser_file_cleaned_up, test_failed_primary_falls_back_immediately):
+        test()
+        print(f"✅ {test.__name__}")
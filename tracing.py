@@ -0,0 +1,281 @@
+import os
+import json
+import time
+import queue
+import random
+import logging
+import threading
+import contextvars
+import urllib.request
+from contextlib import contextmanager
+import config
+
+
+logger = logging.getLogger(__name__)
+
+# Поточний span запиту; копіюється в потоки завантажень разом з контекстом
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+class Span:
+    """Один етап обробки запиту (пошук, завантаження, конвертація, відправка...)"""
+    
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'attributes', 'start', 'end', 'start_wall', 'error')
+    
+    def __init__(self, trace: 'Trace', name: str, parent_id: str | None, attributes: dict):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start = time.perf_counter()
+        self.start_wall = time.time()
+        self.end = None
+        self.error = None
+    
+    @property
+    def duration(self) -> float:
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+    
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+    
+    def finish(self, error: BaseException = None) -> None:
+        self.end = time.perf_counter()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+    
+    def to_dict(self) -> dict:
+        return {
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start - self.trace.root.start, 4),
+            'duration': round(self.duration, 4),
+            'attributes': self.attributes,
+            'error': self.error,
+        }
+
+
+class Trace:
+    """Всі етапи одного запиту користувача"""
+    
+    def __init__(self, name: str, attributes: dict):
+        self.trace_id = os.urandom(16).hex()
+        self._lock = threading.Lock()
+        self.spans = []
+        self.root = Span(self, name, None, attributes)
+        self._token = None
+    
+    @property
+    def request_id(self) -> str:
+        """Короткий ID запиту для логів"""
+        return self.trace_id[:12]
+    
+    def add(self, span: Span) -> None:
+        # Етапи можуть завершуватись у потоках завантажень
+        with self._lock:
+            self.spans.append(span)
+    
+    def stage_breakdown(self) -> list:
+        """Сумарна тривалість кожного типу етапу: [(назва, секунди, кількість)]"""
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            total, count = totals.get(span.name, (0.0, 0))
+            totals[span.name] = (total + span.duration, count + 1)
+        return sorted(((name, total, count) for name, (total, count) in totals.items()),
+                      key=lambda item: item[1], reverse=True)
+    
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {
+            'trace_id': self.trace_id,
+            'name': self.root.name,
+            'started_at': self.root.start_wall,
+            'duration': round(self.root.duration, 4),
+            'attributes': self.root.attributes,
+            'error': self.root.error,
+            'spans': spans,
+        }
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def current_request_id() -> str | None:
+    """ID запиту, який зараз обробляється (або None поза запитом)"""
+    span = _current_span.get()
+    return span.trace.request_id if span is not None else None
+
+
+def set_attribute(key: str, value) -> None:
+    """Додає атрибут до поточного етапу"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+def start_trace(name: str, **attributes) -> Trace | None:
+    """
+    Починає трасування запиту
+    
+    Повертає Trace, який треба передати у finish_trace() (зазвичай у finally),
+    або None, якщо трасування вимкнене.
+    """
+    if not config.TRACING_ENABLED:
+        return None
+    trace = Trace(name, attributes)
+    trace._token = _current_span.set(trace.root)
+    return trace
+
+
+def finish_trace(trace: Trace | None, error: BaseException = None) -> None:
+    """Завершує трасування: лог повільних запитів та експорт"""
+    if trace is None:
+        return
+    trace.root.finish(error)
+    if trace._token is not None:
+        try:
+            _current_span.reset(trace._token)
+        except ValueError:
+            # Токен з іншого контексту - просто прибираємо поточний span
+            _current_span.set(None)
+        trace._token = None
+    
+    if trace.root.duration >= config.TRACE_SLOW_SEC and random.random() < config.TRACE_SLOW_SAMPLE_RATE:
+        stages = ", ".join(
+            f"{name} {total:.1f}s" + (f" x{count}" if count > 1 else "")
+            for name, total, count in trace.stage_breakdown()
+        )
+        logger.warning(
+            f"Повільний запит [{trace.request_id}] {trace.root.name}: "
+            f"{trace.root.duration:.1f}s ({stages or 'без етапів'})"
+        )
+    
+    if _exporter is not None and random.random() < config.TRACE_SAMPLE_RATE:
+        _exporter.submit(trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Етап обробки в межах поточного запиту
+    
+    Поза запитом (або з вимкненим трасуванням) нічого не записує.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.finish(e)
+        raise
+    else:
+        child.finish()
+    finally:
+        _current_span.reset(token)
+        parent.trace.add(child)
+
+
+# ---------- Експорт ----------
+
+def _otlp_attributes(attributes: dict) -> list:
+    result = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            typed = {'boolValue': value}
+        elif isinstance(value, int):
+            typed = {'intValue': str(value)}
+        elif isinstance(value, float):
+            typed = {'doubleValue': value}
+        else:
+            typed = {'stringValue': str(value)}
+        result.append({'key': key, 'value': typed})
+    return result
+
+
+def _otlp_span(span: Span, trace: Trace) -> dict:
+    start_ns = int(span.start_wall * 1e9)
+    data = {
+        'traceId': trace.trace_id,
+        'spanId': span.span_id,
+        'name': span.name,
+        'kind': 1,  # INTERNAL
+        'startTimeUnixNano': str(start_ns),
+        'endTimeUnixNano': str(start_ns + int(span.duration * 1e9)),
+        'attributes': _otlp_attributes(span.attributes),
+        'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+    }
+    if span.parent_id:
+        data['parentSpanId'] = span.parent_id
+    return data
+
+
+def to_otlp(trace: Trace) -> dict:
+    """Трейс у форматі OTLP/HTTP JSON (OpenTelemetry)"""
+    with trace._lock:
+        spans = [trace.root] + list(trace.spans)
+    return {
+        'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': config.TRACE_SERVICE_NAME})},
+            'scopeSpans': [{
+                'scope': {'name': 'sluhay.tracing'},
+                'spans': [_otlp_span(span, trace) for span in spans],
+            }],
+        }],
+    }
+
+
+class _Exporter:
+    """Фоновий потік, що записує трейси у JSON lines або відправляє в OTLP-колектор"""
+    
+    def __init__(self, mode: str):
+        self.mode = mode
+        self._queue = queue.Queue(maxsize=1000)
+        self._thread = threading.Thread(target=self._run, name='trace-exporter', daemon=True)
+        self._thread.start()
+    
+    def submit(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            logger.debug("Черга експорту трейсів переповнена, трейс пропущено")
+    
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                if self.mode == 'otlp':
+                    self._send_otlp(trace)
+                else:
+                    self._write_jsonl(trace)
+            except Exception as e:
+                logger.debug(f"Не вдалося експортувати трейс: {e}")
+    
+    @staticmethod
+    def _write_jsonl(trace: Trace) -> None:
+        with open(config.TRACE_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(trace.to_dict(), ensure_ascii=False) + '\n')
+    
+    @staticmethod
+    def _send_otlp(trace: Trace) -> None:
+        request = urllib.request.Request(
+            config.TRACE_OTLP_URL,
+            data=json.dumps(to_otlp(trace)).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST',
+        )
+        with urllib.request.urlopen(request, timeout=5) as response:
+            response.read()
+
+
+_exporter = _Exporter(config.TRACE_EXPORT) if config.TRACING_ENABLED and config.TRACE_EXPORT in ('jsonl', 'otlp') else None
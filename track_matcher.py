@@ -0,0 +1,144 @@
+import re
+from difflib import SequenceMatcher
+
+
+# Слова, які зазвичай означають "не ту" версію треку
+UNWANTED_KEYWORDS = (
+    'remix', 'rmx', 'edit', 'bootleg', 'mashup', 'cover', 'live', 'karaoke',
+    'instrumental', 'acapella', 'nightcore', 'sped up', 'speed up', 'slowed',
+    'reverb', '8d', 'bass boosted', 'loop', 'hour', 'hours', 'preview', 'snippet',
+)
+
+# Превʼю SoundCloud Go+ зазвичай тривають 30 секунд
+PREVIEW_MAX_SEC = 35
+
+
+def normalize(text: str) -> str:
+    """
+    Нормалізує рядок для порівняння (нижній регістр, без пунктуації)
+    
+    Args:
+        text: Вхідний рядок
+    
+    Returns:
+        Нормалізований рядок
+    """
+    text = (text or '').lower()
+    text = re.sub(r'[\(\)\[\]\{\}]', ' ', text)
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _tokens(text: str) -> set:
+    return set(normalize(text).split())
+
+
+def _title_similarity(expected: str, candidate: str) -> float:
+    """Схожість назв: частка слів очікуваної назви в кандидаті + посимвольна схожість"""
+    expected_tokens = _tokens(expected)
+    if not expected_tokens:
+        return 0.0
+    
+    overlap = len(expected_tokens & _tokens(candidate)) / len(expected_tokens)
+    ratio = SequenceMatcher(None, normalize(expected), normalize(candidate)).ratio()
+    return 0.7 * overlap + 0.3 * ratio
+
+
+def _artist_similarity(artists: str, candidate_title: str, uploader: str) -> float:
+    """Частка виконавців, які згадані в назві або імені автора завантаження"""
+    names = [a.strip() for a in (artists or '').split(',') if a.strip()]
+    if not names:
+        return 0.0
+    
+    haystack = f"{normalize(candidate_title)} {normalize(uploader)}"
+    haystack_compact = haystack.replace(' ', '')
+    found = 0
+    for name in names:
+        norm = normalize(name)
+        if norm and (norm in haystack or norm.replace(' ', '') in haystack_compact):
+            found += 1
+    return found / len(names)
+
+
+def _duration_score(expected_sec: float, candidate_sec: float | None) -> float | None:
+    """
+    Оцінка відповідності тривалості
+    
+    Returns:
+        Число від 0 до 1 або None, якщо кандидат точно не підходить
+    """
+    if not expected_sec or not candidate_sec:
+        return 0.5  # Невідомо - нейтральна оцінка
+    
+    # Превʼю або багатогодинні луп-версії
+    if candidate_sec <= PREVIEW_MAX_SEC < expected_sec:
+        return None
+    if candidate_sec > expected_sec * 2 and candidate_sec - expected_sec > 120:
+        return None
+    
+    tolerance = max(10.0, expected_sec * 0.15)
+    return max(0.0, 1.0 - abs(candidate_sec - expected_sec) / tolerance)
+
+
+def score_candidate(candidate: dict, track_info: dict) -> float | None:
+    """
+    Оцінює кандидата з SoundCloud відносно треку зі Spotify
+    
+    Args:
+        candidate: Метадані yt-dlp (title, uploader, duration)
+        track_info: Інформація про трек зі SpotifyService (name, artists, duration_ms)
+    
+    Returns:
+        Оцінка (чим більша, тим краще) або None, якщо кандидата відкинуто
+    """
+    title = candidate.get('title') or ''
+    uploader = candidate.get('uploader') or ''
+    expected_name = track_info.get('name') or track_info.get('search_query', '')
+    expected_sec = (track_info.get('duration_ms') or 0) / 1000
+    
+    duration = _duration_score(expected_sec, candidate.get('duration'))
+    if duration is None:
+        return None
+    
+    score = (
+        0.45 * duration
+        + 0.35 * _title_similarity(expected_name, title)
+        + 0.20 * _artist_similarity(track_info.get('artists', ''), title, uploader)
+    )
+    
+    # Штраф за ремікси, лупи тощо, якщо їх немає в оригінальній назві
+    expected_norm = f" {normalize(expected_name)} "
+    title_norm = f" {normalize(title)} "
+    for keyword in UNWANTED_KEYWORDS:
+        needle = f" {keyword} "
+        if needle in title_norm and needle not in expected_norm:
+            score -= 0.3
+    
+    return score
+
+
+def pick_best_candidate(candidates: list, track_info: dict, min_score: float = 0.0) -> tuple[dict | None, float]:
+    """
+    Обирає найкращого кандидата
+    
+    Args:
+        candidates: Список метаданих кандидатів
+        track_info: Інформація про трек зі Spotify
+        min_score: Мінімальна оцінка для прийняття
+    
+    Returns:
+        (кандидат, оцінка) або (None, 0.0)
+    """
+    best, best_score = None, 0.0
+    for candidate in candidates:
+        if not candidate:
+            continue
+        score = score_candidate(candidate, track_info)
+        if score is None:
+            continue
+        if best is None or score > best_score:
+            best, best_score = candidate, score
+    
+    if best is None or best_score < min_score:
+        return None, 0.0
+    return best, best_score
@@ -0,0 +1,277 @@
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+import config
+
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamUnavailableError(Exception):
+    """Зовнішнє джерело зараз недоступне (базовий клас)"""
+
+
+class CircuitOpenError(UpstreamUnavailableError):
+    """Запобіжник відкритий - джерело вважається недоступним"""
+
+
+class UpstreamBusyError(UpstreamUnavailableError):
+    """Не вдалося отримати слот за відведений час"""
+
+
+class SourceGovernor:
+    """
+    Регулятор навантаження на одне зовнішнє джерело
+    
+    Дозволена кількість паралельних запитів змінюється за AIMD:
+    +1/limit після кожного успішного запиту, вдвічі менше після помилки
+    або занадто повільної відповіді. Якщо частка помилок у вікні перевищує
+    поріг, запобіжник відкривається і запити одразу отримують CircuitOpenError.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(self, name: str, initial_limit: float = None, min_limit: float = 1, max_limit: float = None,
+                 latency_target: float = None):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit or config.GOVERNOR_MAX_CONCURRENCY
+        self.limit = float(initial_limit or self.max_limit)
+        self.latency_target = latency_target or config.GOVERNOR_LATENCY_TARGETS.get(
+            name, config.GOVERNOR_DEFAULT_LATENCY_SEC
+        )
+        self.in_flight = 0
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._last_decrease = 0.0
+        self._outcomes = deque(maxlen=config.GOVERNOR_WINDOW)
+        self._latencies = deque(maxlen=config.GOVERNOR_WINDOW)
+        self._cond = threading.Condition()
+    
+    def _error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+    
+    def _check_circuit(self) -> None:
+        """Переводить запобіжник з OPEN у HALF_OPEN після паузи; викликається під замком"""
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= config.GOVERNOR_OPEN_SEC:
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+            logger.info(f"Governor {self.name}: пробний запит після паузи")
+    
+    def acquire(self, timeout: float = None) -> bool:
+        """
+        Отримує слот для запиту
+        
+        Returns:
+            True, якщо це пробний запит у стані HALF_OPEN
+        
+        Raises:
+            CircuitOpenError: джерело вимкнене запобіжником
+            UpstreamBusyError: слот не звільнився за timeout
+        """
+        timeout = config.GOVERNOR_ACQUIRE_TIMEOUT_SEC if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._check_circuit()
+                if self.state == self.OPEN:
+                    raise CircuitOpenError(f"{self.name}: джерело тимчасово недоступне")
+                if self.state == self.HALF_OPEN:
+                    # Поки пробний запит не завершився, решта одразу отримує відмову
+                    if self._probe_in_flight:
+                        raise CircuitOpenError(f"{self.name}: джерело перевіряється")
+                    self._probe_in_flight = True
+                    self.in_flight += 1
+                    return True
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return False
+                
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise UpstreamBusyError(f"{self.name}: перевищено ліміт паралельних запитів")
+                self._cond.wait(remaining)
+    
+    def release(self, latency: float, ok: bool | None, probe: bool = False) -> None:
+        """
+        Звільняє слот і враховує результат
+        
+        Args:
+            latency: Тривалість запиту в секундах
+            ok: True - успіх, False - помилка джерела, None - не враховувати (скасування)
+            probe: Чи був це пробний запит
+        """
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            if probe:
+                self._probe_in_flight = False
+            
+            if ok is not None:
+                now = time.monotonic()
+                self._outcomes.append(ok)
+                if ok:
+                    self._latencies.append(latency)
+                
+                slow = ok and latency > self.latency_target
+                if ok and not slow:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+                elif now - self._last_decrease >= 1.0:
+                    # Не зменшуємо частіше за раз на секунду - одна хвиля помилок = одне зменшення
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = now
+                
+                if probe or self.state == self.HALF_OPEN:
+                    if ok:
+                        self.state = self.CLOSED
+                        self._outcomes.clear()
+                        logger.info(f"Governor {self.name}: джерело відновилось")
+                    else:
+                        self._open(now)
+                elif (self.state == self.CLOSED
+                      and len(self._outcomes) >= config.GOVERNOR_MIN_REQUESTS
+                      and self._error_rate() >= config.GOVERNOR_ERROR_THRESHOLD):
+                    self._open(now)
+            
+            self._cond.notify_all()
+    
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self.opened_at = now
+        self.limit = self.min_limit
+        logger.warning(f"Governor {self.name}: запобіжник відкрито (помилок {self._error_rate():.0%})")
+    
+    @contextmanager
+    def slot(self, timeout: float = None):
+        """
+        Контекстний менеджер для одного запиту
+        
+        Всередині можна викликати outcome.ignore(), щоб не враховувати результат
+        (наприклад, при скасуванні користувачем) або outcome.fail() для помилки
+        без винятку.
+        """
+        probe = self.acquire(timeout)
+        outcome = _Outcome()
+        started = time.monotonic()
+        try:
+            yield outcome
+        except Exception as e:
+            outcome.set(outcome.ok if outcome.explicit else not is_upstream_error(e))
+            raise
+        finally:
+            self.release(time.monotonic() - started, outcome.ok, probe)
+    
+    def fragment_concurrency(self, maximum: int = 16) -> int:
+        """Кількість паралельних фрагментів yt-dlp з урахуванням стану джерела"""
+        share = self.limit / self.max_limit if self.max_limit else 1.0
+        return max(1, min(maximum, int(round(maximum * share))))
+    
+    def snapshot(self) -> dict:
+        with self._cond:
+            self._check_circuit()
+            latencies = sorted(self._latencies)
+            return {
+                'state': self.state,
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'error_rate': round(self._error_rate(), 3),
+                'requests': len(self._outcomes),
+                'p50_latency': latencies[len(latencies) // 2] if latencies else None,
+            }
+
+
+class _Outcome:
+    """Результат запиту всередині SourceGovernor.slot()"""
+    
+    def __init__(self):
+        self.ok = True
+        self.explicit = False
+    
+    def set(self, ok: bool | None) -> None:
+        self.ok = ok
+        self.explicit = True
+    
+    def fail(self) -> None:
+        self.set(False)
+    
+    def ignore(self) -> None:
+        self.set(None)
+
+
+# Фрагменти повідомлень yt-dlp про недоступність конкретного відео (не джерела)
+UNAVAILABLE_MARKERS = (
+    'unavailable',
+    'not available',
+    'available in your country',
+    'geo restrict',
+    'private video',
+    'has been removed',
+    'does not exist',
+    'unsupported url',
+)
+
+
+def _error_chain(error: Exception):
+    """Виняток і всі вкладені в нього (exc_info DownloadError, cause ExtractorError, __cause__)"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        if isinstance(exc_info, tuple) and len(exc_info) > 1 and isinstance(exc_info[1], BaseException):
+            error = exc_info[1]
+        elif isinstance(getattr(error, 'cause', None), BaseException):
+            error = error.cause
+        else:
+            error = error.__cause__ or error.__context__
+
+
+def is_upstream_error(error: Exception) -> bool:
+    """
+    Чи свідчить виняток про проблему з джерелом (а не з конкретним запитом)
+    
+    Помилки клієнта (4xx, невірний ID, відео недоступне чи заблоковане
+    в країні) не повинні відкривати запобіжник, а 429 та 5xx - повинні.
+    Обгортки yt-dlp (DownloadError, ExtractorError) розгортаються до
+    початкової HTTP-помилки.
+    """
+    for item in _error_chain(error):
+        status = getattr(item, 'http_status', None) or getattr(item, 'status', None) or getattr(item, 'code', None)
+        if isinstance(status, int) and 400 <= status < 600:
+            return status == 429 or status >= 500
+    message = str(error).lower()
+    if any(marker in message for marker in UNAVAILABLE_MARKERS):
+        return False
+    return True
+
+
+class UpstreamGovernor:
+    """Реєстр регуляторів для всіх зовнішніх джерел"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sources = {}
+    
+    def get(self, name: str) -> SourceGovernor:
+        with self._lock:
+            if name not in self._sources:
+                self._sources[name] = SourceGovernor(name)
+            return self._sources[name]
+    
+    def slot(self, name: str, timeout: float = None):
+        return self.get(name).slot(timeout)
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            sources = list(self._sources.values())
+        return {source.name: source.snapshot() for source in sources}
+
+
+# Спільний регулятор для всього процесу
+governor = UpstreamGovernor()
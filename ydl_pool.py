@@ -0,0 +1,176 @@
+import threading
+from contextlib import contextmanager
+import config
+import metrics
+
+
+def default_ydl_factory(params: dict):
+    """
+    yt_dlp.YoutubeDL з відкладеним імпортом
+    
+    yt-dlp реєструє сотні екстракторів під час імпорту, тому він
+    завантажується при першому завантаженні, а не під час старту бота.
+    """
+    import yt_dlp
+    return yt_dlp.YoutubeDL(params)
+
+
+class _PooledYdl:
+    """Екземпляр YoutubeDL, що живе в одному потоці між викликами"""
+    
+    __slots__ = ('ydl', 'uses')
+    
+    def __init__(self, ydl):
+        self.ydl = ydl
+        self.uses = 0
+
+
+class YdlPool:
+    """
+    Теплі екземпляри YoutubeDL: по одному на потік і профіль опцій
+    
+    Створення YoutubeDL - це розбір опцій, підготовка шаблонів і нові
+    HTTP-з'єднання. Пул створює екземпляр один раз для кожної пари
+    (потік, профіль) і повторно використовує його: з'єднання залишаються
+    відкритими (keep-alive), а cookie спільні для всіх екземплярів.
+    Опції, що відрізняються між викликами (шаблон файлу, хуки прогресу,
+    паралельність фрагментів), підставляються на час виклику.
+    
+    Екземпляр не ділиться між потоками, тому блокування не потрібне.
+    Після помилки або max_uses викликів екземпляр закривається і
+    створюється заново.
+    """
+    
+    def __init__(self, factory=None, max_uses: int = None):
+        self.factory = factory or default_ydl_factory
+        self.max_uses = max_uses or config.YDL_MAX_USES
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all = set()
+        self._cookiejar = None
+        self.created = 0
+        self.reused = 0
+    
+    def _instances(self) -> dict:
+        instances = getattr(self._local, 'instances', None)
+        if instances is None:
+            instances = self._local.instances = {}
+        return instances
+    
+    def _create(self, factory, base_opts: dict) -> _PooledYdl:
+        ydl = factory(dict(base_opts))
+        # Спільний cookiejar (http.cookiejar потокобезпечний)
+        if hasattr(ydl, 'cookiejar') and not base_opts.get('cookiefile'):
+            with self._lock:
+                if self._cookiejar is None:
+                    self._cookiejar = ydl.cookiejar
+                else:
+                    ydl.__dict__['cookiejar'] = self._cookiejar
+        pooled = _PooledYdl(ydl)
+        with self._lock:
+            self._all.add(pooled)
+            self.created += 1
+        metrics.ydl_instances.inc(result='created')
+        return pooled
+    
+    def _discard(self, key, pooled: _PooledYdl) -> None:
+        self._instances().pop(key, None)
+        with self._lock:
+            self._all.discard(pooled)
+        self._close(pooled)
+    
+    @staticmethod
+    def _close(pooled: _PooledYdl) -> None:
+        close = getattr(pooled.ydl, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                print(f"Не вдалося закрити YoutubeDL: {e}")
+    
+    @staticmethod
+    def _apply(ydl, overrides: dict) -> dict:
+        """Підставляє опції виклику; повертає попередні значення для відновлення"""
+        saved = {}
+        for key, value in overrides.items():
+            saved[key] = ydl.params.get(key)
+            if key == 'outtmpl' and not isinstance(value, dict):
+                value = {**(ydl.params.get('outtmpl') or {}), 'default': value}
+            ydl.params[key] = value
+        if 'progress_hooks' in overrides and hasattr(ydl, '_progress_hooks'):
+            # YoutubeDL читає хуки з params тільки в конструкторі
+            saved['_progress_hooks'] = ydl._progress_hooks
+            ydl._progress_hooks = list(overrides['progress_hooks'] or [])
+        return saved
+    
+    @staticmethod
+    def _restore(ydl, saved: dict) -> None:
+        hooks = saved.pop('_progress_hooks', None)
+        if hooks is not None:
+            ydl._progress_hooks = hooks
+        for key, value in saved.items():
+            if value is None:
+                ydl.params.pop(key, None)
+            else:
+                ydl.params[key] = value
+    
+    @contextmanager
+    def acquire(self, profile: str, base_opts: dict, factory=None, **overrides):
+        """
+        Екземпляр YoutubeDL для поточного потоку
+        
+        Args:
+            profile: Назва набору базових опцій (наприклад, 'download:scsearch');
+                base_opts для одного профілю мають бути однакові
+            base_opts: Опції, з якими створюється екземпляр
+            factory: Інша фабрика екстрактора (наприклад, фейкова в бенчмарках)
+            **overrides: Опції тільки для цього виклику (outtmpl, progress_hooks, ...)
+        
+        Yields:
+            YoutubeDL (не закривати: він повертається в пул)
+        """
+        factory = factory or self.factory
+        if not config.YDL_POOL_ENABLED:
+            with factory({**base_opts, **overrides}) as ydl:
+                yield ydl
+            return
+        
+        key = (profile, factory)
+        instances = self._instances()
+        pooled = instances.get(key)
+        if pooled is None:
+            pooled = instances[key] = self._create(factory, base_opts)
+        else:
+            with self._lock:
+                self.reused += 1
+            metrics.ydl_instances.inc(result='reused')
+        
+        saved = self._apply(pooled.ydl, overrides)
+        try:
+            yield pooled.ydl
+        except BaseException:
+            # Після помилки чи скасування стан екземпляра невідомий
+            self._discard(key, pooled)
+            raise
+        else:
+            self._restore(pooled.ydl, saved)
+            pooled.uses += 1
+            if pooled.uses >= self.max_uses:
+                self._discard(key, pooled)
+    
+    def close(self) -> None:
+        """Закриває всі екземпляри (при зупинці бота)"""
+        with self._lock:
+            instances = list(self._all)
+            self._all.clear()
+        for pooled in instances:
+            self._close(pooled)
+        # Потоки з уже закритими екземплярами створять нові
+        self._local = threading.local()
+    
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {'instances': len(self._all), 'created': self.created, 'reused': self.reused}
+
+
+ydl_pool = YdlPool()
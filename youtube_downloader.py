@@ -0,0 +1,32 @@
+from urllib.parse import quote_plus
+import config
+from soundcloud_downloader import SoundCloudDownloader
+
+
+class YouTubeMusicDownloader(SoundCloudDownloader):
+    """Резервне джерело: YouTube Music через той самий yt-dlp, що й імпорт плейлістів"""
+    
+    SOURCE_NAME = 'YouTube Music'
+    SOURCE_KEY = 'yt'
+    SEARCH_PREFIX = 'ytmusicsearch'  # Лише назва профілю пулу; рядок пошуку - search_url()
+    GOVERNOR_KEY = 'youtube'
+    
+    def __init__(self, ydl_factory=None, cache_file: str = None):
+        """
+        Ініціалізація завантажувача
+        
+        Args:
+            ydl_factory: Фабрика екстрактора (за замовчуванням yt_dlp.YoutubeDL)
+            cache_file: Файл кешу знайдених відповідностей
+        """
+        super().__init__(ydl_factory, cache_file or config.YOUTUBE_RESOLVED_CACHE_FILE)
+    
+    def search_url(self, search_query: str, limit: int) -> str:
+        """
+        Пошук у розділі "Пісні" YouTube Music
+        
+        ytsearch шукає по всьому YouTube і повертає кліпи, кавери та
+        відео з текстом; сторінка пошуку music.youtube.com з #songs
+        повертає лише треки. Кількість результатів обмежує playlistend.
+        """
+        return f"https://music.youtube.com/search?q={quote_plus(search_query)}#songs"